@@ -1,7 +1,5 @@
-# global import external libraries
-import pandas as pd
-
-# module-level imports
+# module-level imports (pandas, numpy and the calculation modules are
+# imported only once a calculation runs, so listing commands start fast)
 import config as cf
 
 def main():
@@ -13,12 +11,20 @@ def main():
     
     #if args_dict['log_suffix'] != '':
     #    args_dict['log_suffix'] = '_' + args_dict['log_suffix']
-    append_slash_to_dir(args_dict, ['out_dir', 'out_dir_child'])
+    append_slash_to_dir(args_dict, ['out_dir', 'out_dir_child', 'ledger_dir'])
     args_dict['out_dir_child'] = args_dict['out_dir'] + args_dict['out_dir_child']
     if args_dict['quiet']:
         args_dict['verbose_logging'] = False
     
     update_config(cf, args_dict)
+    
+    if cf.list_equip or cf.list_inputs:
+        import sys, catalog
+        if cf.list_equip:
+            catalog.list_equipment()
+        if cf.list_inputs:
+            catalog.list_inputs()
+        sys.exit(0)
 
     if cf.verbose_logging or cf.view_config:
         print('\nConfiguration options specified:\n')
@@ -44,7 +50,8 @@ def main():
     cf.verify_pollutants_to_calc(cf.pollutants_to_calculate)
 
     # ensure output directories exist
-    for dir in [cf.out_dir, cf.out_dir_child, cf.log_dir]:
+    for dir in [cf.out_dir, cf.out_dir_child, cf.log_dir] + (
+               [cf.ledger_dir] if cf.update_ledger else []):
         if not os.path.exists(dir):
             os.makedirs(dir)
             print('Created directory \''+dir+'\' for output files.\n')
@@ -58,20 +65,91 @@ def main():
     start_time = time.strftime("%H:%M:%S")
     print('\n'+start_time+'\tmodule \''+__name__+'\' began running.')
     
+    if cf.run_preflight:
+        from preflight import run_preflight
+        if not run_preflight():
+            print('\nFix the input errors above (or run with --skip_preflight).')
+            import sys
+            sys.exit(1)
+    
     # parse input, calculate emissions, write output
     from parserClass import AnnualParser
     from equipClass import AnnualEquipment
+    from qasink import sink
+    
+    if cf.serve:
+        # server calculations need all parsed CEMS resident and write no files;
+        # raw CEMS is kept so changed files re-parse alone
+        cf.streaming_mode  = False
+        cf.retain_raw_CEMS = True
+        cf.write_stackflow = False
+        cf.write_QA        = False
+    if cf.watch:
+        # changed CEMS files are re-parsed alone against the kept raw CEMS
+        cf.retain_raw_CEMS = True
+    if cf.scenario_file is not None:
+        # scenarios re-fill gaps from the raw CEMS, without re-reading files
+        cf.retain_raw_CEMS = True
+        cf.write_stackflow = False
     
     ae = AnnualEquipment()
     
-    if cf.calculate_criteria:
+    if cf.serve:
+        from server import serve
+        serve(ae, cf.serve_port)
+        return
+    
+    if cf.watch:
+        from watch import watch
+        watch(ae, get_calculations_to_run(), cf.watch_interval)
+        return
+    
+    if cf.scenario_file is not None:
+        from scenarios import write_scenarios
+        write_scenarios(ae, cf.scenario_file)
+        sink.flush(background=False)
+        return
+    
+    parsers = {}
+    for calculation in get_calculations_to_run():
         print('\n')
-        AnnualParser(
-            ae, calculation='criteria').read_calculate_write_annual_emissions()
-    if cf.calculate_FG_toxics:
+        parsers[calculation] = AnnualParser(ae, calculation=calculation)
+        parsers[calculation].read_calculate_write_annual_emissions()
+    if cf.write_stackflow:
+        from stackflow_store import store
+        store.flush()
+    
+    if cf.calculate_uncertainty and 'criteria' in parsers:
         print('\n')
-        AnnualParser(
-            ae, calculation='FG_toxics').read_calculate_write_annual_emissions()
+        from uncertainty import write_uncertainty
+        write_uncertainty(ae, parsers['criteria'])
+    
+    if cf.check_compliance:
+        print('\n')
+        from compliance import write_compliance
+        write_compliance(ae)
+    
+    if cf.write_memory_report:
+        ae.mem_report.record_stage('calculations')
+        ae.mem_report.write()
+    sink.flush()
+    sink.wait()
+    
+    # print total time for script runtime
+    end_time_seconds = time.time()
+    end_time = time.strftime("%H:%M:%S")
+    total_time = round(end_time_seconds - start_time_seconds)
+    print('\n'+end_time+'\tmodule \''+__name__+'\' completed.')
+    print('\t(\''+__name__+'\' total script runtime: '
+                 +str(round((total_time / 60),1))+' minutes)')
+
+def get_calculations_to_run():
+    """Return list of AnnualParser calculation names enabled in config."""
+    calculations = []
+    if cf.calculate_criteria:
+        calculations.append('criteria')
+    if cf.calculate_FG_toxics:
+        calculations.append('FG_toxics')
     if (cf.calculate_calciner_toxics
         and (
              'calciner_1' in cf.equip_to_calculate
@@ -79,23 +157,12 @@ def main():
              'calciner_2' in cf.equip_to_calculate
             )
        ):
-        print('\n')
-        AnnualParser(
-            ae, calculation='calciner_toxics').read_calculate_write_annual_emissions()
+        calculations.append('calciner_toxics')
     if (cf.calculate_h2plant2_toxics
         and 'h2_plant_2' in cf.equip_to_calculate 
        ):
-        print('\n')
-        AnnualParser(
-            ae, calculation='h2plant2_toxics').read_calculate_write_annual_emissions()
-    
-    # print total time for script runtime
-    end_time_seconds = time.time()
-    end_time = time.strftime("%H:%M:%S")
-    total_time = round(end_time_seconds - start_time_seconds)
-    print('\n'+end_time+'\tmodule \''+__name__+'\' completed.')
-    print('\t(\''+__name__+'\' total script runtime: '
-                 +str(round((total_time / 60),1))+' minutes)')
+        calculations.append('h2plant2_toxics')
+    return calculations
 
 def get_args():
     """parse arguments from command line"""
@@ -139,6 +206,14 @@ def get_args():
                         dest='log_dir', metavar='LogDir',
                         default=cf.log_dir,
                         help='Path to save logfiles (default: \'%(default)s\').')
+    group1.add_argument('--ledgerpath',
+                        dest='ledger_dir', metavar='LedgerDir',
+                        default=cf.ledger_dir,
+                        help='Path to multi-year monthly ledger (default: \'%(default)s\').')
+    group1.add_argument('--warehouse_path',
+                        dest='warehouse_path', metavar='Warehouse',
+                        default=cf.warehouse_path,
+                        help='SQLite results warehouse file (default: \'%(default)s\').')
     group1.add_argument('-x', '--logsuffix',
                         dest='log_suffix', metavar='LogSuf',
                         default=cf.log_suffix,
@@ -173,15 +248,93 @@ def get_args():
                         dest='calculate_h2plant2_toxics', metavar='T/F',
                         default=cf.calculate_h2plant2_toxics,
                         help='Whether or not to calculate toxics for WED Pt. #46 H2 Plant #2 (default: %(default)s).')
+    group2.add_argument('--ledger',
+                        dest='update_ledger', action='store_true',
+                        default=cf.update_ledger,
+                        help='Add criteria results to the monthly ledger and write rolling 12-month totals (default: %(default)s).')
+    group2.add_argument('--warehouse',
+                        dest='write_warehouse', action='store_true',
+                        default=cf.write_warehouse,
+                        help='Record results of this run in the SQLite warehouse (default: %(default)s).')
+    group2.add_argument('--stream',
+                        dest='streaming_mode', action='store_true',
+                        default=cf.streaming_mode,
+                        help='Stream CEMS one month at a time to bound memory (default: %(default)s).')
+    group2.add_argument('--compact',
+                        dest='compact_mode', action='store_true',
+                        default=cf.compact_mode,
+                        help='Store annual datasets with compact dtypes (default: %(default)s).')
+    group2.add_argument('--float32',
+                        dest='compact_float32', action='store_true',
+                        default=cf.compact_float32,
+                        help='With --compact, store hourly values as float32 (default: %(default)s).')
+    group2.add_argument('--serve',
+                        dest='serve', action='store_true',
+                        default=cf.serve,
+                        help='Keep parsed data in memory and serve calculations on localhost (default: %(default)s).')
+    group2.add_argument('--port',
+                        dest='serve_port', metavar='Port', type=int,
+                        default=cf.serve_port,
+                        help='Port for --serve (default: %(default)s).')
+    group2.add_argument('--watch',
+                        dest='watch', action='store_true',
+                        default=cf.watch,
+                        help='Recalculate and rewrite outputs when new/changed input data lands (default: %(default)s).')
+    group2.add_argument('--interval',
+                        dest='watch_interval', metavar='Secs', type=int,
+                        default=cf.watch_interval,
+                        help='Seconds between polls for --watch (default: %(default)s).')
+    group2.add_argument('--scenarios',
+                        dest='scenario_file', metavar='JSONFile',
+                        default=cf.scenario_file,
+                        help='Compare criteria totals for the what-if scenarios in '
+                             'JSONFile against baseline (default: %(default)s).')
                         
     group3 = parser.add_argument_group('Console Output / QA')
     # maybe change verbosity options; this may be confusing
     group3.add_argument('-q', '--quiet',
 					    action='store_true',
 					    help='Suppress verbose console logging.')
+    group3.add_argument('--compliance',
+                        dest='check_compliance', action='store_true',
+                        default=cf.check_compliance,
+                        help='Write 1-day/5-day rolling CEMS averages and limit '
+                             'exceedances (default: %(default)s).')
+    group3.add_argument('--uncertainty',
+                        dest='calculate_uncertainty', action='store_true',
+                        default=cf.calculate_uncertainty,
+                        help='Write Monte Carlo percentiles of annual criteria '
+                             'emissions (default: %(default)s).')
+    group3.add_argument('--draws',
+                        dest='uncertainty_draws', metavar='N', type=int,
+                        default=cf.uncertainty_draws,
+                        help='Number of draws for --uncertainty (default: %(default)s).')
+    group3.add_argument('--memreport',
+                        dest='write_memory_report', action='store_true',
+                        default=cf.write_memory_report,
+                        help='Write dataset sizes and peak memory per stage as QA '
+                             'tables (default: %(default)s).')
+    group3.add_argument('--no_QA',
+                        dest='write_QA', action='store_false',
+                        default=cf.write_QA,
+                        help='Do not collect or write QA tables (missing-CEMS logs, memory report).')
+    group3.add_argument('--QA_zip',
+                        dest='QA_archive', action='store_true',
+                        default=cf.QA_archive,
+                        help='Write QA tables into one zip archive in the output folder (default: %(default)s).')
+    group3.add_argument('--skip_preflight',
+                        dest='run_preflight', action='store_false',
+                        default=cf.run_preflight,
+                        help='Skip pre-flight checks of input files before parsing.')
     group3.add_argument('-v', '--view_config',
 					    action='store_true',
 					    help='Only view configuration parameters; do not parse.')
+    group3.add_argument('--list_equip',
+                        action='store_true',
+                        help='Only list equipment in the equipment map; do not parse.')
+    group3.add_argument('--list_inputs',
+                        action='store_true',
+                        help='Only list input files and whether they exist; do not parse.')
 
     args = parser.parse_args()
     #parser.print_help()
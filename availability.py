@@ -0,0 +1,78 @@
+# per-tag CEMS data-availability index (tag x hour bitmap, tag x month coverage)
+import time
+import numpy as np
+import pandas as pd
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+class AvailabilityIndex(object):
+    """Which PI tags have valid CEMS data, by hour and by month."""
+    """
+    Built once per wide CEMS frame (grid hours x PI tags) at ingest, after
+    gap filling. Holds a bit-packed tag x hour bitmap of valid values and
+    the fraction of valid hours per tag x month, so calculations pick the
+    CEMS or EF path with dict lookups instead of scanning hourly data.
+    Tags expected from the equipment map but absent from the data are
+    included with no valid hours and listed in `absent`.
+    """
+    def __init__(self, grid, wide, months, absent=()):
+        """Constructor for index of `wide` CEMS data over integer `months`."""
+        self.grid   = grid
+        self.months = list(months)
+        self.tags   = list(wide.columns)
+        self.tag_pos = dict((tag, i) for i, tag in enumerate(self.tags))
+        self.absent = set(absent)
+                     # set: expected PI tags with no rows in the CEMS data
+        valid = wide.notnull().values
+        self.bitmap = np.packbits(valid, axis=0)
+                     # np.array (ceil(hours / 8) x tags) of packed valid bits
+
+        coverage = {}
+        for month in self.months:
+            positions = grid.month_slices[month]
+            coverage[month] = valid[positions].mean(axis=0)
+        self.coverage = pd.DataFrame(coverage, index=pd.Index(self.tags, name='ptag'),
+                                     columns=self.months)
+                     # df: fraction of valid hours (PI tag x month)
+        self._with_data = dict((month, set(self.coverage.index[self.coverage[month] > 0]))
+                               for month in self.months)
+                     # dict: {integer month: set of PI tags with any valid hour}
+
+    def has_data(self, ptags, month):
+        """Return True if any of `ptags` (str or list) has a valid value in month."""
+        if isinstance(ptags, str):
+            ptags = [ptags]
+        with_data = self._with_data.get(month, ())
+        return any(tag in with_data for tag in ptags)
+
+    def fraction(self, ptag, month):
+        """Return fraction of month hours with a valid value for ptag (0 if not indexed)."""
+        if ptag not in self.tag_pos or month not in self.coverage.columns:
+            return 0.
+        return float(self.coverage.at[ptag, month])
+
+    def valid_hours(self, ptag, positions=slice(None)):
+        """Return bool np.array of valid hours for ptag at grid positions."""
+        if ptag not in self.tag_pos:
+            return np.zeros(len(self.grid.index[positions]), dtype=bool)
+        bits = np.unpackbits(self.bitmap[:, self.tag_pos[ptag]], count=len(self.grid))
+        return bits[positions].astype(bool)
+
+def coverage_report(coverage, equip):
+    """Return coverage pd.DataFrame (PI tag x month) labeled with unit and parameter."""
+    """
+    `coverage` is AvailabilityIndex.coverage (or several combined);
+    `equip` is the parsed equipment map. Tags in the map with no CEMS
+    data have coverage 0.
+    """
+    labels = (equip.dropna(subset=['ptag'])
+                   .drop_duplicates(subset='ptag')
+                   .set_index('ptag')[['unit_key', 'param']])
+    report = labels.reindex(coverage.index).join(coverage.round(4))
+    report.columns = (['unit_key', 'param']
+                      + [str(month).zfill(2) for month in coverage.columns])
+    report.index.name = 'ptag'
+    return report.sort_values(['unit_key', 'param'], na_position='last')
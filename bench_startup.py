@@ -0,0 +1,53 @@
+# benchmark startup time of non-computing commands and module import times
+import os, subprocess, sys, time
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+commands = {
+    'view config'  : ['__main__.py', '-v'],
+    'list equip'   : ['__main__.py', '--list_equip'],
+    'list inputs'  : ['__main__.py', '--list_inputs'],
+    }
+
+modules = ['config', 'catalog', 'ffactor', 'equipClass', 'parserClass']
+
+def time_command(args, repeat=5):
+    """Return list of wall-clock seconds for running a Python command `repeat` times."""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=here,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def import_time(module):
+    """Return cumulative import time (seconds) of a module from `python -X importtime`."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import '+module],
+                          cwd=here, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        return None
+    for line in proc.stderr.splitlines():
+        # 'import time: self [us] | cumulative | imported package'
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    return None
+
+def main(repeat=5):
+    print('\nStartup time (seconds, best / median of {}):\n'.format(repeat))
+    for name, args in commands.items():
+        times = sorted(time_command(args, repeat))
+        print('    {:<14}: {:6.3f} / {:6.3f}'.format(name, times[0],
+                                                   times[len(times) // 2]))
+    print('\nImport time (seconds, cumulative):\n')
+    for module in modules:
+        secs = import_time(module)
+        print('    {:<14}: {}'.format(module, 'import failed' if secs is None
+                                                else '{:7.4f}'.format(secs)))
+
+if __name__ == '__main__':
+    main()
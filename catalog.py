@@ -0,0 +1,76 @@
+# fast listings of equipment and input files (stdlib only; no pandas import)
+import csv, os, time
+
+# module-level imports
+import config as cf
+import inputio
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+def input_files():
+    """Return list of (description, filepath) for all input files of the data year."""
+    files = [
+        ('equipment map'          , cf.fpath_eqmap),
+        ('NG chemical data'       , cf.fpath_NG_chem),
+        ('FG chemical data'       , cf.fpath_FG_chem),
+        ('effective-dated params' , cf.fpath_effparams),
+        ('monthly EFs'            , cf.fpath_EFs),
+        ('gas lab analyses'       , cf.fpath_analyses),
+        ('E/W coker data'         , cf.fpath_ewcoker),
+        ('fuel usage'             , cf.fpath_fuel),
+        ('coke usage'             , cf.fpath_coke),
+        ('flare-fuel usage'       , cf.fpath_flarefuel),
+        ('H2-stack flow'          , cf.fpath_h2stack),
+        ('PSA offgas flow'        , cf.fpath_PSAstack),
+        ('flare EFs'              , cf.fpath_flareEFs),
+        ('toxics EFs'             , cf.fpath_toxicsEFs),
+        ('calciner toxics EFs'    , cf.fpath_toxicsEFs_calciners),
+        ]
+    CEMS_paths = inputio.glob(cf.CEMS_dir+'*')
+    for month in cf.months_to_calculate:
+        paths = [path for path in CEMS_paths
+                 if os.path.basename(path)[:2] == str(month).zfill(2)]
+        for path in paths or [cf.CEMS_dir+str(month).zfill(2)+'*']:
+            files.append(('CEMS month '+str(month), path))
+    return files
+
+def list_inputs():
+    """Print input files with size, modification time and missing status."""
+    print('\nInput files for data year {} (months {} to {}):\n'.format(
+              cf.data_year, cf.months_to_calculate[0], cf.months_to_calculate[-1]))
+    n_missing = 0
+    for desc, path in input_files():
+        if inputio.exists(path):
+            status = '{:>10,d} kB  {}'.format(
+                         int(inputio.getsize(path) / 1024),
+                         time.strftime('%Y-%m-%d %H:%M',
+                                       time.localtime(inputio.getmtime(path))))
+        else:
+            status = '***MISSING***'
+            n_missing += 1
+        print('    {:<22}: {:<36} {}'.format(desc, status, path))
+    print('\n{} file(s) missing.'.format(n_missing))
+    return n_missing
+
+def list_equipment(path=None):
+    """Print equipment units in the equipment map with their CEMS parameters."""
+    if path is None:
+        path = cf.fpath_eqmap
+    units = {} # {unit_key: [WED Pt, unit name, [CEMS params]]}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            unit_key = row['Python GUID'].strip()
+            if unit_key not in units:
+                units[unit_key] = [row['WED Pt'].strip(),
+                                   row['Unit Name'].strip(), []]
+            # the map marks units without CEMS with the literal 'NULL'
+            if row['CEMS'].strip() not in ['', 'NULL']:
+                units[unit_key][2].append(row['CEMS'].strip())
+    print('\nEquipment in \''+path+'\':\n')
+    print('    {:<8} {:<14} {:<36} {:<5} {}'.format(
+              'WED Pt', 'unit key', 'unit name', 'calc', 'CEMS'))
+    for unit_key, (unit_id, unit_name, params) in units.items():
+        calc = 'yes' if unit_key in cf.equip_to_calculate else 'no'
+        print('    {:<8} {:<14} {:<36} {:<5} {}'.format(
+                  unit_id, unit_key, unit_name, calc, ', '.join(params)))
+    return list(units.keys())
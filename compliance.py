@@ -0,0 +1,158 @@
+# rolling 1-day / 5-day CEMS averages compared with equipment-map limits
+import time
+import pandas as pd
+import numpy as np
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+# rolling-average windows: {equipmap limit column: window length in hours}
+windows = {'1-day': 24, '5-day': 120}
+
+def limit_table(equip):
+    """Return pd.DataFrame of CEMS tags having a 1-day and/or 5-day limit."""
+    """
+    `equip` is AnnualEquipment().equip; 'NULL' limits are read as NaN.
+    Tags shared by more than one unit (e.g. coker E/W H2S) appear once
+    per unit.
+    """
+    limits = equip[['ptag', 'unit_key', 'unit_id', 'unit_name', 'param', 'units']
+                   + list(windows.keys())].copy()
+    for col in windows.keys():
+        limits[col] = pd.to_numeric(limits[col], errors='coerce')
+    return limits[limits[list(windows.keys())].notna().any(axis=1)
+                  & limits['ptag'].notna()].reset_index(drop=True)
+
+def hourly_matrix(CEMS, ptags, hours):
+    """Return hourly pd.DataFrame (hours x ptags) of CEMS values from long-format data."""
+    CEMS = CEMS[CEMS['ptag'].astype(str).isin(ptags)]
+    wide = pd.pivot_table(pd.DataFrame({'tstamp': CEMS.index,
+                                        'ptag'  : CEMS['ptag'].astype(str).values,
+                                        'val'   : pd.to_numeric(CEMS['val'],
+                                                      errors='coerce').values}),
+                          index='tstamp', columns='ptag', values='val',
+                          aggfunc='mean', dropna=False)
+    return wide.reindex(index=hours, columns=ptags)
+
+def collect_hourly_matrix(annual_equip, ptags):
+    """Return hourly CEMS matrix for ptags over all parsed months."""
+    """
+    In streaming mode each month's CEMS window is pivoted as it streams so
+    that only the (small) wide matrix of limited tags is kept.
+    """
+    hours = annual_equip._generate_date_range()
+    if annual_equip.CEMS_annual is not None:
+        return hourly_matrix(annual_equip.CEMS_annual, ptags, hours)
+    monthly = []
+    for month in annual_equip.stream_months():
+        ts_start, ts_end = annual_equip.ts_intervals[month - annual_equip.month_offset]
+        monthly.append(hourly_matrix(annual_equip.CEMS_annual, ptags,
+                                     hours[(hours >= ts_start) & (hours <= ts_end)]))
+    annual_equip.CEMS_annual = None
+    return pd.concat(monthly).reindex(hours)
+
+def rolling_means(values, window, min_valid=None):
+    """Return array of trailing rolling means (hours x tags) using cumulative sums."""
+    """
+    O(n) per tag: window sums and valid-hour counts are differences of
+    cumulative sums. A mean is reported only where at least `min_valid`
+    (fraction) of the window's hours are valid; the first window-1 hours,
+    which lack a full window, are NaN.
+    """
+    if min_valid is None:
+        min_valid = cf.compliance_min_valid
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1, values.shape[1]))
+    csum = np.vstack([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    ccnt = np.vstack([zeros, np.cumsum(valid, axis=0)])
+    sums   = csum[window:] - csum[:-window]
+    counts = ccnt[window:] - ccnt[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts >= np.ceil(min_valid * window), sums / counts, np.nan)
+    pad = np.full((window - 1, values.shape[1]), np.nan)
+    return np.vstack([pad, means])
+
+def exceedance_events(means, limits, hours, ptags):
+    """Return pd.DataFrame of consecutive-hour runs where means exceed limits."""
+    """
+    `limits` is an array (one limit per tag; NaN = no limit). Each event
+    gives the tag, first and last window-ending hour, duration in hours,
+    and the highest rolling average during the event.
+    """
+    with np.errstate(invalid='ignore'):
+        over = means > limits[np.newaxis, :]
+    edges = np.diff(np.vstack([np.zeros((1, over.shape[1]), dtype=int),
+                               over.astype(int),
+                               np.zeros((1, over.shape[1]), dtype=int)]), axis=0)
+    starts_r, starts_c = np.nonzero(edges == 1)
+    ends_r, ends_c     = np.nonzero(edges == -1)
+    # np.nonzero is row-major; sort by column so starts/ends pair up per tag
+    s_order = np.lexsort((starts_r, starts_c))
+    e_order = np.lexsort((ends_r, ends_c))
+    starts_r, cols = starts_r[s_order], starts_c[s_order]
+    ends_r = ends_r[e_order]
+    peaks = [np.nanmax(means[s:e, c]) for s, e, c in zip(starts_r, ends_r, cols)]
+    return pd.DataFrame({'ptag'      : np.asarray(ptags)[cols],
+                         'start'     : hours[starts_r],
+                         'end'       : hours[ends_r - 1],
+                         'hours'     : ends_r - starts_r,
+                         'max_avg'   : peaks,
+                         'limit'     : limits[cols]})
+
+def evaluate(annual_equip, min_valid=None):
+    """Return tuple of pd.DataFrames (exceedance events, per-tag summary)."""
+    limits = limit_table(annual_equip.equip)
+    ptags = list(pd.unique(limits['ptag']))
+    matrix = collect_hourly_matrix(annual_equip, ptags)
+    values = matrix.values.astype(float)
+    hours  = matrix.index
+    tag_limits = limits.drop_duplicates('ptag').set_index('ptag').reindex(ptags)
+
+    events, summary = [], []
+    for col, window in windows.items():
+        means = rolling_means(values, window, min_valid)
+        ev = exceedance_events(means, tag_limits[col].values, hours, ptags)
+        ev.insert(1, 'average', col)
+        events.append(ev)
+        with np.errstate(invalid='ignore'):
+            summary.append(pd.DataFrame({
+                'ptag'         : ptags,
+                'average'      : col,
+                'limit'        : tag_limits[col].values,
+                'valid_windows': np.sum(~np.isnan(means), axis=0),
+                'max_avg'      : np.nanmax(np.where(np.isnan(means), -np.inf, means),
+                                           axis=0),
+                'hours_over'   : np.sum(means > tag_limits[col].values, axis=0)}))
+    unit_cols = ['ptag', 'unit_id', 'unit_name', 'param', 'units']
+    events = (pd.concat(events)
+                .merge(limits[unit_cols], on='ptag', how='left')
+                .sort_values(['unit_id', 'ptag', 'average', 'start']))
+    events = events[['unit_id', 'unit_name', 'param', 'units', 'ptag', 'average',
+                     'start', 'end', 'hours', 'max_avg', 'limit']]
+    summary = pd.concat(summary)
+    summary = summary[summary['limit'].notna()]
+    summary['max_avg'] = summary['max_avg'].replace(-np.inf, np.nan)
+    summary = (summary.merge(limits[unit_cols], on='ptag', how='left')
+                      .sort_values(['unit_id', 'ptag', 'average']))
+    summary = summary[['unit_id', 'unit_name', 'param', 'units', 'ptag', 'average',
+                       'limit', 'valid_windows', 'max_avg', 'hours_over']]
+    return events, summary
+
+def write_compliance(annual_equip, out_dir=None):
+    """Evaluate rolling-average limits, write CSVs, print summary."""
+    if out_dir is None:
+        out_dir = cf.out_dir_child
+    print('Evaluating 1-day and 5-day rolling CEMS averages against limits.')
+    start_time_seconds = time.time()
+    events, summary = evaluate(annual_equip)
+    prefix = out_dir+str(annual_equip.year)+'_'
+    events.round(cf.round_decimals).to_csv(prefix+'compliance_exceedances.csv',
+                                           index=False)
+    summary.round(cf.round_decimals).to_csv(prefix+'compliance_summary.csv',
+                                            index=False)
+    print('  {} exceedance events on {} tags ({} seconds)'.format(
+              len(events), events['ptag'].nunique(),
+              round(time.time() - start_time_seconds, 2)))
+    return events, summary
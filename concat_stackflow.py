@@ -1,25 +1,19 @@
-# concat monthly stack flows to one file for Shannon for GHG calcs
-import glob
-import pandas as pd
+# write yearly coker stack flows from the stack-flow store for GHG calcs
 import config as cf
+from stackflow_store import store
 
-def concat_monthly_flows():
-    """Concatenate monthly flow logs into one file for reporting and QA."""
+def write_yearly_coker_flows():
+    """Write one yearly hourly stack-flow file per new coker for reporting and QA."""
     data_dir = cf.out_dir+cf.out_dir_child+'/'
-    print('Data directory: '+data_dir)
-    west = sorted(glob.glob(data_dir+str(cf.data_year)+'_*_stackflow*w.csv'))
-    east = sorted(glob.glob(data_dir+str(cf.data_year)+'_*_stackflow*e.csv'))
-
-    print('Stacking stack flows...')
-    for coker in list(zip([east, west], ['east', 'west'])):
-        months = []
-        for f in coker[0]:
-            month = pd.read_csv(f, index_col=0)
-            months.append(month)
-        year = pd.concat(months)
+    print('Reading stack flows from: '+store.get_root())
+    flows = store.read_year(cf.data_year, units=['coker_e', 'coker_w'])
+    for unit_key, name in [('coker_e', 'east'), ('coker_w', 'west')]:
+        if unit_key not in flows.columns:
+            print('  no stack flows stored for '+unit_key)
+            continue
+        year = flows[[unit_key]].rename(columns={unit_key: 'stack_dscfh'})
         year.index.name = 'Timestamp'
-        year.name = coker[1]
-        year.to_csv(data_dir+str(cf.data_year)+'_stackflow_coker_'+year.name+'.csv')
+        year.to_csv(data_dir+str(cf.data_year)+'_stackflow_coker_'+name+'.csv')
 
-concat_monthly_flows()
-print('Done.')
\ No newline at end of file
+write_yearly_coker_flows()
+print('Done.')
@@ -1,5 +1,4 @@
 import time, os
-import pandas as pd
 
 #print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
 
@@ -15,12 +14,44 @@ data_year     = 2019                            # year_to_calculate ##
 data_dir      = './data_'+str(data_year)+'/'    # all input data files
 out_dir       = './output/'
 log_dir       = out_dir+'logs/'
+stackflow_dir = out_dir+'stackflow/'            # hourly stack flow store (partitioned by year/month)
+ledger_dir    = out_dir+'ledger/'               # multi-year monthly ledger (persists across data years)
+warehouse_path = out_dir+'results.sqlite'       # SQLite results warehouse (persists across runs and data years)
 log_suffix    = ''
 out_dir_child = str(data_year)+'_emissions/'
 
 round_decimals = 10
+local_timezone = 'US/Pacific'                   # clock of PI exports; sets DST rules of the hourly grid
 MAX_CEMS_TO_FILL = 18                           # maximum consecutive missing CEMS values to fill
 
+# missing CEMS substitution: 'bracket_average', 'linear', 'hold_last', 'leave_missing'
+CEMS_fill_strategies = {                        # {text_flag: strategy}; other flags left missing
+    'PM'            : 'bracket_average',
+    'Calibration'   : 'bracket_average',
+    'Malfunction'   : 'bracket_average',
+    'CGA'           : 'bracket_average',
+    'Out of Control': 'bracket_average',
+    }
+CEMS_fill_param_strategies = {}                 # {(param, text_flag): strategy}, e.g. {('o2', 'PM'): 'linear'}
+
+# substitute data for gaps above MAX_CEMS_TO_FILL (40 CFR Part 75-style lookback)
+CEMS_lookback_substitution = False              # fill long gaps from prior quality-assured hours
+CEMS_lookback_hours        = 720                # quality-assured hours in the lookback window
+CEMS_availability_hours    = 8760               # hours over which monitor availability is computed
+                                                # (streaming_mode: capped at lookback + one month)
+CEMS_lookback_tiers = [                         # [(min availability, percentile or 'max')], first match wins
+    (0.95, 90),
+    (0.90, 95),
+    (0.00, 'max'),
+    ]
+CEMS_lookback_params = ['nox', 'no', 'no2', 'co', 'so2', 'so2_lo', 'so2_hi', 'h2s']
+
+# CEMS export resolution; sub-hourly exports are averaged to hourly at ingest
+CEMS_readings_per_hour     = 1                  # 1 (hourly), 4 (15-minute), 60 (1-minute)
+MIN_CEMS_READINGS_PER_HOUR = 1                  # fewer valid readings than this --> hour is invalid
+                                                    # (e.g. 3 for 15-minute, 45 for 1-minute data)
+CEMS_chunksize   = 1000000                      # rows per chunk when streaming sub-hourly CEMS files
+
 GHG = False                                     # calculate GHG?
 
 # what to calculate?
@@ -31,10 +62,60 @@ calculate_h2plant2_toxics = True               # toxics from h2_plant_2
 
 calculate_PM_fractions = False                  # calculate separate PM fractions?
 
+write_stackflow      = True                     # store hourly stack flow (dscfh) for all units
+report_plugins       = []                       # modules with write_report(parser) run on in-memory results,
+                                                    # e.g. ['so2_monthly_format'] (SO2 attainment pivot)
+update_ledger        = False                    # keep monthly criteria results in a multi-year ledger and
+                                                    # write rolling 12-month totals
+write_warehouse      = False                    # record unit x month results of every run in the SQLite warehouse
+check_compliance     = False                    # write 1-day/5-day rolling CEMS averages vs. equipmap limits
+compliance_min_valid = 0.75                     # min fraction of valid hours for a rolling average
+calculate_uncertainty = False                   # Monte Carlo percentiles of annual criteria emissions
+uncertainty_draws    = 5000                     # number of Monte Carlo draws
+uncertainty_seed     = None                     # random seed (int) for repeatable draws
+uncertainty_meter_rsd = 0.05                    # relative std. dev. of fuel-meter error
+uncertainty_EF_rsd   = {'nox': 0.20, 'co'  : 0.50, 'so2' : 0.20, 'voc'  : 0.50,
+                        'pm' : 0.50, 'pm25': 0.50, 'pm10': 0.50, 'h2so4': 0.50}
+                                                    # relative std. dev. of EFs by pollutant
+uncertainty_percentiles = [2.5, 50, 97.5]       # percentiles written to uncertainty output
+
+# memory options (for multi-year / multi-site runs on small machines)
+compact_mode        = False                     # categorical PI tags, numeric lab/fuel columns,
+                                                    # shared hourly time indexes
+compact_float32     = False                     # store hourly values as float32 (compact_mode only)
+write_memory_report = False                     # write dataset sizes and peak RSS per stage (QA table)
+streaming_mode      = False                     # walk months in order with one month of CEMS resident
+                                                    # (next month prefetched on a background thread)
+
+# warm-data server options (keep parsed data resident between calculations)
+serve               = False                     # run localhost calculation server instead of one batch run
+serve_port          = 8765                      # port for localhost calculation server
+retain_raw_CEMS     = False                     # keep each month's raw CEMS so changed files re-parse alone
+watch               = False                     # poll input dirs and recalculate months with new/changed data
+watch_interval      = 60                        # seconds between polls in watch mode
+scenario_file       = None                      # JSON list of what-if scenarios to compare against baseline
+
+# historian extraction (historian.py) in place of manual PI exports
+input_source        = 'exports'                 # 'exports': manual CEMS CSVs and fuel workbook;
+                                                    # 'historian': ingest cache written by historian.py
+historian_class     = 'historian.FileHistorian' # adapter class (module.Class) used by historian.py
+historian_batch_size = 50                       # PI tags per historian request
+historian_workers   = 4                         # concurrent historian requests
+
+# QA / diagnostic tables (missing-CEMS logs, memory report)
+write_QA            = True                      # collect QA tables in memory, write them at end of run
+QA_archive          = False                     # write QA tables into one zip archive instead of QA/ folder
+QA_background       = False                     # write QA tables on a background thread
+
+# input checks
+run_preflight         = True                    # check input headers/sheets/samples before the full parse
+preflight_sample_rows = 100                     # rows read from each input by pre-flight checks
+
 # directories
 annual_prefix  = data_dir+'annual/'             # data that changes monthly/annually
 static_prefix  = data_dir+'static/'             # static data
 CEMS_dir       = annual_prefix+'CEMS/'          # monthly CEMS data
+historian_dir  = annual_prefix+'historian/'     # ingest cache of historian extracts (CEMS/, fuel_hourly.csv)
 
 if data_year == 2019:
     # files
@@ -103,6 +184,12 @@ fpath_PSAstack  = annual_prefix+fname_PSAstack
 fpath_flareEFs  = annual_prefix+fname_flareEFs
 fpath_toxicsEFs = annual_prefix+fname_toxicsEFs
 fpath_toxicsEFs_calciners = annual_prefix+fname_toxicsEFs_calciners
+fpath_effparams = static_prefix+'effective_params.csv' # effective-dated unit parameters
+fpath_fuel_tags = static_prefix+'fuel_tags.csv' # fuel PI tags in fuel-workbook column order
+
+if input_source == 'historian':
+    CEMS_dir   = historian_dir+'CEMS/'
+    fpath_fuel = historian_dir+'fuel_hourly.csv'
 
 ################################################################################
 ################################################################################
@@ -188,6 +275,7 @@ months_to_calculate = range(first_month_to_calculate,
 
 def ends(df, n=2):
     """Return first and last rows of pd.DataFrame"""
+    import pandas as pd
     return pd.concat([df.head(n), df.tail(n)])
 
 def generate_month_map():
@@ -264,8 +352,6 @@ equip_types = {
     'rxn_r_1'        : 'heaterboiler',
     'rxn_r_4'        : 'heaterboiler',
     'dhds_heater_1'  : 'heaterboiler',
-    'dhds_heater_1'  : 'heaterboiler',
-    'dhds_reboiler_1': 'heaterboiler',
     'dhds_reboiler_1': 'heaterboiler',
     'dhds_heater_2'  : 'heaterboiler',
     'h_furnace_n'    : 'heaterboiler',
@@ -326,14 +412,20 @@ h2s_cems_map = {
                           'rxn_r_4',
                           'iht_heater',
                           'ref_heater_1',
-                          'ref_heater_2',
                           'dhds_heater_3',
-                          'hcr_1',
                           'hcr_2',
                           'h2_plant_2' # (this does not have H2S in it)
                           ]
     }
 
+# H2S CEMS PI tag used for each H2S source above
+h2s_source_ptags = {
+    'coker_h2s'   : '12AI3751.PV',
+    'cokerOLD_h2s': '12AI55A.PV',
+    'CVTG_h2s'    : '10AI136A.PV',
+    'RFG_h2s'     : '30AI568A.PV'
+    }
+
 # these lists are based on the respective EF spreadsheets and therefore
 # should not be modified without modifying those sources as well
 
@@ -460,3 +552,7 @@ calciner_toxics_with_EFs = [
     'Thallium',
     'Zinc'
     ]
+
+# h2_plant_2 toxics: PSA offgas (reported as fuel_rfg) and NG bases
+h2plant2_toxics_reindexer = (['equipment', 'month', 'fuel_rfg', 'fuel_ng']
+                             + toxics_with_EFs)
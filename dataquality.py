@@ -0,0 +1,199 @@
+# flag-aware CEMS missing-data classification and substitution
+import time
+import pandas as pd
+import numpy as np
+
+# module-level imports
+import config as cf
+import qasink
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+strategies = ['bracket_average', 'linear', 'hold_last', 'leave_missing']
+
+# status of each missing hour in the missing-data report
+statuses = ['filled', 'substituted_lookback', 'no_bracket', 'above_threshold',
+            'not_substituted']
+
+def assign_strategies(flags, params):
+    """Return array of fill strategies per row from text flags and parameters."""
+    """
+    Per-(parameter, flag) entries in cf.CEMS_fill_param_strategies take
+    precedence over per-flag entries in cf.CEMS_fill_strategies; flags in
+    neither are left missing.
+    """
+    strategy = (pd.Series(flags).map(cf.CEMS_fill_strategies)
+                                .fillna('leave_missing').values.astype(object))
+    for (param, flag), strat in cf.CEMS_fill_param_strategies.items():
+        strategy[(params == param) & (flags == flag)] = strat
+    unknown = set(strategy) - set(strategies)
+    if unknown:
+        raise ValueError('unknown CEMS fill strategies: '+str(sorted(unknown)))
+    return strategy
+
+def fill_missing_CEMS(cems_df, ptag_params, max_consec_to_fill=None, log_tag=''):
+    """Classify missing CEMS hours, fill per strategy, write missing-data report."""
+    """
+    `cems_df` is long format (ptag, tstamp, val, text_flag) sorted by ptag
+    then tstamp; `ptag_params` maps PI tags to parameters ('nox', 'o2',
+    ...). All hours are classified in one vectorized pass: a run of
+    consecutive missing hours within one tag is a gap, bracketed by the
+    tag's last valid value before and first valid value after it. Gaps
+    longer than `max_consec_to_fill`, and gaps at the start or end of a
+    tag's data (no bracket), are left missing for manual filling, unless
+    cf.CEMS_lookback_substitution is set (see lookback_substitute()).
+
+    Reports one row per missing hour (CEMS_missing.csv) and counts per
+    tag x month x status (CEMS_missing_summary.csv) to the QA sink.
+    Returns cems_df with filled values and text_flag dropped.
+    """
+    if max_consec_to_fill is None:
+        max_consec_to_fill = cf.MAX_CEMS_TO_FILL
+    n = len(cems_df)
+    if n == 0:
+        return cems_df.drop(columns='text_flag')
+    ptags  = cems_df['ptag'].astype(str).values
+    flags  = cems_df['text_flag'].astype(str).values
+    params = pd.Series(ptags).map(ptag_params).fillna('').values
+    vals   = pd.to_numeric(cems_df['val'], errors='coerce').values.astype(float)
+    pos    = np.arange(n)
+
+    # tag ids, missing runs (gaps) and gap lengths
+    new_tag  = np.r_[True, ptags[1:] != ptags[:-1]]
+    tag_id   = np.cumsum(new_tag)
+    missing  = np.isnan(vals)
+    gap_start = missing & (new_tag | ~np.r_[False, missing[:-1]])
+    gap_id   = np.where(missing, np.cumsum(gap_start), 0)
+    gap_len  = np.bincount(gap_id, minlength=gap_id.max() + 1)[gap_id]
+
+    # bracketing valid values within the same tag
+    prev_pos = np.maximum.accumulate(np.where(~missing, pos, -1))
+    next_pos = np.minimum.accumulate(np.where(~missing, pos, n)[::-1])[::-1]
+    has_prev = (prev_pos >= 0) & (tag_id[np.clip(prev_pos, 0, n - 1)] == tag_id)
+    has_next = (next_pos < n)  & (tag_id[np.clip(next_pos, 0, n - 1)] == tag_id)
+    prev_val = np.where(has_prev, vals[np.clip(prev_pos, 0, n - 1)], np.nan)
+    next_val = np.where(has_next, vals[np.clip(next_pos, 0, n - 1)], np.nan)
+
+    strategy = assign_strategies(flags, params)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = (pos - prev_pos) / (next_pos - prev_pos)
+    fill = np.select([strategy == 'bracket_average',
+                      strategy == 'linear',
+                      strategy == 'hold_last'],
+                     [(prev_val + next_val) / 2,
+                      prev_val + (next_val - prev_val) * frac,
+                      prev_val],
+                     np.nan)
+
+    status = np.select([strategy == 'leave_missing',
+                        gap_len > max_consec_to_fill,
+                        np.isnan(fill)],
+                       ['not_substituted', 'above_threshold', 'no_bracket'],
+                       'filled').astype(object)
+    do_fill = missing & (status == 'filled')
+    vals[do_fill] = fill[do_fill]
+
+    if cf.CEMS_lookback_substitution:
+        # gaps that could not be filled from brackets get Part 75-style lookback values
+        target = (missing & np.isin(status, ['above_threshold', 'no_bracket'])
+                          & np.isin(params, cf.CEMS_lookback_params))
+        sub, method = lookback_substitute(vals, missing, tag_id, gap_id,
+                                          gap_start & target)
+        do_sub = target & ~np.isnan(sub)
+        vals[do_sub] = sub[do_sub]
+        status[do_sub] = 'substituted_lookback'
+        strategy[do_sub] = method[do_sub]
+        do_fill |= do_sub
+
+    if cf.write_QA:
+        report = pd.DataFrame({'ptag'     : ptags[missing],
+                               'param'    : params[missing],
+                               'tstamp'   : cems_df['tstamp'].values[missing],
+                               'text_flag': flags[missing],
+                               'gap_id'   : gap_id[missing],
+                               'gap_hours': gap_len[missing],
+                               'strategy' : strategy[missing],
+                               'status'   : status[missing],
+                               'fill_val' : np.where(do_fill, vals, np.nan)[missing]})
+        write_missing_report(report, log_tag)
+
+    n_missing, n_filled = int(missing.sum()), int(do_fill.sum())
+    if n_filled == n_missing or not cf.write_QA:
+        print('  **Filled {} out of {} missing CEMS hours.'.format(
+              n_filled, n_missing))
+    else:
+        print('  **Filled {} out of {} missing CEMS hours. '
+              'Check {} for missing hours to fill manually.'.format(
+              n_filled, n_missing,
+              qasink.sink.location('CEMS_missing'+log_tag+'.csv')))
+    cems_df = cems_df.drop(columns='text_flag')
+    cems_df['val'] = vals
+    return cems_df
+
+def lookback_substitute(vals, missing, tag_id, gap_id, starts):
+    """Return arrays (substitute values, method) for gaps starting at `starts`."""
+    """
+    In the style of 40 CFR Part 75 missing-data substitution: each gap gets
+    one value from the tag's last cf.CEMS_lookback_hours quality-assured
+    (measured, not substituted) hours before the gap. The statistic depends
+    on the tag's availability (fraction of measured hours) over the prior
+    cf.CEMS_availability_hours, per cf.CEMS_lookback_tiers, e.g. the 90th
+    percentile at >= 95% availability, the 95th at >= 90%, else the maximum.
+    History is limited to the rows passed in (in streaming mode, the
+    lookback hours preceding each month).
+
+    Measured hours are located with searchsorted on their positions, so
+    each gap costs one window of at most CEMS_lookback_hours values.
+    """
+    n = len(vals)
+    sub    = np.full(n, np.nan)
+    method = np.full(n, '', dtype=object)
+    gap_starts = np.nonzero(starts)[0]
+    if len(gap_starts) == 0:
+        return sub, method
+    measured_pos  = np.nonzero(~missing)[0]
+    measured_vals = vals[measured_pos]
+    tag_first = np.r_[0, np.nonzero(np.diff(tag_id))[0] + 1]
+    first_pos = tag_first[tag_id[gap_starts] - 1]
+
+    k        = np.searchsorted(measured_pos, gap_starts)
+    k_first  = np.searchsorted(measured_pos, first_pos)
+    avail_lo = np.maximum(first_pos, gap_starts - cf.CEMS_availability_hours)
+    k_avail  = np.searchsorted(measured_pos, avail_lo)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        availability = (k - k_avail) / (gap_starts - avail_lo)
+
+    gap_vals    = np.full(gap_id.max() + 1, np.nan)
+    gap_methods = np.full(gap_id.max() + 1, '', dtype=object)
+    for i, start in enumerate(gap_starts):
+        window = measured_vals[max(k_first[i], k[i] - cf.CEMS_lookback_hours):k[i]]
+        if len(window) == 0:
+            continue
+        for min_avail, stat in cf.CEMS_lookback_tiers:
+            if availability[i] >= min_avail:
+                break
+        if stat == 'max':
+            gap_vals[gap_id[start]] = window.max()
+        else:
+            gap_vals[gap_id[start]] = np.percentile(window, stat)
+        gap_methods[gap_id[start]] = 'lookback_'+str(stat)
+    in_gap = gap_id > 0
+    sub[in_gap]    = gap_vals[gap_id[in_gap]]
+    method[in_gap] = gap_methods[gap_id[in_gap]]
+    return sub, method
+
+def summarize_missing(report):
+    """Return pd.DataFrame of missing-hour counts per tag x month x status."""
+    month = pd.to_datetime(report['tstamp']).dt.month.rename('month')
+    summary = (pd.crosstab([report['ptag'], report['param'], month],
+                           report['status'])
+                 .reindex(columns=statuses, fill_value=0))
+    summary['missing'] = summary.sum(axis=1)
+    summary.columns.name = None
+    return summary.reset_index()
+
+def write_missing_report(report, log_tag=''):
+    """Add per-hour missing-data report and per tag x month summary to the QA sink."""
+    qasink.sink.add('CEMS_missing'+log_tag+'.csv', report, index=False)
+    qasink.sink.add('CEMS_missing_summary'+log_tag+'.csv', summarize_missing(report),
+                    index=False)
@@ -0,0 +1,82 @@
+# effective-dated unit parameters evaluated on the hourly grid with as-of joins
+import time
+import numpy as np
+import pandas as pd
+
+# module-level imports
+import config as cf
+import inputio
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+class EffectiveParams(object):
+    """Time-varying unit parameters from a (unit, parameter, valid_from, value) table."""
+    """
+    Each row of the table sets `parameter` of `unit_key` to `value` from
+    `valid_from` (local clock, same as PI exports) until the next row for
+    the same unit and parameter. Values are evaluated for every hour of the
+    HourlyGrid with one as-of join per (unit, parameter), so a change in
+    the middle of a month (a heater shutdown, a new CEMS, a revised stack
+    test) is applied hour by hour with no month-specific code.
+
+    Parameters in use:
+      *in_service        : 0/1, unit operating (fuel flow and emissions)
+      *cems_in_service   : 0/1, CEMS in place; EFs used for hours without
+      *wesp_dscf_per_ton : calciner WESP stack flow per ton of coke
+    """
+    def __init__(self, grid, path=None):
+        """Constructor for parsing table and evaluating it on grid hours."""
+        self.grid  = grid
+        self.path  = path if path is not None else cf.fpath_effparams
+        self.table = self._parse_table()
+        self._wide = {} # {parameter: df (grid hours x unit_key)}
+
+    def _parse_table(self):
+        """Return pd.DataFrame of effective-dated parameters sorted by valid_from."""
+        table = inputio.read_csv(self.path, usecols=['unit_key', 'parameter',
+                                                     'valid_from', 'value'],
+                                 parse_dates=['valid_from'])
+        table['unit_key']  = table['unit_key'].str.strip()
+        table['parameter'] = table['parameter'].str.strip()
+        table['value']     = table['value'].astype(float)
+        return table.sort_values('valid_from', kind='mergesort')
+
+    def wide(self, parameter):
+        """Return pd.DataFrame (grid hours x unit_key) of `parameter` values."""
+        """
+        Hours before a unit's first valid_from are NaN. Built once per
+        parameter and cached.
+        """
+        if parameter not in self._wide:
+            hours = pd.DataFrame({'tstamp': self.grid.index})
+            rows = self.table[self.table['parameter'] == parameter]
+            cols = {}
+            for unit_key, unit_rows in rows.groupby('unit_key', sort=False):
+                joined = pd.merge_asof(hours, unit_rows[['valid_from', 'value']],
+                                       left_on='tstamp', right_on='valid_from',
+                                       direction='backward')
+                cols[unit_key] = joined['value'].values
+            self._wide[parameter] = pd.DataFrame(cols, index=self.grid.index)
+        return self._wide[parameter]
+
+    def has(self, unit_key, parameter):
+        """Return True if the table sets `parameter` for `unit_key`."""
+        return unit_key in self.wide(parameter).columns
+
+    def values(self, unit_key, parameter, positions=slice(None), default=None):
+        """Return np.array of hourly `parameter` values at grid `positions`."""
+        """
+        `default` fills hours before the unit's first valid_from, and every
+        hour if the unit has no rows for `parameter`. With no default, a
+        unit without rows raises KeyError.
+        """
+        wide = self.wide(parameter)
+        if unit_key not in wide.columns:
+            if default is None:
+                raise KeyError('no \''+parameter+'\' rows for \''+unit_key+'\' in '
+                               +self.path)
+            return np.full(len(self.grid.index[positions]), float(default))
+        vals = wide[unit_key].values[positions]
+        if default is not None:
+            vals = np.where(np.isnan(vals), default, vals)
+        return vals
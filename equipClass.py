@@ -1,4 +1,4 @@
-import time, datetime, glob, math
+import time, datetime
 import pandas as pd
 import numpy as np
 from collections import OrderedDict
@@ -13,6 +13,16 @@ from collections import OrderedDict
 # module-level imports
 import config as cf
 import ffactor as ff
+import memreport
+import dataquality
+import qasink
+import stackflow_store
+import registry
+import timegrid
+import effparams
+import historian
+import inputio
+import availability
 
 PPM_CONV_FACTS = {
                 #       MW      const   hr/min
@@ -45,6 +55,8 @@ class AnnualEquipment(object):
         self.month_offset   = cf.month_offset
         self.ts_intervals   = self._generate_ts_interval_list()
                              # list of tuples: [monthly intervals (start, end)]
+        self.grid           = timegrid.HourlyGrid(self.year)
+                             # canonical hourly grid; all hourly inputs conformed to it
         
         # file paths
         self.fpath_eqmap    = cf.fpath_eqmap
@@ -61,6 +73,7 @@ class AnnualEquipment(object):
         self.fpath_flareEFs = cf.fpath_flareEFs
         self.fpath_toxicsEFs= cf.fpath_toxicsEFs
         self.fpath_toxicsEFs_calciners = cf.fpath_toxicsEFs_calciners
+        self.fpath_effparams= cf.fpath_effparams
         
         # fuel lab analysis tabs
         self.labtab_NG      = cf.labtab_NG     
@@ -79,12 +92,12 @@ class AnnualEquipment(object):
         
         # equipment mapping containers
         self.equip          = self._parse_equip_map()                # df: all equipment/PItag data
-        self.equip_ptags    = self._generate_equip_ptag_dict()       # dict: {equipment: [PItag, PItag, ...]}
+        self.registry       = registry.Registry(self.equip)          # Registry: {unit_key: UnitInfo}
+        self.equip_ptags    = self.registry.equip_ptags()            # dict: {equipment: [PItag, PItag, ...]}
         self.ptags_pols     = self._generate_ptag_pol_dict()         # dict: {PItag: [pollutant, pollutant, ...]}
         self.unitID_equip   = self._generate_unitID_unitkey_dict()   # dict: {WED Pt: Python GUID}
         self.ordered_equip  = self._generate_ordered_equip_list()    # list: [Python GUIDs ordered ascending by WED Pt]
         self.unitkey_name   = self._generate_unitkey_unitname_dict() # dict: {Python GUID: pretty name for output}
-        self.h2s_cems_map = cf.h2s_cems_map
 
         self._parse_annual_facility_data()
     
@@ -97,12 +110,61 @@ class AnnualEquipment(object):
         start_time = time.strftime("%H:%M:%S")
         print('began parsing annual data at '+start_time)
 
+        self.mem_report = memreport.MemoryReport()
+        self.CEMS_raw_cache  = {} # {CEMS filepath: raw monthly df} if cf.retain_raw_CEMS
+        self.annual_eu_cache = {} # {Annual* class: instance}, reused across calculations
+        
         # CEMS, fuel analysis and usage, EFs (indented descriptions follow assignments)
-        if not cf.equip_to_calculate == ['h2_flare']:
+        self.CEMS_annual = None
+        self._CEMS_hourly = (None, None, None)
+                             # (CEMS_annual it was built from, wide df, AvailabilityIndex)
+        self.CEMS_coverage = None
+                             # df: fraction of valid CEMS hours (PI tag x month), all months indexed
+        if cf.streaming_mode:
+            print('  CEMS data will be streamed one month at a time')
+        elif not cf.equip_to_calculate == ['h2_flare']:
             print('  parsing CEMS data')
             self.CEMS_annual    = self._parse_all_monthly_CEMS()
                                  # df: annual CEMS data
+            self.mem_report.record_stage('CEMS')
+        self.params         = effparams.EffectiveParams(self.grid, self.fpath_effparams)
+                             # EffectiveParams: hourly time-varying unit parameters
         print('  parsing lab analysis data')
+        self._parse_annual_lab_data()
+        print('    parsed lab analysis data')
+        self.mem_report.record_stage('lab analyses')
+        print('  parsing fuel data')
+        self.fuel_annual    = self._parse_annual_fuel()
+                             # df: hourly fuel data for all equipment
+        self.flarefuel_annual = self._parse_annual_flare_fuel()
+                             # df: hourly flare-gas data
+        print('    parsed fuel data')
+        self.mem_report.record_stage('fuel')
+        print('  parsing emission factor data')
+        self._parse_annual_EF_data()
+        print('    parsed emission factor data')
+        self.mem_report.record_stage('emission factors')
+        
+        if cf.compact_mode:
+            self._compact_annual_datasets()
+            self.mem_report.record_stage('compact')
+        if self.CEMS_annual is not None:
+            self.ensure_CEMS_index() # pivot once and build availability index at ingest
+        self.mem_report.record_datasets(self._annual_datasets())
+        
+        self.input_mtimes = self._snapshot_input_mtimes()
+                             # dict: {input filepath: mtime} for reloading changed files
+        self.changed_months = set()
+                             # set: months affected by last reload_changed_inputs()
+        
+        end_time_seconds = time.time()
+        end_time = time.strftime("%H:%M:%S")
+        print('completed parsing annual data at '+end_time)
+        total_time = round(end_time_seconds - start_time_seconds)
+        print('Total init time: '+str(total_time)+' seconds)')
+    
+    def _parse_annual_lab_data(self):
+        """Parse all fuel lab-analysis tabs and hourly flare HHV."""
         self.NG_annual      = ff.parse_annual_NG_lab_results(self.fpath_analyses,
                                                              self.labtab_NG)
                              # df: annual NG lab-test results
@@ -121,17 +183,13 @@ class AnnualEquipment(object):
         self.PSA_annual     = ff.parse_annual_FG_lab_results(self.fpath_analyses,
                                                              self.labtab_PSA)
                              # df: annual flare-gas lab-test results
-        print('    parsed lab analysis data')
-        print('  parsing fuel data')
-        self.fuel_annual    = self._parse_annual_fuel()
-                             # df: hourly fuel data for all equipment
-        self.flarefuel_annual = self._parse_annual_flare_fuel()
-                             # df: hourly flare-gas data
+        self.flareHHV_annual = None
         if cf.data_year != 2018:
             self.flareHHV_annual= self._upsample_annual_flare_HHV()
                              # series: hourly flare-gas HHV
-        print('    parsed fuel data')
-        print('  parsing emission factor data')
+    
+    def _parse_annual_EF_data(self):
+        """Parse all emission-factor workbooks."""
         self.flareEFs       = self._parse_annual_flare_EFs()
                              # df: EFs for flare gas
         self.toxicsEFs      = self._parse_annual_toxics_EFs()
@@ -140,13 +198,164 @@ class AnnualEquipment(object):
                             # df: EFs for calciner toxics
         self.EFs            = self._parse_annual_EFs()
                              # dict: {integer month: (EFs df, EFunits df, equip_EF_dict)}
-        print('    parsed emission factor data')
-        
-        end_time_seconds = time.time()
-        end_time = time.strftime("%H:%M:%S")
-        print('completed parsing annual data at '+end_time)
-        total_time = round(end_time_seconds - start_time_seconds)
-        print('Total init time: '+str(total_time)+' seconds)')
+    
+    def _input_filepaths(self):
+        """Return list of all input filepaths for the data year."""
+        paths = [self.fpath_eqmap, self.fpath_NG_chem, self.fpath_FG_chem,
+                 self.fpath_EFs, self.fpath_analyses, self.fpath_ewcoker,
+                 self.fpath_fuel, self.fpath_coke, self.fpath_flarefuel,
+                 self.fpath_PSAstack, self.fpath_flareEFs, self.fpath_toxicsEFs,
+                 self.fpath_toxicsEFs_calciners, self.fpath_effparams]
+        return paths + self._subset_CEMS_filepaths()
+    
+    def _snapshot_input_mtimes(self):
+        """Return dict of input file modification times ({filepath: mtime})."""
+        return {path: inputio.getmtime(path)
+                for path in self._input_filepaths()
+                if inputio.exists(path)}
+    
+    def reload_changed_inputs(self):
+        """Re-parse only inputs whose files changed on disk; return list of changed paths."""
+        """
+        Months whose data differ after re-parsing are stored in
+        self.changed_months; a changed CEMS file also marks the months
+        before and after it, as gap fills span month boundaries. Cached
+        Annual* instances (coke, PSA offgas and E/W coker data) are dropped
+        on any change so they are re-created from current data. Changes to
+        the static equipment map require a restart.
+        """
+        self.changed_months = set()
+        current = self._snapshot_input_mtimes()
+        changed = set(path for path, mtime in current.items()
+                      if self.input_mtimes.get(path) != mtime)
+        changed |= set(path for path in self.input_mtimes if path not in current)
+        if not changed:
+            return []
+        for path in sorted(changed):
+            print('  input changed: '+path)
+        
+        CEMS_changed = [path for path in changed if path.startswith(cf.CEMS_dir)]
+        if CEMS_changed:
+            for path in CEMS_changed:
+                self.CEMS_raw_cache.pop(path, None)
+                month = int(path.split(cf.CEMS_dir)[-1][:2])
+                self.changed_months.update(mo for mo in [month - 1, month, month + 1]
+                                           if mo in self.months_to_calc)
+            if self.CEMS_annual is not None:
+                self.CEMS_annual = self._parse_all_monthly_CEMS()
+        if self.fpath_analyses in changed:
+            # monthly lab averages and hourly flare HHV; treat all months as changed
+            self._parse_annual_lab_data()
+            self.changed_months.update(self.months_to_calc)
+        if self.fpath_effparams in changed:
+            # shutdowns are applied to fuel at parse; treat all months as changed
+            self.params = effparams.EffectiveParams(self.grid, self.fpath_effparams)
+            self.fuel_annual = self._parse_annual_fuel()
+            self.changed_months.update(self.months_to_calc)
+        elif self.fpath_fuel in changed:
+            old = self.fuel_annual
+            self.fuel_annual = self._parse_annual_fuel()
+            self.changed_months.update(self._months_differing(old, self.fuel_annual))
+        if self.fpath_flarefuel in changed:
+            old = self.flarefuel_annual
+            self.flarefuel_annual = self._parse_annual_flare_fuel()
+            self.changed_months.update(self._months_differing(old,
+                                                              self.flarefuel_annual))
+        if self.fpath_EFs in changed:
+            old = self.EFs
+            self.EFs = self._parse_annual_EFs()
+            self.changed_months.update(mo for mo in self.months_to_calc
+                                       if mo not in old
+                                       or not old[mo][0].equals(self.EFs[mo][0]))
+        if changed & set([self.fpath_flareEFs, self.fpath_toxicsEFs,
+                          self.fpath_toxicsEFs_calciners]):
+            self._parse_annual_EF_data()
+            self.changed_months.update(self.months_to_calc)
+        if changed & set([self.fpath_ewcoker, self.fpath_coke, self.fpath_PSAstack]):
+            # read by Annual* instances, which are re-created below
+            self.changed_months.update(self.months_to_calc)
+        if self.fpath_eqmap in changed:
+            print('  ***WARNING: equipment map changed; restart to pick up changes***')
+        if cf.compact_mode:
+            self._compact_annual_datasets()
+        
+        self.annual_eu_cache.clear()
+        self.input_mtimes = current
+        return sorted(changed)
+    
+    def _months_differing(self, old, new):
+        """Return list of months whose rows differ between two tstamp-indexed dfs."""
+        months = []
+        for month in self.months_to_calc:
+            ts_start, ts_end = self.ts_intervals[month - self.month_offset]
+            old_mo = old[(old.index >= ts_start) & (old.index <= ts_end)]
+            new_mo = new[(new.index >= ts_start) & (new.index <= ts_end)]
+            if not old_mo.equals(new_mo):
+                months.append(month)
+        return months
+    
+    def new_CEMS_months(self):
+        """Return sorted list of months with CEMS files on disk not yet parsed."""
+        on_disk = set(int(path.split(cf.CEMS_dir)[-1][:2])
+                      for path in inputio.glob(cf.CEMS_dir+'*'))
+        return sorted(mo for mo in on_disk
+                      if mo > max(self.months_to_calc))
+    
+    def extend_months(self, new_months):
+        """Extend months to calculate through the last of new_months."""
+        """
+        Months stay contiguous from the first month so that timestamp
+        intervals remain indexed by (month - month_offset). Monthly EF tabs
+        are parsed for the added months; new CEMS files are picked up by the
+        next call to reload_changed_inputs().
+        """
+        last_month = max(new_months)
+        cf.months_to_calculate = range(self.month_offset, last_month + 1)
+        self.months_to_calc = cf.months_to_calculate
+        self.ts_intervals   = self._generate_ts_interval_list()
+        self.EFs            = self._parse_annual_EFs()
+        self.annual_eu_cache.clear()
+        print('  extended months to calculate through month '+str(last_month))
+    
+    def get_annual_eu(self, annual_class):
+        """Return cached Annual* instance for class, creating it if needed."""
+        if annual_class not in self.annual_eu_cache:
+            self.annual_eu_cache[annual_class] = annual_class(self)
+        return self.annual_eu_cache[annual_class]
+    
+    def _annual_datasets(self):
+        """Return dict of parsed annual datasets ({name: df})."""
+        return OrderedDict([
+            ('CEMS_annual'     , self.CEMS_annual),
+            ('NG_annual'       , self.NG_annual),
+            ('RFG_annual'      , self.RFG_annual),
+            ('cokerFG_annual'  , self.cokerFG_annual),
+            ('CVTG_annual'     , self.CVTG_annual),
+            ('flare_annual'    , self.flare_annual),
+            ('PSA_annual'      , self.PSA_annual),
+            ('fuel_annual'     , self.fuel_annual),
+            ('flarefuel_annual', self.flarefuel_annual),
+            ('flareHHV_annual' , self.flareHHV_annual),
+            ])
+    
+    def _compact_annual_datasets(self):
+        """Cast annual datasets to compact dtypes, share hourly time indexes."""
+        """
+        Lab-analysis values stay float64 because they feed the f-factor
+        calculation; only hourly values are downcast when compact_float32.
+        """
+        if self.CEMS_annual is not None:
+            self.CEMS_annual = memreport.compact_frame(self.CEMS_annual,
+                                                       float32=cf.compact_float32,
+                                                       categorical=('ptag',))
+        for name in ['NG_annual', 'RFG_annual', 'cokerFG_annual',
+                     'CVTG_annual', 'flare_annual', 'PSA_annual']:
+            setattr(self, name, memreport.compact_frame(getattr(self, name)))
+        self.fuel_annual      = memreport.compact_frame(self.fuel_annual,
+                                                        float32=cf.compact_float32)
+        self.flarefuel_annual = memreport.compact_frame(self.flarefuel_annual,
+                                                        float32=cf.compact_float32)
+        memreport.share_time_index([self.fuel_annual, self.flarefuel_annual])
     
     def _parse_annual_EFs(self):
         """Parse EF tabs for specified months; return dict of tuples."""
@@ -167,8 +376,8 @@ class AnnualEquipment(object):
             *dict: {equipment: {dict of EFs}}
         """
         
-        efs = pd.read_excel(self.fpath_EFs, sheet_name=tab, skiprows=5,
-                                            header=None, usecols='A:E')
+        efs = inputio.read_excel(self.fpath_EFs, sheet_name=tab, skiprows=5,
+                                 header=None, usecols='A:E')
         efs.columns = ['unit_id', 'src_name_BP', 'pollutant', 'ef', 'units']
         
         # forward-fill the IDs/names
@@ -226,9 +435,9 @@ class AnnualEquipment(object):
         """
         source (?): https://www3.epa.gov/ttn/chief/efpac/protocol/Protocol%20Report%202015.pdf
         """
-        caltox = pd.read_excel(self.fpath_toxicsEFs_calciners,
-                               header=7, skipfooter=49,
-                               usecols=[0, 4, 6, 8, 9])
+        caltox = inputio.read_excel(self.fpath_toxicsEFs_calciners,
+                                    header=7, skipfooter=49,
+                                    usecols=[0, 4, 6, 8, 9])
         caltox = caltox[1:]
         caltox.columns = ['unit_id', 'pollutant', 'ef_uncontrolled', 'scrubber_control', 'WESP_control']
         # EFs are the same b/w calciners, so for now we can drop calciner_2 EFs
@@ -244,10 +453,10 @@ class AnnualEquipment(object):
     
     def _parse_annual_toxics_EFs(self):
         """Parse EFs for fuel gas / natural gas toxics; return pd.DataFrame."""
-        toxics = pd.read_excel(self.fpath_toxicsEFs,
-                               header=3,
-                               usecols=[0,2,3],
-                               nrows=89)
+        toxics = inputio.read_excel(self.fpath_toxicsEFs,
+                                    header=3,
+                                    usecols=[0,2,3],
+                                    nrows=89)
         toxics.rename(columns={'Chemical' : 'pollutant',
                                'EF'       : 'ef',
                                'EF Units' : 'units'},
@@ -260,8 +469,8 @@ class AnnualEquipment(object):
     def _parse_annual_flare_EFs(self):
         """Read EFs from H2-flare gas data; return pd.DataFrame."""
         # read, clean, format, subset data
-        df = pd.read_excel(self.fpath_flareEFs, sheet_name='Summary',
-                                            skiprows=29, usecols=[0,1,2])
+        df = inputio.read_excel(self.fpath_flareEFs, sheet_name='Summary',
+                                skiprows=29, usecols=[0,1,2])
         df.columns = df.columns.str.lower()
         df.rename(columns={'value':'ef'}, inplace=True)
         df['pollutant'] = df['pollutant'].str.strip().str.lower()
@@ -288,11 +497,11 @@ class AnnualEquipment(object):
         ser = ser.resample('1H').ffill()
         ser = ser.iloc[:-1]
         ser.name = 'HHV_flare'
-        return ser
+        return self.grid.conform(ser)
     
     def _parse_annual_flare_fuel(self):
         """Read annual fuel flow data for H2-plant flare, return pd.DataFrame."""
-        flare_df = pd.read_excel(self.fpath_flarefuel, skiprows=4)
+        flare_df = inputio.read_excel(self.fpath_flarefuel, skiprows=4)
         
         flare_df.rename(columns={'1 h':'tstamp',
                                  '46FI202.PV':'flare_header_flow',
@@ -309,7 +518,7 @@ class AnnualEquipment(object):
                                                                     inplace=True)
         flare_df['flare_header_flow'] = flare_df['flare_header_flow'].clip(lower=0)
         flare_df['discharge_to_flare'] = flare_df['discharge_to_flare'].clip(lower=0)
-        return flare_df
+        return self.grid.conform(flare_df)
     
     def _parse_annual_fuel(self):
         """Read annual fuel data for all equipment, return pd.DataFrame."""
@@ -317,13 +526,17 @@ class AnnualEquipment(object):
         df structure: (WED Pt. x Timestamp)
         df size: <2MB storage for year of data
         """
-        fuel = pd.read_excel(self.fpath_fuel, sheet_name=self.sheet_fuel,
-                             skiprows=9, header=list(range(6)))
-        fuel.columns = fuel.columns.droplevel(5)
-        fuel.columns = fuel.columns.droplevel(4)
-        fuel.columns = fuel.columns.droplevel(1)
-        fuel.set_index(fuel.columns.tolist()[0], inplace=True)
-        fuel.index.name = 'tstamp'
+        if cf.input_source == 'historian':
+            # hourly cache written by historian.extract_months(), same columns
+            fuel = historian.read_fuel_cache(self.fpath_fuel)
+        else:
+            fuel = inputio.read_excel(self.fpath_fuel, sheet_name=self.sheet_fuel,
+                                      skiprows=9, header=list(range(6)))
+            fuel.columns = fuel.columns.droplevel(5)
+            fuel.columns = fuel.columns.droplevel(4)
+            fuel.columns = fuel.columns.droplevel(1)
+            fuel.set_index(fuel.columns.tolist()[0], inplace=True)
+            fuel.index.name = 'tstamp'
         
         # subset out columns of interest,
         # because (usecols='A:AC, AF:AL, AP:AR') gives ValueError
@@ -380,12 +593,13 @@ class AnnualEquipment(object):
         
         fuel.columns = mapped_names
         
-        # N and S coker heaters went down at these respective dates,
-        # after which no fuel flow or emissions
-        fuel.loc['2019-05-06 21:00:00': ,'coker_1'] = 0
-        fuel.loc['2019-04-26 06:00:00': ,'coker_2'] = 0
-
-        fuel = fuel.clip(lower=0)
+        fuel = self.grid.conform(fuel.clip(lower=0))
+        # no fuel flow or emissions for hours a unit is out of service
+        # (e.g., N and S coker heaters after shutdown)
+        for unit_key in fuel.columns:
+            if self.params.has(unit_key, 'in_service'):
+                in_service = self.params.values(unit_key, 'in_service')
+                fuel[unit_key] = fuel[unit_key].where(in_service != 0, 0)
         return fuel
     
     def _parse_all_monthly_CEMS(self):
@@ -396,19 +610,146 @@ class AnnualEquipment(object):
         CEMS_paths = self._subset_CEMS_filepaths()
         monthly_CEMS = []
         for fpath in CEMS_paths:
-            month = self._parse_monthly_CEMS(fpath)
+            if fpath in self.CEMS_raw_cache:
+                month = self.CEMS_raw_cache[fpath]
+            else:
+                month = self._parse_monthly_CEMS(fpath)
+            if cf.retain_raw_CEMS:
+                self.CEMS_raw_cache[fpath] = month
             monthly_CEMS.append(month)
         annual_CEMS = (pd.concat(monthly_CEMS)
                          .sort_values(['ptag', 'tstamp'])
                          .reset_index(drop=True))
-        filled_CEMS = self._fill_missing_with_average(annual_CEMS, cf.MAX_CEMS_TO_FILL)
+        filled_CEMS = self._fill_missing_CEMS(annual_CEMS)
         filled_CEMS.set_index('tstamp', inplace=True)
         filled_CEMS['val'] = filled_CEMS['val'].clip(lower=0)
         return filled_CEMS
     
+    def stream_months(self, months=None):
+        """Yield months in order with only that month's CEMS data resident."""
+        """
+        For each month, self.CEMS_annual is set to that month's CEMS data,
+        gap-filled using the boundary hours of the neighbouring months
+        (MAX_CEMS_TO_FILL + 1 hours on each side, or CEMS_lookback_hours
+        before the month with lookback substitution), so that interpolated
+        fills match a full-year parse. Lookback-substituted values can
+        differ: monitor availability is computed over the streamed window
+        (lookback plus one month), not CEMS_availability_hours, so a
+        different percentile tier may apply. The next month's window is
+        loaded on a background thread while the caller calculates the
+        current month.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        if months is None:
+            months = list(self.months_to_calc)
+        if not months:
+            return
+        paths = self._CEMS_filepaths_by_month()
+        pad = self._CEMS_window_pad()
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            prev_tail = self._read_CEMS_hours(
+                                paths.get(months[0] - 1, []),
+                                self.ts_intervals[months[0] - self.month_offset][0] - pad,
+                                self.ts_intervals[months[0] - self.month_offset][0])
+            future = pool.submit(self._load_CEMS_window, months[0], paths, prev_tail)
+            for i, month in enumerate(months):
+                window, month_tail = future.result()
+                if i + 1 < len(months):
+                    next_month = months[i + 1]
+                    if next_month != month + 1:
+                        # non-consecutive months: read boundary hours separately
+                        start = self.ts_intervals[next_month - self.month_offset][0]
+                        month_tail = self._read_CEMS_hours(
+                                        paths.get(next_month - 1, []),
+                                        start - pad, start)
+                    future = pool.submit(self._load_CEMS_window,
+                                         next_month, paths, month_tail)
+                self.CEMS_annual = window
+                yield month
+                self.CEMS_annual = None
+    
+    def _load_CEMS_window(self, month, paths, prev_tail):
+        """Parse and gap-fill one month of CEMS, return tuple (month df, raw tail df)."""
+        ts_start, ts_end = self.ts_intervals[month - self.month_offset]
+        pad = self._CEMS_window_pad()
+        
+        month_raw  = self._read_CEMS_hours(paths.get(month, []),
+                                           ts_start - pd.Timedelta(hours=1), ts_end)
+        # lookback substitution only looks back; forward hours bound interpolation
+        next_head  = self._read_CEMS_hours(paths.get(month + 1, []), ts_end,
+                                           ts_end + pd.Timedelta(hours=cf.MAX_CEMS_TO_FILL + 1))
+        month_tail = month_raw[month_raw['tstamp'] > ts_end - pad].copy()
+        
+        parts = [df for df in [prev_tail, month_raw, next_head] if not df.empty]
+        if not parts:
+            print('    no CEMS data found for month {}'.format(month))
+            return (pd.DataFrame(columns=['ptag', 'val'],
+                                 index=pd.DatetimeIndex([], name='tstamp')),
+                    month_tail)
+        raw = (pd.concat(parts)
+                 .sort_values(['ptag', 'tstamp'])
+                 .reset_index(drop=True))
+        del parts, month_raw, next_head
+        filled = self._fill_missing_CEMS(raw, log_tag='_'+str(month).zfill(2))
+        filled = filled[(filled['tstamp'] >= ts_start) & (filled['tstamp'] <= ts_end)]
+        filled = filled.set_index('tstamp')
+        filled['val'] = filled['val'].clip(lower=0)
+        return filled, month_tail
+    
+    @staticmethod
+    def _CEMS_window_pad():
+        """Return pd.Timedelta of prior-month hours read before each streamed month."""
+        hours = cf.MAX_CEMS_TO_FILL + 1
+        if cf.CEMS_lookback_substitution:
+            hours = max(hours, cf.CEMS_lookback_hours)
+        return pd.Timedelta(hours=hours)
+    
+    def _CEMS_filepaths_by_month(self):
+        """Return dict of all CEMS filepaths ({integer month: [paths]})."""
+        paths_by_month = {}
+        for path in sorted(inputio.glob(cf.CEMS_dir+'*')):
+            month = int(path.split(cf.CEMS_dir)[-1][:2])
+            paths_by_month.setdefault(month, []).append(path)
+        return paths_by_month
+    
+    @staticmethod
+    def _read_CEMS_hours(paths, start, end):
+        """Return CEMS rows with start < tstamp <= end from list of monthly files."""
+        """
+        Hourly files are read in chunks and filtered as they stream, so
+        reading the boundary hours of a neighbouring month does not hold
+        that whole month in memory.
+        """
+        frames = []
+        for path in paths:
+            if cf.CEMS_readings_per_hour > 1:
+                df = AnnualEquipment._aggregate_subhourly_CEMS(path)
+                frames.append(df[(df['tstamp'] > start) & (df['tstamp'] <= end)])
+                continue
+            for chunk in inputio.read_csv(path, usecols=[1,2,3,5],
+                                          header=AnnualEquipment._CEMS_header(),
+                                          chunksize=cf.CEMS_chunksize):
+                chunk.columns = ['ptag', 'tstamp', 'val', 'text_flag']
+                chunk['tstamp'] = pd.to_datetime(chunk['tstamp'])
+                frames.append(chunk[(chunk['tstamp'] > start)
+                                  & (chunk['tstamp'] <= end)])
+        if not frames:
+            return pd.DataFrame(columns=['ptag', 'tstamp', 'val', 'text_flag'])
+        # repeated fall-back hour: keep first reading (see timegrid.HourlyGrid)
+        return timegrid.HourlyGrid.drop_repeated_hours(pd.concat(frames),
+                                                       keys=['ptag'])
+    
+    @staticmethod
+    def _CEMS_header():
+        """Return header row of CEMS files for pd.read_csv()."""
+        if cf.data_year == 2018:
+            return 0
+        return None
+    
     def _subset_CEMS_filepaths(self):
         """Return list of filepaths to parse based on months specified in config file."""
-        CEMS_paths_all = sorted(glob.glob(cf.CEMS_dir+'*'))
+        CEMS_paths_all = sorted(inputio.glob(cf.CEMS_dir+'*'))
         months_to_parse = [month for month in cf.months_to_calculate]
         CEMS_paths_parse = [path for path in CEMS_paths_all
                           if int(path.split(cf.CEMS_dir)[-1][:2])
@@ -418,114 +759,70 @@ class AnnualEquipment(object):
     @staticmethod
     def _parse_monthly_CEMS(path):
         """Read one month of hourly CEMS data, return pd.DataFrame."""
-        if cf.data_year == 2018:
-            hdr = 0
-        else:
-            hdr = None
-        
-        cems_df = pd.read_csv(path, usecols=[1,2,3,5], header=hdr)
+        if cf.CEMS_readings_per_hour > 1:
+            return AnnualEquipment._aggregate_subhourly_CEMS(path)
+        cems_df = inputio.read_csv(path, usecols=[1,2,3,5],
+                                   header=AnnualEquipment._CEMS_header())
         cems_df.columns = ['ptag', 'tstamp', 'val', 'text_flag']
         cems_df['tstamp'] = pd.to_datetime(cems_df['tstamp'])
-        # remove duplicate rows from daylight savings for 11/3/2019
-        cems_df = cems_df[cems_df['tstamp'].dt.minute != 2]
+        # repeated fall-back hour: keep first reading (see timegrid.HourlyGrid)
+        cems_df = timegrid.HourlyGrid.drop_repeated_hours(cems_df, keys=['ptag'])
         print('    parsed CEMS data in: '+path[:40]+'*.csv')
         return cems_df
-    
+
     @staticmethod
-    def _fill_missing_with_average(cems_df, max_consec_to_fill=cf.MAX_CEMS_TO_FILL):
-        """Fill missing hours with average of surrounding values; log filled hours."""
+    def _aggregate_subhourly_CEMS(path,
+                                  min_readings=cf.MIN_CEMS_READINGS_PER_HOUR,
+                                  chunksize=cf.CEMS_chunksize):
+        """Stream one month of sub-hourly CEMS data, return hourly-average pd.DataFrame."""
         """
-        NOTE: Because the data is sorted by both PI tag and timestamp, it is not necessary
-        to separate by PI tag. Values from one PI tag will not be used to calculate averages
-        for another, because missing values at the boundary between PI tags (first and last
-        hour of the year) can only be filled manually.
+        Raw readings are read in chunks and reduced to per-hour partial sums
+        and counts, so memory stays near the size of the hourly data. Hours
+        with fewer than `min_readings` valid readings are set to NaN and keep
+        the first text flag reported within the hour ('Insufficient Data' if
+        no flag was reported). The DST fall-back hour is averaged over both
+        clock hours instead of being dropped.
         """
-        flags_for_avg = ['PM', 'Calibration', 'Malfunction', 'CGA', 'Out of Control']
-        # list indices for all missing values
-        ixs_nan_all = list(cems_df[(cems_df['val'].isna()) & (cems_df['text_flag'].isin(flags_for_avg))].index)
-        # subset out indices with missing values from first and last hour of year
-
-        # separate consecutive missing indices into groups
-        consec_groups = {}
-        label = 0
-        consec_groups[label] = []
-        for iloc in range(len(ixs_nan_all)):
-            consec_groups[label].append(ixs_nan_all[iloc])
-            if iloc < len(ixs_nan_all) - 1:
-                if ixs_nan_all[iloc + 1] != ixs_nan_all[iloc] + 1:
-                    label += 1
-                    consec_groups[label] = []
-        # convert dict of lists to list of lists
-        consec_groups_list = [ixs for ixs in consec_groups.values()]
-
-        first = cems_df['tstamp'].min()
-        last = cems_df['tstamp'].max()
-        first_last = [first, last]
-        # subset out groups containing missing values in first or last hour of year
-        ixs_first_last = []
-        for group in consec_groups_list:
-            for ix in group:
-                if ix in first_last:
-                    ixs_first_last += group
-                    consec_groups_list.remove(group)
-                    
-        # subset based on threshold for max # of consecutive missing values to fill
-        ixs_GT_max_consec = []
-        ixs_LE_max_consec = []
-        for group in consec_groups_list:
-            if len(group) > max_consec_to_fill:
-                # flatten into one list for those not being filled
-                ixs_GT_max_consec += group
-            else:
-                # append to list of lists for those being filled
-                ixs_LE_max_consec.append(group)
-        
-        # store filling avgs for each index
-        fill_vals = {}
-        for group in ixs_LE_max_consec:
-            group = sorted(group) # ensure correct order
-            val_before = cems_df.loc[group[0] - 1,  'val']
-            val_after  = cems_df.loc[group[-1] + 1, 'val']
-            val_avg = (val_before + val_after) / 2
-            for ix in group:
-                fill_vals[ix] = val_avg
-
-        # fill missing values for those that pass the above filters
-        ixs_filled = []
-        ixs_not_filled_error = []
-        for ix, avg in fill_vals.items():
-            if math.isnan(avg):
-                ixs_not_filled_error.append(ix)
-            else:
-                cems_df.loc[ix, 'val'] = avg
-                ixs_filled.append(ix)
-        
-        ALL_not_filled = ixs_first_last + ixs_GT_max_consec + ixs_not_filled_error
+        partials = []
+        for chunk in inputio.read_csv(path, usecols=[1,2,3,5],
+                                      header=AnnualEquipment._CEMS_header(),
+                                      chunksize=chunksize):
+            chunk.columns = ['ptag', 'tstamp', 'val', 'text_flag']
+            chunk['tstamp'] = pd.to_datetime(chunk['tstamp']).dt.floor('H')
+            chunk['val'] = pd.to_numeric(chunk['val'], errors='coerce')
+            gb = chunk.groupby(['ptag', 'tstamp'], sort=False)
+            partials.append(pd.DataFrame({'val_sum'  : gb['val'].sum(),
+                                          'n_valid'  : gb['val'].count(),
+                                          'text_flag': gb['text_flag'].first()}))
+
+        # combine partial sums for hours that straddle chunk boundaries
+        hourly = (pd.concat(partials)
+                    .groupby(level=['ptag', 'tstamp'])
+                    .agg({'val_sum': 'sum', 'n_valid': 'sum', 'text_flag': 'first'}))
+
+        invalid = hourly['n_valid'] < min_readings
+        hourly['val'] = hourly['val_sum'] / hourly['n_valid']
+        hourly.loc[invalid, 'val'] = np.nan
+        hourly.loc[invalid & hourly['text_flag'].isna(),
+                   'text_flag'] = 'Insufficient Data'
+
+        cems_df = hourly.reset_index()[['ptag', 'tstamp', 'val', 'text_flag']]
+        print('    parsed CEMS data in: '+path[:40]+'*.csv'
+              +' ({} hours below {} readings)'.format(invalid.sum(), min_readings))
+        return cems_df
+
+    def _fill_missing_CEMS(self, cems_df, log_tag=''):
+        """Fill missing CEMS hours per flag/parameter strategy; log missing hours."""
         """
-        ixs_nan_all # all missing values
-        ixs_filled # values filled programatically by averaging surrounding two non-NULL values
-        ixs_first_last # missing first and last hours of year; must fill manually
-        ixs_GT_max_consec # count of consecutive missing rows above threshold; must fill manually
-        ixs_not_filled_error # catchall for anything else that could not be filled; must fill manually
-        ALL_not_filled # any values that couldn't be filled programatically
+        See dataquality.fill_missing_CEMS(); strategies are set in the
+        config file (CEMS_fill_strategies, CEMS_fill_param_strategies).
         """
-        for ixs, outfile in zip(
-            [ixs_filled, ixs_first_last, ixs_GT_max_consec, ixs_not_filled_error, ALL_not_filled],
-            ['missing_filled', 'missing_first_last', 'missing_above_threshold',
-             'missing_NOT_filled_error', 'missing_NOT_filled_ALL']
-                               ):
-            (cems_df.loc[ixs]
-                    .sort_values(by=['ptag', 'tstamp'])
-                    .to_csv(cf.log_dir+outfile+'.csv', index=False))
-        if len(ixs_filled) == len(ixs_nan_all):
-            print('  **Filled {} out of {} missing CEMS hours.'.format(
-                  str(len(ixs_filled)), str(len(ixs_nan_all)), cf.log_dir))
-        else:
-            print('  **Filled {} out of {} missing CEMS hours. \
-                  Check {} for missing hours to fill manually.'.format(
-                  str(len(ixs_filled)), str(len(ixs_nan_all)), cf.log_dir))
-        cems_df.drop(columns='text_flag', inplace=True)
-        return cems_df
+        ptag_params = (self.equip.dropna(subset=['ptag'])
+                                 .drop_duplicates(subset='ptag')
+                                 .set_index('ptag')['param']
+                                 .to_dict())
+        return dataquality.fill_missing_CEMS(cems_df, ptag_params,
+                                             cf.MAX_CEMS_TO_FILL, log_tag)
     
 #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++#
 #++EQUIPMENT-MAPPING METHODS CALLED BY self.__init__()+++++++++++++++++++++++++#
@@ -570,31 +867,6 @@ class AnnualEquipment(object):
                           .to_dict())
         return ptag_pols_dict
     
-    def _generate_equip_ptag_dict(self):
-        """Return dictionary of equipment ({unit_key: [PItags_list]})"""
-        
-        equip_df = self._parse_equip_map()
-        # subset to exclude H2S and others
-        sub = (equip_df[equip_df['param'].isin(['nox', 'so2', 'co', 'o2',
-                                                'so2_lo', 'so2_hi', 'no', 'no2'
-                                                #'co2'
-                                                ])]
-                                             .loc[:,['ptag','unit_key']]
-                                             .dropna(subset=['ptag'])
-                                             .set_index('unit_key'))
-        
-        dups = sub.index[sub.index.duplicated()].unique().tolist()
-        
-        equip_ptag_dict = {}
-        for k in sub.index.unique():
-            if k in dups:
-                equip_ptag_dict[k] = sub.loc[k].loc[
-                                            :,sub.loc['s_vac'].columns[0]].tolist()
-            else:
-                equip_ptag_dict[k] = sub.loc[k].tolist()
-        
-        return equip_ptag_dict
-    
     def _parse_equip_map(self):
         """Read CSV of equipment information and return pd.DataFrame."""
         col_map = {
@@ -606,7 +878,7 @@ class AnnualEquipment(object):
             'Units'      : 'units'
             }
         
-        equip_info = pd.read_csv(self.fpath_eqmap).rename(columns=col_map)
+        equip_info = inputio.read_csv(self.fpath_eqmap).rename(columns=col_map)
         equip_info['param'] = equip_info['param'].str.strip().str.lower()
         equip_info['units'] = equip_info['units'].str.strip().str.lower()
         equip_info.replace({'dry o2': 'o2',
@@ -647,10 +919,6 @@ class AnnualEquipment(object):
         """Return pd.Series of equipment unit emissions for specified month."""
         monthly = self.aggregate_hourly_to_monthly()
         # calculate all pollutants except for H2SO4
-        if 'calciner' in self.unit_key:
-            coke_tons = self.get_monthly_coke()['coke_tons'].sum()
-            stack_dscf = monthly.loc['dscfh']
-
         for pol in ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10']:
             # if no CEMS
             if pol not in monthly.index:
@@ -671,26 +939,12 @@ class AnnualEquipment(object):
                     
                         EF_multiplier = monthly.loc[fuel_type]
                     
-                    if 'calciner' in self.unit_key:
-                        if pol in ['co', 'voc']:
-                            EF_multiplier = coke_tons
-                        if pol in ['pm', 'pm25', 'pm10']:
-                            if 'calciner_1' in self.unit_key:
-                                EF_multiplier = coke_tons
-                            if 'calciner_2' in self.unit_key:
-                                EF_multiplier = stack_dscf / 1000            
-                    
                     monthly.loc[pol] = (EF_multiplier
                                         * self.equip_EF[self.unit_key][pol]
                                         * self.get_conversion_multiplier(pol))
             
         # now calculate H2SO4 separately
-        if 'calciner' in self.unit_key:
-            EF_multiplier = coke_tons
-            monthly.loc['h2so4'] = (EF_multiplier
-                                    * self.equip_EF[self.unit_key]['h2so4'])
-        else:
-            monthly.loc['h2so4'] = monthly.loc['so2'] * 0.026
+        monthly.loc['h2so4'] = monthly.loc['so2'] * 0.026
             
         # set other values in series
         monthly.loc['equipment'] = self.unit_key
@@ -698,29 +952,24 @@ class AnnualEquipment(object):
         monthly = monthly.reindex(self.col_name_order)
         monthly.loc[self.col_name_order[4:-1]] = monthly.loc[
                                 self.col_name_order[4:-1]] / 2000 # lbs --> tons
-        
-# begin temporary workaround        
-        # if fuel not used in emis calc, set to zero
-        if self.unit_key in ['calciner_1', 'calciner_2']:
-            monthly.loc['fuel_ng'] = 0
-# end temporary workaround
-        
         return monthly
 
-    def calculate_monthly_nvac_emissions_2019(self):
-        """Return pd.Series of nvac emissions for specified month."""
-        if self.unit_key != 'n_vac':
-            return('ERROR')
-        # all complete months with or without NOx CEMS -- normal control path
-        if self.month != 5:
+    def calculate_monthly_emissions_cems_transition(self):
+        """Return pd.Series of emissions for a month in which CEMS came into service."""
+        """
+        Hours before 'cems_in_service' (see effparams) use EFs on fuel; hours
+        after use CEMS. Months entirely with or without CEMS take the normal
+        control path.
+        """
+        cems_in_service = self.get_monthly_param('cems_in_service', default=1) != 0
+        if cems_in_service.all() or not cems_in_service.any():
             return (self.calculate_monthly_equip_emissions())
-        # NOx CEMS implemented mid-way through month
-        elif self.year == 2019 and self.month == 5:
-            hourly = self.merge_fuel_and_CEMS() 
+        else:
+            hourly = self.merge_fuel_and_CEMS()
             # pre-CEMS implementation
-            pre  = hourly.copy().loc[:'2019-05-12 14:00:00' ]
+            pre  = hourly.copy()[~cems_in_service]
             # post-CEMS implementation
-            post = hourly.copy().loc[ '2019-05-12 15:00:00':]
+            post = hourly.copy()[cems_in_service]
             post = self.convert_from_ppm(post)
 
             subsets = []
@@ -759,19 +1008,23 @@ class AnnualEquipment(object):
                 subsets.append(monthly)
             # sum values from before and after NOx CEMS is up and running
             whole = pd.concat(subsets, axis=1).sum(axis=1)
-            whole['equipment'] = 'n_vac'
+            whole['equipment'] = self.unit_key
             whole['month'] = int(whole['month'] / 2)
-            return whole        
-        return monthly
+            return whole
 
     def aggregate_hourly_to_monthly(self):
         """"""
-        # workaround for n_vac NOx CEMS transition
-        if self.unit_key == 'n_vac' and self.annual_equip.year <= 2019 and self.month < 5:
+        # no CEMS in service this month (see effparams): fuel only, EFs applied
+        if not self.get_monthly_param('cems_in_service', default=1).any():
             return pd.concat([self.get_monthly_fuel(),
                              pd.DataFrame({'no_CEMS_data' : []})],
                              axis=1).sum()
         if self.unit_key in self.equip_ptags.keys():
+            if not self.has_CEMS_data():
+                # CEMS in equipment map but no data this month (e.g. not yet installed)
+                return pd.concat([self.get_monthly_fuel(),
+                                 pd.DataFrame({'no_CEMS_data' : []})],
+                                 axis=1).sum()
             return self.convert_from_ppm().sum()
         return self.merge_fuel_and_CEMS().sum()
     
@@ -786,17 +1039,15 @@ class AnnualEquipment(object):
                             / 1000000
                             * self.f_factor_RFG
                             * 20.9 / (20.9 - both_df['o2_%']))
-# would like to break this into another method so that 
-# calculate_calciner_total_stack_flow() does not need a df passed to it as an arg
-# right now it is difficult to test, and this method is too nested
-        if 'calciner' in self.unit_key:
-            both_df = self.calculate_calciner_total_stack_flow(both_df)
+        self.record_stackflow(both_df['dscfh'])
         
         # if there are CEMS pols to convert
         ptags_list = self.equip_ptags[self.unit_key]
+        # pollutants whose tag has no data this month are left to EFs
         cems_pol_list = [self.ptags_pols[tag]
                          for tag in ptags_list
-                         if self.ptags_pols[tag] != 'o2_%']
+                         if self.ptags_pols[tag] != 'o2_%'
+                         and self.has_CEMS_data([tag])]
         for pol in cems_pol_list:
             both_df[pol.split('_')[0]] = (
                                     both_df[pol]
@@ -806,63 +1057,141 @@ class AnnualEquipment(object):
                                         # ==> lb
         return both_df
     
+    def get_monthly_ptags(self, ptags_list):
+        """Return pd.DataFrame (month hours x params) of CEMS values for PI tags."""
+        """
+        Tags in the equipment map without data are NaN columns (see
+        AnnualEquipment.CEMS_hourly).
+        """
+        CEMS_hourly = self.annual_equip.CEMS_hourly
+        return (CEMS_hourly[list(ptags_list)].iloc[self.month_slice]
+                                             .rename(columns=self.ptags_pols))
+    
+    def has_CEMS_data(self, ptags=None):
+        """Return True if any of ptags (default: unit's CEMS tags) has data this month."""
+        if ptags is None:
+            ptags = self.unit.CEMS_ptags
+        return self.annual_equip.availability.has_data(ptags, self.month)
+    
+    def CEMS_pols_without_data(self, unit_key, month):
+        """Return list of CEMS pollutants of unit whose PI tag has no data in month."""
+        """
+        Used by the whole-year engines to fall back to EFs for those
+        pollutants, as the heater path does (see has_CEMS_data()).
+        """
+        pols = [self.ptags_pols[tag].split('_')[0]
+                for tag in self.equip_ptags.get(unit_key, [])
+                if self.ptags_pols[tag] != 'o2_%'
+                and not self.availability.has_data([tag], month)]
+        return list(OrderedDict.fromkeys(pols))
+    
+    def get_monthly_param(self, parameter, default=None):
+        """Return np.array (month hours) of effective-dated parameter for this unit."""
+        return self.annual_equip.params.values(self.unit_key, parameter,
+                                               self.month_slice, default)
+    
+    @property
+    def month_slice(self):
+        """Return slice of hourly-grid positions for this month."""
+        return self.annual_equip.grid.month_slices[self.month]
+    
+    @property
+    def CEMS_hourly(self):
+        """Return wide CEMS pd.DataFrame (grid hours x PI tags) for CEMS_annual."""
+        """
+        Pivoted once per CEMS_annual object (full year, or the current
+        month in streaming mode) and rebuilt whenever CEMS_annual is
+        replaced, instead of once per unit and month. Every PI tag in the
+        equipment map has a column: tags absent from the data (e.g. CEMS
+        installed later in the year) are all NaN. The availability index
+        is built from the same frame.
+        """
+        return self.ensure_CEMS_index()[0]
+    
+    @property
+    def availability(self):
+        """Return AvailabilityIndex of CEMS_annual (see availability.py)."""
+        return self.ensure_CEMS_index()[1]
+    
+    def ensure_CEMS_index(self):
+        """Build wide CEMS frame and availability index if stale, return (wide, index)."""
+        source, wide, index = self._CEMS_hourly
+        if source is not self.CEMS_annual or wide is None:
+            wide = self.grid.pivot_long(self.CEMS_annual)
+            absent = [tag for tag in self.expected_ptags if tag not in wide.columns]
+            wide = wide.reindex(columns=list(wide.columns) + absent)
+            index = availability.AvailabilityIndex(self.grid, wide,
+                                                   self._CEMS_months(), absent)
+            self._CEMS_hourly = (self.CEMS_annual, wide, index)
+            self._record_CEMS_coverage(index)
+        return wide, index
+    
+    @property
+    def expected_ptags(self):
+        """Return list of CEMS PI tags in the equipment map plus H2S source tags."""
+        ptags = list(self.equip['ptag'].dropna().unique())
+        return ptags + [tag for tag in cf.h2s_source_ptags.values() if tag not in ptags]
+    
+    def _CEMS_months(self):
+        """Return integer months held in CEMS_annual (current month if streaming)."""
+        if self.CEMS_annual is None:
+            return []
+        if cf.streaming_mode:
+            present = set(self.CEMS_annual.index.month)
+            return [month for month in self.months_to_calc if month in present]
+        return list(self.months_to_calc)
+    
+    def _record_CEMS_coverage(self, index):
+        """Merge months of `index` into CEMS_coverage, add coverage report to QA sink."""
+        if not index.months:
+            return
+        coverage = index.coverage
+        if self.CEMS_coverage is not None:
+            coverage = coverage.combine_first(self.CEMS_coverage)
+        self.CEMS_coverage = coverage[sorted(coverage.columns)]
+        qasink.sink.add('CEMS_coverage.csv',
+                        availability.coverage_report(self.CEMS_coverage, self.equip))
+    
+    @property
+    def unit(self):
+        """Return registry entry (UnitInfo) for this emissions unit."""
+        return self.annual_equip.registry[self.unit_key]
+    
+    def record_stackflow(self, dscfh):
+        """Buffer hourly stack flow for this unit and month in the stack-flow store."""
+        if cf.write_stackflow:
+            stackflow_store.store.record(self.annual_equip.year, self.month,
+                                         self.unit_key, dscfh)
+    
     def merge_fuel_and_CEMS(self):
         """Merge fuel and CEMS data, return pd.DataFrame."""
-        return pd.concat([self.get_monthly_fuel(),
-                          self.get_monthly_CEMS()],
-                          axis=1)
-    
-    def get_monthly_PSAstack(self):
-        """Return pd.DataFrame of emis unit stack flow for specified month."""
-        month_stack = (self.PSAstack_annual.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1]])
-        return month_stack
+        return self.join_positional([self.get_monthly_fuel(),
+                                     self.get_monthly_CEMS()])
     
-    def calculate_calciner_total_stack_flow(self, df1):
-        """Return pd.DataFrame of calciner emissions."""
+    @staticmethod
+    def join_positional(frames):
+        """Return pd.DataFrame of the columns of frames, on the first frame's index."""
         """
-        'Equation 2' from MAR used for calciner_2:
-        stack flow = 1823.2 * calcinced coke + 28162
-          (ACFM)                  (STPH)      (ACFM)
+        Month slices of grid-aligned data cover the same hours, so columns
+        are joined by position rather than by index alignment. Empty frames
+        (e.g. no CEMS) contribute NaN columns.
         """
-        monthly_coke = self.get_monthly_coke()
-        df2 = pd.concat([df1, monthly_coke], axis=1)
-        
-        if self.unit_key == 'calciner_1':
-# TODO: change to dynamic, not hardcoded...they change yearly w/ EFs
-            if self.year < 2019:
-                    stack_flow = 98055 # dscf / ton coke
-            elif self.year >= 2019:
-                if self.month < 9: 
-                    stack_flow = 98055 # dscf / ton coke
-                if self.month >= 9:
-                    stack_flow = 117156 # dscf / ton coke    
-            df2['WESP_flow'] = df2['coke_tons'] * stack_flow
-        
-        if self.unit_key == 'calciner_2':
-            stack_flow = 1823.2 # acfm
-            prod_rate  = 28162  # unitless?
-            dscf_acf   = 0.669  # dscf per acf conversion factor
-            
-            # must be multiplied by 60 to convert from /min to /hr
-            df2['WESP_flow'] = ((df2['coke_tons'] * stack_flow + prod_rate)
-                                 * dscf_acf * 60)
-
-        df2['dscfh'] = df2['WESP_flow'] + df2['dscfh']
-        return df2    
+        joined = pd.DataFrame(index=frames[0].index)
+        for df in frames:
+            for col in df.columns:
+                joined[col] = df[col].values if len(df) else np.nan
+        return joined
+    
+    def get_monthly_PSAstack(self):
+        """Return pd.DataFrame of emis unit stack flow for specified month."""
+        return self.PSAstack_annual.iloc[self.month_slice]
     
     def get_conversion_multiplier(self, pol):
         """Pass pollutant name, return float multiplier to convert emissions to lbs."""
         if (self.EFunits.loc[self.unit_key]
                         .loc[pol]
                         .loc['units'] == 'lb/mmbtu'):
-            if self.unit_key in ['coker_1', 'coker_2', 'coker_e', 'coker_w']:
-                multiplier = 1/1000 * self.HHV_cokerFG
-            elif self.unit_key == 'crude_vtg':
-                multiplier = 1/1000 * self.HHV_CVTG
-            else:
-                multiplier = 1/1000 * self.HHV_RFG
+            multiplier = 1/1000 * getattr(self, 'HHV_'+self.unit.HHV_source)
         elif (self.EFunits.loc[self.unit_key]
                           .loc[pol]
                           .loc['units'] == 'lb/mscf'):
@@ -886,75 +1215,24 @@ class AnnualEquipment(object):
     
     def get_monthly_CEMS(self):
         """Return pd.DataFrame of emis unit CEMS data for specified month."""
-        CEMS_annual = self.annual_equip.CEMS_annual.copy()
         if self.unit_key in self.equip_ptags.keys():
-            ptags_list = self.equip_ptags[self.unit_key]
-            # subset PItags of interest
-            sub = CEMS_annual[CEMS_annual['ptag'].isin(ptags_list)]
-            sub.reset_index(inplace=True)
-            sub_pivot = (sub.pivot(index='tstamp',
-                                   columns="ptag",
-                                   values="val")
-                            .rename(columns=self.ptags_pols))
-            sub2_pivot = sub_pivot.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1]]
-            return sub2_pivot
+            return self.get_monthly_ptags(self.equip_ptags[self.unit_key])
         else: # empty df if no CEMS
             no_CEMS = pd.DataFrame({'no_CEMS_data' : []})
             return no_CEMS        
     
-    def get_monthly_coke(self):
-        """Return pd.DataFrame of emis unit coke usage for specified month."""
-        month_coke = (self.coke_annual.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                                self.unit_key])
-        month_coke = pd.DataFrame(month_coke)
-        month_coke.columns = ['coke_tons']
-        return month_coke
-    
     def get_monthly_fuel(self):
         """Return pd.DataFrame of emis unit fuel usage for specified month."""
-        fuel_data = self.annual_equip.fuel_annual
-        
-        if self.unit_key == 'h2_plant_2': # only natural gas
-            ng_fuel_ser = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            self.unit_key])
-            fuel_df = ng_fuel_ser.to_frame('fuel_ng')
-            fuel_df['fuel_rfg'] = 0
-            fuel_df = fuel_df[['fuel_rfg', 'fuel_ng']] # reorder for consistency
-        elif self.unit_key == 'calciner_1': # rfg and natural gas
-            rfg_fuel_ser = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            '70 (RFG)'])
-            ng_fuel_ser  = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            '70 (NG)'])
-            fuel_df = pd.concat([rfg_fuel_ser, ng_fuel_ser], axis=1)
-            fuel_df.columns = ['fuel_rfg', 'fuel_ng']
-        elif self.unit_key == 'calciner_2': # rfg and natural gas
-            rfg_fuel_ser = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            '71 (RFG)'])
-            ng_fuel_ser  = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            '71 (NG)'])
-            fuel_df = pd.concat([rfg_fuel_ser, ng_fuel_ser], axis=1)
-            fuel_df.columns = ['fuel_rfg', 'fuel_ng']
-        else: # only rfg
-            rfg_fuel_ser = (fuel_data.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1],
-                            self.unit_key])
-            fuel_df = rfg_fuel_ser.to_frame('fuel_rfg')
-            fuel_df['fuel_ng'] = 0
+        """
+        Fuel columns per unit come from the registry: RFG metered under the
+        unit key for most units, NG only for h2_plant_2, and RFG plus NG
+        for the calciners.
+        """
+        fuel_data = self.annual_equip.fuel_annual.iloc[self.month_slice]
+        fuel_df = pd.DataFrame(index=fuel_data.index)
+        for fuel, col in [('fuel_rfg', self.unit.fuel_cols['fuel_rfg']),
+                          ('fuel_ng' , self.unit.fuel_cols['fuel_ng'])]:
+            fuel_df[fuel] = fuel_data[col] if col is not None else 0
         return fuel_df
 
 #### BEGIN: methods for calculating toxics
@@ -966,13 +1244,10 @@ class AnnualEquipment(object):
         mult_fuel = base_ser.loc[fuel]
         tox = self.toxicsEFs.copy()
         tox.set_index('pollutant', inplace=True)
-        if self.unit_key in ['calciner_1', 'calciner_2']:
-            tox['lbs'] = tox['ef'] * mult_fuel
-        else:
-            mult_HHV = self.get_HHV_multiplier_for_toxics()
-            tox.loc[tox['units']=='lb/mmscf', 'lbs'] = tox['ef'] * mult_fuel
-            tox.loc[tox['units']=='lb/mmbtu', 'lbs'] = tox['ef'] * mult_fuel * mult_HHV
-            tox['lbs'] = tox['lbs'] / 1000 # unit conversion b/c fuel in mscf
+        mult_HHV = self.get_HHV_multiplier_for_toxics()
+        tox.loc[tox['units']=='lb/mmscf', 'lbs'] = tox['ef'] * mult_fuel
+        tox.loc[tox['units']=='lb/mmbtu', 'lbs'] = tox['ef'] * mult_fuel * mult_HHV
+        tox['lbs'] = tox['lbs'] / 1000 # unit conversion b/c fuel in mscf
         tox_ordered = tox['lbs'].reindex(self.get_reindexer_for_toxics())
         tox_ser = pd.concat([base_ser, tox_ordered]).replace(np.nan, 0)
         return tox_ser
@@ -982,38 +1257,23 @@ class AnnualEquipment(object):
         fuel_type = self.get_fuel_type_for_toxics()
         base_ser = pd.Series({'equipment': self.unit_key,
                               'month'    : self.month})
-        if self.unit_key in ['calciner_1', 'calciner_2']:
-            base_ser.loc[fuel_type] = self.get_monthly_coke()[fuel_type].sum()
-        else: 
-            base_ser.loc[fuel_type] = self.monthly_emis.loc[fuel_type]        
+        base_ser.loc[fuel_type] = self.monthly_emis.loc[fuel_type]        
         return base_ser    
     
     def get_fuel_type_for_toxics(self):
         """Return string indicating fuel type to use for calculating toxics."""
-        if self.unit_key in ['calciner_1', 'calciner_2']:
-            return 'coke_tons'
-        # elif self.unit_key == 'h2_flare':
+        # if self.unit_key == 'h2_flare':
             # return 'fuel_ng'
-        else:
-            return 'fuel_rfg'
+        return 'fuel_rfg'
     
     def get_HHV_multiplier_for_toxics(self):
         """Return HHV multiplier to convert mscf to mmBtu."""
-        if self.unit_key in ['coker_1', 'coker_2', 'coker_e', 'coker_w']:
-            return self.HHV_cokerFG
-        elif self.unit_key == 'crude_vtg':
-            return self.HHV_CVTG
-        # elif self.unit_key == 'h2_flare':  ## not currently calculating toxics for flare
-            # return self.HHV_flare
-        else:
-            return self.HHV_RFG
+        # not currently calculating toxics for flare
+        return getattr(self, 'HHV_'+self.unit.HHV_source)
     
     def get_reindexer_for_toxics(self):
         """Return correct toxics order for WEIRS."""
-        if self.unit_key in ['calciner_1', 'calciner_2']:
-            return cf.calciner_toxics_with_EFs
-        else:
-            return cf.toxics_with_EFs
+        return cf.toxics_with_EFs
     
 #### END: methods for calculating toxics
 
@@ -1158,30 +1418,14 @@ class AnnualEquipment(object):
     
     def get_monthly_h2s(self):
         """Return float of average monthly H2S CEMS data (ppm)."""
-        all_cems = self.annual_equip.CEMS_annual
-        h2s_data = self.return_h2s_cems_source()
-        if h2s_data == 'coker_h2s':
-            h2s_ppm = all_cems[all_cems['ptag'] == '12AI3751.PV']
-        elif h2s_data == 'cokerOLD_h2s':
-            h2s_ppm = all_cems[all_cems['ptag'] == '12AI55A.PV']
-        elif h2s_data == 'CVTG_h2s':
-            h2s_ppm = all_cems[all_cems['ptag'] == '10AI136A.PV']
-        elif h2s_data == 'RFG_h2s':
-            h2s_ppm = all_cems[all_cems['ptag'] == '30AI568A.PV']
-        h2s_monthly = h2s_ppm.loc[self.ts_interval[0]:self.ts_interval[1]]
-        return h2s_monthly['val'].mean()
+        if not self.has_CEMS_data([self.unit.h2s_ptag]):
+            return np.nan
+        CEMS_hourly = self.annual_equip.CEMS_hourly
+        return CEMS_hourly[self.unit.h2s_ptag].iloc[self.month_slice].mean()
     
     def return_h2s_cems_source(self):
         """Return string indicating which H2S cems data to use."""
-        if self.unit_key in self.annual_equip.h2s_cems_map['uses_coker_h2s']:
-            h2s_data_source = 'coker_h2s'
-        elif self.unit_key in self.annual_equip.h2s_cems_map['uses_cokerOLD_h2s']:
-            h2s_data_source = 'cokerOLD_h2s'
-        elif self.unit_key in self.annual_equip.h2s_cems_map['uses_CVTG_h2s']:
-            h2s_data_source = 'CVTG_h2s'
-        else:
-            h2s_data_source = 'RFG_h2s'
-        return h2s_data_source
+        return self.unit.h2s_source
 
 #### END: methods for calculating H2S
        
@@ -1218,20 +1462,22 @@ class MonthlyHB(AnnualHB):
         self.RFG_monthly    = ff.get_monthly_lab_results(self.annual_equip.RFG_annual, self.ts_interval)
         self.CVTG_monthly   = ff.get_monthly_lab_results(self.annual_equip.CVTG_annual, self.ts_interval)
         # fuel higher heating values (float)
-        self.HHV_RFG        = ff.calculate_monthly_HHV(self.RFG_monthly)
-        self.HHV_CVTG       = ff.calculate_monthly_HHV(self.CVTG_monthly)
+        self.HHV_RFG        = ff.calculate_monthly_HHV(self.RFG_monthly, fuel='RFG')
+        self.HHV_CVTG       = ff.calculate_monthly_HHV(self.CVTG_monthly, fuel='CVTG')
         # fuel f-factors (floats) calculated using static chem data
         self.f_factor_RFG   = ff.calculate_monthly_f_factor(
                                             self.RFG_monthly,
                                             self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='RFG')
         self.f_factor_CVTG  = ff.calculate_monthly_f_factor(
                                             self.CVTG_monthly,
                                             self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='CVTG')
         
-        if self.unit_key == 'n_vac' and self.annual_equip.year == 2019:
-            self.monthly_emis = self.calculate_monthly_nvac_emissions_2019()
+        if self.annual_equip.params.has(self.unit_key, 'cems_in_service'):
+            self.monthly_emis = self.calculate_monthly_emissions_cems_transition()
         else:
             self.monthly_emis   = self.calculate_monthly_equip_emissions()
         self.monthly_toxics   = self.calculate_monthly_toxics()
@@ -1281,18 +1527,20 @@ class MonthlyCoker(AnnualCoker):
                                             self.ts_interval)
         
         # fuel higher heating values (floats)
-        self.HHV_NG         = ff.calculate_monthly_HHV(self.NG_monthly)
-        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly)
+        self.HHV_NG         = ff.calculate_monthly_HHV(self.NG_monthly, fuel='NG')
+        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly, fuel='cokerFG')
         
         # fuel f-factors (floats) calculated using static chem data
         self.f_factor_NG    = ff.calculate_monthly_f_factor(
                                             self.NG_monthly,
                                             self.annual_equip.fpath_NG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='NG')
         self.f_factor_cokerFG = ff.calculate_monthly_f_factor(
                                             self.cokerFG_monthly,
                                             self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='cokerFG')
         if self.unit_key == 'coker_e':
             self.coker_dat = self.annual_eu.coker_dat_tup[0]
         if self.unit_key == 'coker_w':
@@ -1310,47 +1558,46 @@ class MonthlyCoker(AnnualCoker):
         monthly.rename(index={'cokerfg_mscfh': 'fuel_rfg',
                               'pilot_mscfh'  : 'fuel_ng'},
                               inplace=True)
-        if (self.annual_equip.year == 2019 
-            and (
-                 self.month >= 4 and self.unit_key == 'coker_e'
-                 ) or (
-                 self.month >= 5 and self.unit_key == 'coker_w'
-                 )
-            ):
-                for pol in ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10']:
-                    # if no CEMS
-                    if pol not in monthly.index:
-                        # need this logic to avoid errors while PM25 & PM 10 EFs are added
-                        if pol not in self.EFunits.loc[self.unit_key].index:
-                            monthly.loc[pol] = -9999 * 2000 / 12 # error flag that will show up as -9999
+        # EF-based pollutants only for hours in service (see effparams)
+        in_service = self.get_monthly_param('in_service', default=1) != 0
+        if in_service.any():
+            if in_service.all():
+                fuel_ng = monthly.loc['fuel_ng']
+            else:
+                fuel_ng = hourly['pilot_mscfh'][in_service].sum()
+            for pol in ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10']:
+                # if no CEMS
+                if pol not in monthly.index:
+                    # need this logic to avoid errors while PM25 & PM 10 EFs are added
+                    if pol not in self.EFunits.loc[self.unit_key].index:
+                        monthly.loc[pol] = -9999 * 2000 / 12 # error flag that will show up as -9999
+                    else:
+                        if (self.EFunits.loc[self.unit_key]
+                                        .loc[pol]
+                                        .loc['units'] == 'lb/hr'):
+                            # don't multiply by fuel quantity if EF is in lb/hr
+                            EF_multiplier = 1
                         else:
-                            if (self.EFunits.loc[self.unit_key]
-                                            .loc[pol]
-                                            .loc['units'] == 'lb/hr'):
-                                # don't multiply by fuel quantity if EF is in lb/hr
-                                EF_multiplier = 1
-                            else:
-                                fuel_type = 'fuel_ng'
-                                EF_multiplier = monthly.loc[fuel_type]
+                            EF_multiplier = fuel_ng
 
-                                monthly.loc[pol] = (EF_multiplier
-                                                * self.equip_EF[self.unit_key][pol]
-                                                * self.get_conversion_multiplier(pol))
+                            monthly.loc[pol] = (EF_multiplier
+                                            * self.equip_EF[self.unit_key][pol]
+                                            * self.get_conversion_multiplier(pol))
 # TODO: refactor this hacky temp workaround...
-                # add in VOC from nat gas fuel flow
-                # use emission factors from 'h2_plant_2'
-                efs = self.EFs
-                ng_voc_ef    = efs[(efs['unit_id'] == '46') &
-                                   (efs['pollutant'] == 'voc')
-                                  ].loc[:,'ef'].iloc[0]
-                ng_voc_units = efs[(efs['unit_id'] == '46') &
-                                   (efs['pollutant'] == 'voc')
-                                  ].loc[:,'units'].iloc[0]
-                if ng_voc_units == 'lb/mmscf':
-                    monthly['voc'] = monthly['voc'] + (monthly['fuel_ng']
-                                                        * ng_voc_ef / 1000)
-                else:
-                    print('***WARNING: VOC emission factor not in lb/mmscf***')
+            # add in VOC from nat gas fuel flow
+            # use emission factors from 'h2_plant_2'
+            efs = self.EFs
+            ng_voc_ef    = efs[(efs['unit_id'] == '46') &
+                               (efs['pollutant'] == 'voc')
+                              ].loc[:,'ef'].iloc[0]
+            ng_voc_units = efs[(efs['unit_id'] == '46') &
+                               (efs['pollutant'] == 'voc')
+                              ].loc[:,'units'].iloc[0]
+            if ng_voc_units == 'lb/mmscf':
+                monthly['voc'] = monthly['voc'] + (fuel_ng
+                                                    * ng_voc_ef / 1000)
+            else:
+                print('***WARNING: VOC emission factor not in lb/mmscf***')
         else:
             monthly.loc['pm']    = 0
             monthly.loc['pm25']  = 0
@@ -1370,6 +1617,7 @@ class MonthlyCoker(AnnualCoker):
         if both_df.shape[0] == 0:
             return both_df
         else:       
+            self.record_stackflow(both_df['dscfh'])
             ptags_list = self.equip_ptags[self.unit_key]
             cems_pol_list = ['nox_ppm', 'co_ppm', 'so2_ppm']
                     # cems_pol_list = [self.ptags_pols[tag] for tag in ptags_list
@@ -1387,16 +1635,16 @@ class MonthlyCoker(AnnualCoker):
 #      the issue of not having yearly data for both datasets
     def merge_fuel_and_CEMS_newcoker(self):
         """Merge fuel and CEMS data, return pd.DataFrame."""
-        monthly_CEMS = self.get_monthly_CEMS_newcoker()
         monthly_fuel = self.get_monthly_fuel_newcoker()
-
-        if monthly_CEMS.sum().sum() == 0:
+        if self.has_CEMS_data(self.equip_ptags['coker_e']):
+            monthly_CEMS = self.get_monthly_CEMS_newcoker()
+        else:
             # make a dummy DataFrame with same index for merging
             monthly_CEMS = pd.DataFrame(index=monthly_fuel.index)
             for col in ['o2_%', 'nox_ppm', 'co_ppm', 'so2_ppm']:
-                monthly_CEMS[col] = pd.np.nan
+                monthly_CEMS[col] = np.nan
         monthly_fuel.drop(columns='o2_%', inplace=True) # so that column not duplicated when merged
-        merged = pd.merge(monthly_CEMS, monthly_fuel, left_index=True, right_index=True)
+        merged = self.join_positional([monthly_CEMS, monthly_fuel])
         
         merged['cokerfg_dscfh'] = (merged['cokerfg_mscfh']
                             * 1000 
@@ -1416,24 +1664,13 @@ class MonthlyCoker(AnnualCoker):
         return merged
     
     def get_monthly_fuel_newcoker(self):
-        annual_dat = self.coker_dat
-        monthly_dat = annual_dat.loc[
-                                self.ts_interval[0]:
-                                self.ts_interval[1]]
-        return monthly_dat.copy()
+        return self.coker_dat.iloc[self.month_slice].copy()
     
     def get_monthly_CEMS_newcoker(self):
         """Return pd.DataFrame of emis unit CEMS data for specified month."""
-        CEMS_annual = self.annual_equip.CEMS_annual.copy()
         if True:#self.unit_key in self.equip_ptags.keys():
             ptags_list = self.equip_ptags['coker_e']#self.unit_key]
-            # subset PItags of interest
-            sub = CEMS_annual[CEMS_annual['ptag'].isin(ptags_list)]
-            sub.reset_index(inplace=True)
-            sub_pivot = (sub.pivot(index='tstamp',
-                                   columns="ptag",
-                                   values="val")
-                            .rename(columns=self.ptags_pols))
+            sub_pivot = self.get_monthly_ptags(ptags_list)
             sub_pivot['nox_ppm'] = sub_pivot['no_ppm'] + sub_pivot['no2_ppm']
             sub_pivot.drop(columns=['no_ppm', 'no2_ppm'], inplace=True)                            
             
@@ -1442,10 +1679,7 @@ class MonthlyCoker(AnnualCoker):
             sub_pivot['so2_ppm'] = sub_pivot['so2_lo_ppm']
             sub_pivot.loc[mask, 'so2_ppm'] = sub_pivot.loc[mask, 'so2_hi_ppm']
             sub_pivot.drop(columns=['so2_lo_ppm', 'so2_hi_ppm'], inplace=True)
-            sub2_pivot = sub_pivot.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1]]
-            return sub2_pivot
+            return sub_pivot
         else: # empty df if no CEMS
             no_CEMS = pd.DataFrame({'no_CEMS_data' : []})
             return no_CEMS
@@ -1482,7 +1716,7 @@ class MonthlyCokerOLD(AnnualCoker):
                                             self.annual_equip.cokerFG_annual,
                                             self.ts_interval)
         
-        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly)
+        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly, fuel='cokerFG')
         
         self.monthly_emis     = self.calculate_monthly_equip_emissions()
         self.monthly_toxics   = self.calculate_monthly_toxics()
@@ -1497,7 +1731,7 @@ class AnnualCoker_CO2(AnnualEquipment):
     def unmerge_annual_ewcoker(self):
         """Unmerge E/W coker data."""
         merged_df = self.implement_pilot_gas_logic()
-        merged_df = merged_df.reindex(self.annual_equip._generate_date_range())
+        merged_df = self.annual_equip.grid.conform(merged_df)
 
         e_cols = []
         w_cols = []
@@ -1557,8 +1791,8 @@ class AnnualCoker_CO2(AnnualEquipment):
     def parse_annual_ewcoker(self, cols, pilot=False):
         """Read in raw coker data."""
         sheet = 'East & West Coker Data'
-        dat = pd.read_excel(self.annual_equip.fpath_ewcoker,
-                            sheet_name=sheet, usecols=cols, header=3)
+        dat = inputio.read_excel(self.annual_equip.fpath_ewcoker,
+                                 sheet_name=sheet, usecols=cols, header=3)
         dat.replace('--', pd.np.nan, inplace=True)
 
         if not pilot:
@@ -1596,32 +1830,27 @@ class MonthlyCoker_CO2(AnnualCoker_CO2):
                                             self.ts_interval)
         
         # fuel higher heating values (floats)
-        self.HHV_NG         = ff.calculate_monthly_HHV(self.NG_monthly)
-        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly)
+        self.HHV_NG         = ff.calculate_monthly_HHV(self.NG_monthly, fuel='NG')
+        self.HHV_cokerFG    = ff.calculate_monthly_HHV(self.cokerFG_monthly, fuel='cokerFG')
         
         # fuel f-factors (floats) calculated using static chem data
         self.f_factor_NG    = ff.calculate_monthly_f_factor(
                                             self.NG_monthly,
                                             self.annual_equip.fpath_NG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='NG')
         self.f_factor_cokerFG = ff.calculate_monthly_f_factor(
                                             self.cokerFG_monthly,
                                             self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
+                                            self.ts_interval,
+                                            fuel='cokerFG')
         self.monthly_emis   = self.calculate_monthly_equip_emissions()
                                             
     def calculate_monthly_equip_emissions(self):
-        """Write hourly combined fuel csv, return monthly emissions as pd.Series."""
+        """Store hourly combined stack flow, return monthly emissions as pd.Series."""
         hourly = self.calculate_monthly_co2_emissions()
-        # write csv of hourly combined fuel flow for QA
-        outname = (
-                    cf.out_dir_child
-                  + str(self.annual_equip.year) + '_'
-                  + str(self.month).zfill(2) + '_'
-                  + 'stackflow' + '_'
-                  + self.unit_key + '.csv'
-                  )
-        hourly['stack_dscfh'].to_csv(outname, header=True)
+        # hourly combined stack flow for QA / GHG inputs
+        self.record_stackflow(hourly['stack_dscfh'])
         monthly = hourly.sum()
         monthly.loc['equipment'] = self.unit_key
         monthly.loc['month'] = self.month
@@ -1677,10 +1906,25 @@ class MonthlyCoker_CO2(AnnualCoker_CO2):
         df['stack_dscfh'] = df['cokerfg_dscfh'] + df['pilot_dscfh']
         df['co2']   = df['co2_%'] * df['stack_dscfh'] * 5.18E-7
 
-        return df.loc[self.ts_interval[0]:self.ts_interval[1]]
+        return df.iloc[self.month_slice]
 
 class AnnualCalciner(AnnualEquipment):
-    """Parse and store annual calciner data."""
+    """Parse annual calciner data; calculate calciner emissions a year at a time."""
+    """
+    Whole-year engine: hourly WESP flow, total stack flow and CEMS mass
+    emissions of a calciner are computed for all months in one array pass
+    over the hourly grid (calculate_annual_hourly), then summed by month.
+    Coke-based EF emissions and calciner toxics are computed from the same
+    monthly sums, and the hourly intermediate is kept so that criteria and
+    toxics calculations share it.
+    """
+    # calciner_2 stack flow, 'Equation 2' from MAR:
+    # stack flow = 1823.2 * calcinced coke + 28162
+    #   (ACFM)                  (STPH)      (ACFM)
+    stack_flow_calciner_2 = 1823.2 # acfm
+    prod_rate_calciner_2  = 28162  # unitless?
+    dscf_acf              = 0.669  # dscf per acf conversion factor
+    
     def __init__(self, annual_equip):
         """Constructor for parsing annual calciner data."""
         self.annual_equip = annual_equip
@@ -1688,10 +1932,12 @@ class AnnualCalciner(AnnualEquipment):
 
         self.coke_annual    = self.parse_annual_coke()
                              # df: hourly coke data for all calciners
+        self.hourly_cache   = {}
+                             # dict: {unit_key: (cache key, hourly df, {month: HHV_RFG})}
 
     def parse_annual_coke(self):
         """Read annual coke data for calciners, return pd.DataFrame."""
-        coke_df = pd.read_excel(self.fpath_coke, skiprows=[0,1], header=[0,1])
+        coke_df = inputio.read_excel(self.fpath_coke, skiprows=[0,1], header=[0,1])
         coke_df.columns = coke_df.columns.droplevel(1)
         coke_df.columns.name = 'unit_key'
         
@@ -1708,10 +1954,166 @@ class AnnualCalciner(AnnualEquipment):
         # change STPD --> STPH
         coke_df = coke_df/24
         coke_df = coke_df.clip(lower=0)
-        return coke_df
+        return self.annual_equip.grid.conform(coke_df)
+
+    def calculate_annual(self, unit_key, months):
+        """Return dict of {month: pd.Series} results ('criteria', 'toxics') for a calciner."""
+        hourly, HHV = self.calculate_annual_hourly(unit_key, months)
+        monthly = hourly.drop(columns='month').groupby(hourly['month']).sum()
+        # hours where (>1 mscf) fuel was burned, for EFs in lb/hr
+        hours_burned = (hourly['fuel_rfg'] > 1).groupby(hourly['month']).sum()
+        results = {'criteria': {}, 'toxics': {}}
+        for month in months:
+            # pollutants without CEMS data this month are calculated from EFs
+            no_data = self.annual_equip.CEMS_pols_without_data(unit_key, month)
+            results['criteria'][month] = self.calculate_monthly_calciner_emissions(
+                                             unit_key, month,
+                                             monthly.loc[month].drop(labels=no_data),
+                                             HHV[month], hours_burned.loc[month])
+            results['toxics'][month]   = self.calculate_monthly_calciner_toxics(
+                                             unit_key, month,
+                                             monthly.loc[month, 'coke_tons'])
+        return results
+    
+    def calculate_annual_hourly(self, unit_key, months):
+        """Return hourly pd.DataFrame of calciner flows and CEMS emissions for months."""
+        """
+        Also returns {month: HHV_RFG}. The result is cached and reused while
+        the CEMS data, months and lab-value overrides are unchanged.
+        """
+        ae = self.annual_equip
+        key = (tuple(months), tuple(sorted(ff.HHV_overrides.items())),
+               tuple(sorted(ff.f_factor_overrides.items())))
+        cached = self.hourly_cache.get(unit_key)
+        if (cached is not None and cached[0][0] is ae.CEMS_annual
+                and cached[0][1:] == key):
+            return cached[1], cached[2]
+        
+        positions = np.concatenate([np.arange(len(ae.grid))[ae.grid.month_slices[month]]
+                                    for month in months])
+        unit = ae.registry[unit_key]
+        hourly = pd.DataFrame({'month': ae.grid.index.month[positions]},
+                              index=ae.grid.index[positions])
+        for fuel_type in ['fuel_rfg', 'fuel_ng']:
+            col = unit.fuel_cols[fuel_type]
+            hourly[fuel_type] = (ae.fuel_annual[col].values[positions]
+                                 if col is not None else 0)
+        hourly['coke_tons'] = self.coke_annual[unit_key].values[positions]
+        CEMS_hourly = ae.CEMS_hourly
+        for ptag in ae.equip_ptags.get(unit_key, []):
+            # every expected tag has a column (NaN if absent from the data)
+            hourly[ae.ptags_pols[ptag]] = CEMS_hourly[ptag].values[positions]
+        
+        # monthly RFG lab values, broadcast to hours
+        HHV, f_factor = {}, {}
+        for month in months:
+            ts_interval = ae.ts_intervals[month - ae.month_offset]
+            RFG_monthly = ff.get_monthly_lab_results(ae.RFG_annual, ts_interval)
+            HHV[month]      = ff.calculate_monthly_HHV(RFG_monthly, fuel='RFG')
+            f_factor[month] = ff.calculate_monthly_f_factor(RFG_monthly,
+                                                            ae.fpath_FG_chem,
+                                                            ts_interval,
+                                                            fuel='RFG')
+        hourly['dscfh'] = (hourly['fuel_rfg']
+                           * 1000
+                           * hourly['month'].map(HHV)
+                           / 1000000
+                           * hourly['month'].map(f_factor)
+                           * 20.9 / (20.9 - hourly['o2_%']))
+        hourly['WESP_flow'] = self.calculate_WESP_flow(unit_key,
+                                                       hourly['coke_tons'],
+                                                       positions)
+        hourly['dscfh'] = hourly['WESP_flow'] + hourly['dscfh']
+        if cf.write_stackflow:
+            for month, dscfh in hourly['dscfh'].groupby(hourly['month']):
+                stackflow_store.store.record(ae.year, month, unit_key, dscfh)
+        
+        for param in [ae.ptags_pols[tag] for tag in ae.equip_ptags.get(unit_key, [])
+                      if ae.ptags_pols[tag] in hourly.columns
+                      and ae.ptags_pols[tag] != 'o2_%']:
+            pol = param.split('_')[0]
+            hourly[pol] = (hourly[param]
+                           * PPM_CONV_FACTS[pol] # ==> lb/scf
+                           * hourly['dscfh'])    # ==> lb
+        
+        self.hourly_cache[unit_key] = ((ae.CEMS_annual,) + key, hourly, HHV)
+        return hourly, HHV
+    
+    def calculate_WESP_flow(self, unit_key, coke_tons, positions):
+        """Return hourly WESP stack flow (dscfh) from hourly coke rate (tons)."""
+        if unit_key == 'calciner_1':
+            # dscf / ton coke, hourly from effective-dated parameters
+            return coke_tons * self.annual_equip.params.values(
+                                   unit_key, 'wesp_dscf_per_ton', positions)
+        # must be multiplied by 60 to convert from /min to /hr
+        return ((coke_tons * self.stack_flow_calciner_2 + self.prod_rate_calciner_2)
+                * self.dscf_acf * 60)
+    
+    def calculate_monthly_calciner_emissions(self, unit_key, month, monthly,
+                                             HHV_RFG, hours_burned):
+        """Return pd.Series of calciner emissions from monthly sums of hourly data."""
+        EFunits  = self.annual_equip.EFs[month][1]
+        equip_EF = self.annual_equip.EFs[month][2]
+        coke_tons  = monthly.loc['coke_tons']
+        stack_dscf = monthly.loc['dscfh']
+        
+        # calculate all pollutants except for H2SO4
+        for pol in ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10']:
+            # if no CEMS
+            if pol in monthly.index:
+                continue
+            # need this logic to avoid errors while PM25 & PM 10EFs are added
+            if pol not in EFunits.loc[unit_key].index:
+                monthly.loc[pol] = -9999 * 2000 / 12 # error flag that will show up as -9999
+                continue
+            units = EFunits.loc[unit_key].loc[pol].loc['units']
+            if pol in ['co', 'voc']:
+                EF_multiplier = coke_tons
+            elif pol in ['pm', 'pm25', 'pm10'] and unit_key == 'calciner_1':
+                EF_multiplier = coke_tons
+            elif pol in ['pm', 'pm25', 'pm10'] and unit_key == 'calciner_2':
+                EF_multiplier = stack_dscf / 1000
+            elif units == 'lb/hr':
+                # don't multiply by fuel quantity if EF is in lb/hr
+                EF_multiplier = 1
+            else:
+                EF_multiplier = monthly.loc['fuel_rfg']
+            conversion = {'lb/mmbtu': 1/1000 * HHV_RFG,
+                          'lb/mscf' : 1,
+                          'lb/mmscf': 1/1000,
+                          'lb/hr'   : hours_burned}.get(units, 1)
+            monthly.loc[pol] = EF_multiplier * equip_EF[unit_key][pol] * conversion
+        
+        # now calculate H2SO4 separately
+        monthly.loc['h2so4'] = coke_tons * equip_EF[unit_key]['h2so4']
+        
+        # set other values in series
+        col_name_order = self.annual_equip.col_name_order
+        monthly.loc['equipment'] = unit_key
+        monthly.loc['month'] = month
+        monthly = monthly.reindex(col_name_order)
+        monthly.loc[col_name_order[4:-1]] = monthly.loc[
+                                col_name_order[4:-1]] / 2000 # lbs --> tons
+        # fuel not used in emis calc, set to zero
+        monthly.loc['fuel_ng'] = 0
+        return monthly
+    
+    def calculate_monthly_calciner_toxics(self, unit_key, month, coke_tons):
+        """Return pd.Series of calciner toxics (lbs) from monthly coke (tons)."""
+        base_ser = pd.Series({'equipment': unit_key,
+                              'month'    : month,
+                              'coke_tons': coke_tons})
+        tox = self.annual_equip.toxicsEFs_calciners.copy()
+        tox.set_index('pollutant', inplace=True)
+        tox['lbs'] = tox['ef'] * coke_tons
+        tox_ordered = tox['lbs'].reindex(cf.calciner_toxics_with_EFs)
+        return pd.concat([base_ser, tox_ordered]).replace(np.nan, 0)
         
 class MonthlyCalciner(AnnualCalciner):
     """Calculate monthly calciner emissions."""
+    """
+    Single-month view of the AnnualCalciner engine.
+    """
     def __init__(self,
              unit_key,
              month,
@@ -1722,31 +2124,10 @@ class MonthlyCalciner(AnnualCalciner):
         self.annual_eu      = annual_eu
         self.annual_equip   = annual_eu.annual_equip
         self.year           = self.annual_equip.year
-        self.ts_interval    = self.annual_equip.ts_intervals[self.month
-                                                - self.annual_equip.month_offset]        
-# why is it not using self.EFs? should it be calling this?
-        # self.EFs            = self.annual_equip.EFs[self.month][0]
-        self.EFunits        = self.annual_equip.EFs[self.month][1]
-        self.equip_EF       = self.annual_equip.EFs[self.month][2]
-        self.col_name_order = self.annual_equip.col_name_order
-        self.equip_ptags    = self.annual_equip.equip_ptags
-        self.ptags_pols     = self.annual_equip.ptags_pols
-        self.toxicsEFs      = self.annual_equip.toxicsEFs_calciners
-
-        # fuel-sample lab results (pd.DataFrame)
-        self.RFG_monthly    = ff.get_monthly_lab_results(
-                                            self.annual_equip.RFG_annual,
-                                            self.ts_interval)
-        # fuel higher heating values (float)
-        self.HHV_RFG        = ff.calculate_monthly_HHV(self.RFG_monthly)
-        self.f_factor_RFG   = ff.calculate_monthly_f_factor(
-                                            self.RFG_monthly,
-                                            self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
-
-        self.coke_annual    = self.annual_eu.coke_annual
-        self.monthly_emis   = self.calculate_monthly_equip_emissions()
-        self.monthly_toxics = self.calculate_monthly_toxics()
+        
+        results = self.annual_eu.calculate_annual(unit_key, [month])
+        self.monthly_emis   = results['criteria'][month]
+        self.monthly_toxics = results['toxics'][month]
         self.monthly_emis_h2s = None
 
 class AnnualFlare(AnnualEquipment):
@@ -1775,7 +2156,7 @@ class MonthlyFlare(AnnualFlare):
         
         self.flare_monthly  = ff.get_monthly_lab_results(self.annual_equip.flare_annual,
                                                          self.ts_interval)
-        self.HHV_flare      = ff.calculate_monthly_HHV(self.flare_monthly)
+        self.HHV_flare      = ff.calculate_monthly_HHV(self.flare_monthly, fuel='flare')
 #        self.f_factor_flare = ff.calculate_monthly_f_factor(self.flare_monthly,
 #                                                            self.annual_equip.fpath_FG_chem,
 #                                                            self.ts_interval)
@@ -1863,11 +2244,7 @@ class MonthlyFlare(AnnualFlare):
     
     def get_monthly_flare_HHV_upsampled(self):
         """Return monthly pd.Series of HHV values upsampled to hourly."""
-        annual_upsampled = self.flareHHV_annual
-        monthly_upsampled = annual_upsampled.loc[
-                                    self.ts_interval[0]:
-                                    self.ts_interval[1]]
-        return monthly_upsampled
+        return self.flareHHV_annual.iloc[self.month_slice]
     
     def calculate_monthly_flare_emissions(self):
         """Return pd.Series of flare emissions for specified month."""
@@ -1967,15 +2344,24 @@ class MonthlyFlare(AnnualFlare):
     
     def get_monthly_flare_fuel(self):
         """Return pd.DataFrame of flare fuel for specified month."""
-        fuel_df = self.flarefuel_annual.loc[
-                            self.ts_interval[0]:
-                            self.ts_interval[1]]
-        return fuel_df
+        return self.flarefuel_annual.iloc[self.month_slice]
 
 class AnnualH2Plant(AnnualEquipment):
-    """Parse and store annual calciner data."""
+    """Parse annual H2 plant data; calculate H2 plant emissions a year at a time."""
+    """
+    Whole-year engine: hourly PSA-offgas and NG stack flows and CEMS mass
+    emissions split by fuel are computed for all months in one array pass
+    over the hourly grid (calculate_annual_hourly), then summed by month.
+    Criteria and the PSA- and NG-based toxics are computed from the same
+    monthly sums; the per-fuel toxics breakdown is returned with the
+    results and written by the AnnualParser.
+    """
+    # {prefix of hourly columns: (lab-analysis fuel, output fuel column)}
+    fuels = OrderedDict([('NG_' , ('NG' , 'fuel_ng' )),
+                         ('PSA_', ('PSA', 'fuel_rfg'))])
+    
     def __init__(self, annual_equip):
-        """Constructor for parsing annual calciner data."""
+        """Constructor for parsing annual H2 plant data."""
         self.annual_equip = annual_equip
         
         self.fpath_h2stack = self.annual_equip.fpath_h2stack # no longer using
@@ -1983,10 +2369,12 @@ class AnnualH2Plant(AnnualEquipment):
         
         self.PSAstack_annual = self.parse_annual_PSAstack()
                               # df: hourly PSA offgas data for H2 plant
+        self.hourly_cache    = {}
+                              # dict: {unit_key: (cache key, hourly df, {fuel: {month: HHV}})}
     
     def parse_annual_PSAstack(self):
         """Read annual PSA offgas data for H2 plant, return pd.DataFrame in mscfh."""
-        gas = pd.read_excel(self.fpath_PSAstack, skiprows=2, header=[0,1])
+        gas = inputio.read_excel(self.fpath_PSAstack, skiprows=2, header=[0,1])
         gas.columns = gas.columns.droplevel(1)
         gas.set_index('1 h', drop=True, inplace=True)
         gas.index = pd.to_datetime(gas.index)
@@ -1995,10 +2383,168 @@ class AnnualH2Plant(AnnualEquipment):
         gas['46FI187.PV'] = pd.to_numeric(gas.loc[:,'46FI187.PV'], errors='coerce')
         gas['46FS38.PV'] = pd.to_numeric(gas.loc[:,'46FS38.PV'], errors='coerce')
         gas = gas.clip(lower=0)
-        return gas
+        return self.annual_equip.grid.conform(gas)
+    
+    def calculate_annual(self, unit_key, months):
+        """Return dict of {month: pd.Series/pd.DataFrame} results for the H2 plant."""
+        """
+        Keys: 'criteria', 'toxics' (total of both fuels) and 'toxics_by_fuel'
+        (params x [fuel_rfg, fuel_ng, total]; fuel_rfg is PSA offgas).
+        """
+        hourly, HHV = self.calculate_annual_hourly(unit_key, months)
+        monthly = hourly.drop(columns='month').groupby(hourly['month']).sum()
+        results = {'criteria': {}, 'toxics': {}, 'toxics_by_fuel': {}}
+        for month in months:
+            HHV_month = dict((prefix, HHV[prefix][month]) for prefix in self.fuels)
+            # pollutants without CEMS data this month are calculated from EFs
+            no_data = self.annual_equip.CEMS_pols_without_data(unit_key, month)
+            results['criteria'][month] = self.calculate_monthly_h2plant_emissions(
+                                             unit_key, month, monthly.loc[month].copy(),
+                                             HHV_month, no_data)
+            by_fuel = self.calculate_monthly_h2plant_toxics(
+                          unit_key, month, monthly.loc[month], HHV_month)
+            results['toxics'][month] = by_fuel['total']
+            results['toxics_by_fuel'][month] = by_fuel
+        return results
+    
+    def calculate_annual_hourly(self, unit_key, months):
+        """Return hourly pd.DataFrame of H2 plant flows and emissions by fuel for months."""
+        """
+        Also returns {fuel prefix: {month: HHV}}. The result is cached and
+        reused while the CEMS data, months and lab-value overrides are
+        unchanged.
+        """
+        ae = self.annual_equip
+        key = (tuple(months), tuple(sorted(ff.HHV_overrides.items())),
+               tuple(sorted(ff.f_factor_overrides.items())))
+        cached = self.hourly_cache.get(unit_key)
+        if (cached is not None and cached[0][0] is ae.CEMS_annual
+                and cached[0][1:] == key):
+            return cached[1], cached[2]
+        
+        positions = np.concatenate([np.arange(len(ae.grid))[ae.grid.month_slices[month]]
+                                    for month in months])
+        hourly = pd.DataFrame({'month': ae.grid.index.month[positions]},
+                              index=ae.grid.index[positions])
+        stack = self.PSAstack_annual.iloc[positions]
+        hourly['PSA_mscf'] = stack['46FC36.PV'].values
+        hourly['NG_mscf']  = (stack['46FI187.PV'] + stack['46FS38.PV']).values
+        CEMS_hourly = ae.CEMS_hourly
+        for ptag in ae.equip_ptags.get(unit_key, []):
+            # every expected tag has a column (NaN if absent from the data)
+            hourly[ae.ptags_pols[ptag]] = CEMS_hourly[ptag].values[positions]
+        
+        # monthly lab values, broadcast to hours
+        chem_paths = {'NG': ae.fpath_NG_chem, 'PSA': ae.fpath_FG_chem}
+        HHV = {}
+        for prefix, (fuel, _) in self.fuels.items():
+            lab_annual = getattr(ae, fuel+'_annual')
+            HHV[prefix], f_factor = {}, {}
+            for month in months:
+                ts_interval = ae.ts_intervals[month - ae.month_offset]
+                lab_monthly = ff.get_monthly_lab_results(lab_annual, ts_interval)
+                HHV[prefix][month]  = ff.calculate_monthly_HHV(lab_monthly, fuel=fuel)
+                f_factor[month]     = ff.calculate_monthly_f_factor(lab_monthly,
+                                                                    chem_paths[fuel],
+                                                                    ts_interval,
+                                                                    fuel=fuel)
+            hourly[prefix+'dscfh'] = (hourly[prefix+'mscf']         # Mscf
+                                      * 1000                         # scf/Mscf
+                                      * hourly['month'].map(HHV[prefix]) # Btu/scf
+                                      / 1000000                      # Btu/MMBtu
+                                      * hourly['month'].map(f_factor)    # scf/MMBtu
+                                      * 20.9 / (20.9 - hourly['o2_%']))
+        if cf.write_stackflow:
+            dscfh = hourly['PSA_dscfh'] + hourly['NG_dscfh']
+            for month, dscfh_month in dscfh.groupby(hourly['month']):
+                stackflow_store.store.record(ae.year, month, unit_key, dscfh_month)
+        
+        # calculate emissions due to NG and PSA separately
+        for param in [ae.ptags_pols[tag] for tag in ae.equip_ptags.get(unit_key, [])
+                      if ae.ptags_pols[tag] in hourly.columns
+                      and ae.ptags_pols[tag] != 'o2_%']:
+            pol = param.split('_')[0]
+            for prefix in self.fuels:
+                hourly[prefix+pol] = (hourly[param]
+                                      * PPM_CONV_FACTS[pol]     # ==> lb/scf
+                                      * hourly[prefix+'dscfh']) # ==> lb
+        
+        self.hourly_cache[unit_key] = ((ae.CEMS_annual,) + key, hourly, HHV)
+        return hourly, HHV
+    
+    def calculate_monthly_h2plant_emissions(self, unit_key, month, monthly, HHV,
+                                            no_CEMS=()):
+        """Return pd.Series of H2 plant emissions from monthly sums of hourly data."""
+        """
+        VOC and PM, and CEMS pollutants listed in `no_CEMS` (no data this
+        month), are calculated from EFs on each fuel.
+        """
+        EFunits  = self.annual_equip.EFs[month][1]
+        equip_EF = self.annual_equip.EFs[month][2]
+        flagged  = []
+        for pol in ['voc', 'pm'] + [pol for pol in no_CEMS if pol not in ['voc', 'pm']]:
+            # need this logic to avoid errors while PM25 & PM 10EFs are added
+            if pol not in EFunits.loc[unit_key].index:
+                monthly.loc[pol] = -9999 * 2000 / 12 # error flag that will show up as -9999
+                flagged.append(pol)
+                continue
+            units = EFunits.loc[unit_key].loc[pol].loc['units']
+            for prefix in self.fuels:
+                if units == 'lb/mmbtu':
+                    conversion = 1/1000 * HHV[prefix]
+                elif units == 'lb/mmscf':
+                    conversion = 1/1000
+                else:
+                    raise ValueError('Emission Factor in unexpected units.')
+                monthly.loc[prefix+pol] = (monthly.loc[prefix+'mscf']
+                                           * equip_EF[unit_key][pol]
+                                           * conversion)
+        # combine emissions from both fuel types
+        for pol in ['nox', 'co', 'so2', 'voc', 'pm']:
+            if pol not in flagged:
+                monthly.loc[pol] = sum(monthly.loc[prefix+pol] for prefix in self.fuels)
+        
+        col_name_order = self.annual_equip.col_name_order
+        monthly.loc['equipment'] = unit_key
+        monthly.loc['month']     = month
+        monthly.loc['fuel_rfg']  = monthly.loc['PSA_mscf']
+        monthly.loc['fuel_ng']   = monthly.loc['NG_mscf']
+        monthly.loc['pm25']      = monthly.loc['pm']
+        monthly.loc['pm10']      = monthly.loc['pm']
+        monthly.loc['h2so4']     = monthly.loc['so2'] * 0.026
+        monthly = monthly.reindex(col_name_order)
+        monthly.loc[col_name_order[4:-1]] = (
+        monthly.loc[col_name_order[4:-1]] / 2000) # lbs --> tons
+        return monthly
+    
+    def calculate_monthly_h2plant_toxics(self, unit_key, month, monthly, HHV):
+        """Return pd.DataFrame (params x [fuel_rfg, fuel_ng, total]) of toxics (lbs)."""
+        tox = self.annual_equip.toxicsEFs.set_index('pollutant')
+        by_fuel = pd.DataFrame(index=cf.h2plant2_toxics_reindexer[4:])
+        base = pd.DataFrame(0.0, index=['fuel_rfg', 'fuel_ng'],
+                            columns=['fuel_rfg', 'fuel_ng'])
+        for prefix, (fuel, fuel_col) in self.fuels.items():
+            mscf = monthly.loc[prefix+'mscf']
+            lbs = pd.Series(np.where(tox['units']=='lb/mmscf', tox['ef'] * mscf,
+                                     np.where(tox['units']=='lb/mmbtu',
+                                              tox['ef'] * mscf * HHV[prefix],
+                                              np.nan)),
+                            index=tox.index)
+            by_fuel[fuel_col] = (lbs / 1000).reindex(by_fuel.index) # fuel in mscf
+            base.loc[fuel_col, fuel_col] = mscf
+        by_fuel = pd.concat([base, by_fuel[['fuel_rfg', 'fuel_ng']]]).replace(np.nan, 0)
+        by_fuel['total'] = by_fuel.sum(axis=1)
+        labels = pd.DataFrame({'fuel_rfg': [unit_key, month],
+                               'fuel_ng' : [unit_key, month],
+                               'total'   : [unit_key, month]},
+                              index=['equipment', 'month'], dtype=object)
+        return pd.concat([labels, by_fuel.astype(object)])
 
 class MonthlyH2Plant(AnnualH2Plant):
     """Calculate monthly H2 plant emissions."""
+    """
+    Single-month view of the AnnualH2Plant engine.
+    """
     def __init__(self,
              unit_key,
              month,
@@ -2009,177 +2555,13 @@ class MonthlyH2Plant(AnnualH2Plant):
         self.annual_eu      = annual_eu
         self.annual_equip   = annual_eu.annual_equip
         self.year           = self.annual_equip.year
-        self.ts_interval    = self.annual_equip.ts_intervals[self.month
-                                                - self.annual_equip.month_offset]
-        self.EFunits        = self.annual_equip.EFs[self.month][1]
-        self.equip_EF       = self.annual_equip.EFs[self.month][2]
-        self.col_name_order = self.annual_equip.col_name_order
-        self.equip_ptags    = self.annual_equip.equip_ptags
-        self.ptags_pols     = self.annual_equip.ptags_pols
-        self.toxicsEFs      = self.annual_equip.toxicsEFs
-        self.flareEFs       = self.annual_equip.flareEFs
-        
-        self.PSAstack_annual= self.annual_eu.PSAstack_annual
-        
-        # fuel-sample lab results (pd.DataFrame)
-        self.RFG_monthly    = ff.get_monthly_lab_results(self.annual_equip.RFG_annual, self.ts_interval)
-        self.PSA_monthly    = ff.get_monthly_lab_results(self.annual_equip.PSA_annual, self.ts_interval)
-        self.NG_monthly     = ff.get_monthly_lab_results(self.annual_equip.NG_annual, self.ts_interval)
-        # fuel higher heating values (float)
-        self.HHV_RFG        = ff.calculate_monthly_HHV(self.RFG_monthly)
-        self.HHV_PSA        = ff.calculate_monthly_HHV(self.PSA_monthly)
-        self.HHV_NG         = ff.calculate_monthly_HHV(self.NG_monthly)
-        # fuel f-factors (floats) calculated using static chem data
-        self.f_factor_PSA   = ff.calculate_monthly_f_factor(
-                                            self.PSA_monthly,
-                                            self.annual_equip.fpath_FG_chem,
-                                            self.ts_interval)
-        self.f_factor_NG    = ff.calculate_monthly_f_factor(
-                                            self.NG_monthly,
-                                            self.annual_equip.fpath_NG_chem,
-                                            self.ts_interval)
         
-        self.monthly_emis     = self.calculate_monthly_equip_emissions()
-        self.monthly_toxics   = self.calculate_monthly_toxics()
+        results = self.annual_eu.calculate_annual(unit_key, [month])
+        self.monthly_emis     = results['criteria'][month]
+        self.monthly_toxics   = results['toxics'][month]
+        self.monthly_toxics_by_fuel = results['toxics_by_fuel'][month]
         self.monthly_emis_h2s = None
 
-    # emissions calc methods override parent methods
-    def calculate_monthly_equip_emissions(self):
-        """Return pd.Series of equipment unit emissions for specified month."""
-        monthly = self.aggregate_hourly_to_monthly()
-        # calculate all pollutants except for H2SO4
-       
-        for pol in ['voc', 'pm']:
-            for fuel_type in ['NG_', 'PSA_']:
-                # if no CEMS
-                if pol not in monthly.index:
-                    # need this logic to avoid errors while PM25 & PM 10EFs are added
-                    if pol not in self.EFunits.loc[self.unit_key].index:
-                        monthly.loc[pol] = -9999 * 2000 / 12 # error flag that will show up as -9999
-                    else:
-                        EF_multiplier = monthly.loc[fuel_type+'mscf']
-                        monthly.loc[fuel_type+pol] = (EF_multiplier
-                                        * self.equip_EF[self.unit_key][pol]
-                                        * self.get_conversion_multiplier(pol, fuel_type))
-        for pol in ['nox', 'co', 'so2', 'voc', 'pm']:
-            self._combine_emis_from_fuels(monthly, pol)
-
-        monthly.loc['equipment'] = self.unit_key
-        monthly.loc['month']     = self.month
-        monthly.loc['fuel_rfg']  = monthly.loc['PSA_mscf']
-        monthly.loc['fuel_ng']   = monthly.loc['NG_mscf']
-        monthly.loc['pm25']      = monthly.loc['pm']
-        monthly.loc['pm10']      = monthly.loc['pm']
-        monthly.loc['h2so4']     = monthly.loc['so2'] * 0.026
-        monthly = monthly.reindex(self.col_name_order)
-        monthly.loc[self.col_name_order[4:-1]] = (
-        monthly.loc[self.col_name_order[4:-1]] / 2000) # lbs --> tons
-        return monthly
-
-    @staticmethod
-    def _combine_emis_from_fuels(ser, pol):
-        """Combine emissions from both fuel types, add row to series."""
-        ser.loc[pol] = (ser.loc['NG_'+pol] + ser.loc['PSA_'+pol])
-
-    def get_conversion_multiplier(self, pol, fuel_type):
-        """Return float multiplier for unit conversion."""
-        if fuel_type == 'NG_':
-            HHV = self.HHV_NG
-        elif fuel_type == 'PSA_':
-            HHV = self.HHV_PSA
-
-        if (self.EFunits.loc[self.unit_key]
-                        .loc[pol]
-                        .loc['units'] == 'lb/mmbtu'):
-            return 1/1000 * HHV
-        elif (self.EFunits.loc[self.unit_key]
-                          .loc[pol]
-                          .loc['units'] == 'lb/mmscf'):
-            return 1/1000
-        else:
-            raise ValueError('Emission Factor in unexpected units.')
-    
-    def convert_from_ppm(self):
-        stack = self.get_monthly_PSAstack().copy()
-        stack['PSA_flow'] = (stack['46FC36.PV']     # Mscf
-                                * 1000                 # scf/Mscf
-                                * self.HHV_PSA         # Btu/scf
-                                / 1000000              # Btu/MMBtu
-                                * self.f_factor_PSA)   # scf/MMBtu
-        stack['NG_flow']  = ((stack['46FI187.PV'] + stack['46FS38.PV'])
-                                * 1000
-                                * self.HHV_NG
-                                / 1000000
-                                * self.f_factor_NG)
-        stack['PSA_mscf'] = stack['46FC36.PV']
-        stack['NG_mscf'] = stack['46FI187.PV'] + stack['46FS38.PV']
-        both_df = pd.concat([self.merge_fuel_and_CEMS(), stack], axis=1)
-        
-        both_df['PSA_dscfh'] = (both_df['PSA_flow'] * 20.9 / (20.9 - both_df['o2_%']))
-        both_df['NG_dscfh']  = (both_df['NG_flow']  * 20.9 / (20.9 - both_df['o2_%']))
-                
-        # if there are CEMS pols to convert
-        ptags_list = self.equip_ptags[self.unit_key]
-        cems_pol_list = [self.ptags_pols[tag]
-                        for tag in ptags_list
-                        if self.ptags_pols[tag] != 'o2_%']
-        for pol in cems_pol_list:
-            # calculate emissions due to NG and PSA separately
-            for fuel_type in ['NG_', 'PSA_']:
-                both_df[fuel_type+pol.split('_')[0]] = (
-                    both_df[pol]
-                    * PPM_CONV_FACTS[pol.split('_')[0]]
-                        # ==> lb/scf
-                    * both_df[fuel_type+'dscfh'])
-                        # ==> lb
-        return both_df
-    
-    def calculate_monthly_toxics(self):
-        toxics = {}
-        for fuel in self.get_fuel_type_for_toxics():
-            base_ser = self.get_series_for_toxics(fuel)
-            mult_fuel = base_ser.loc[fuel]
-            mult_HHV = self.get_HHV_multiplier_for_toxics(fuel)
-            tox = self.get_EFs_for_toxics(fuel).copy()
-            tox.set_index('pollutant', inplace=True)
-            tox.loc[tox['units']=='lb/mmscf', 'lbs'] = tox['ef'] * mult_fuel
-            tox.loc[tox['units']=='lb/mmbtu', 'lbs'] = tox['ef'] * mult_fuel * mult_HHV
-            tox['lbs'] = tox['lbs'] / 1000
-            tox_ordered = tox['lbs'].reindex(self.get_reindexer_for_toxics())
-            tox_ser = pd.concat([base_ser, tox_ordered])
-            tox_ser.name = 'from' + fuel[4:]
-            toxics[fuel] = tox_ser
-        alltox = pd.concat(toxics, axis=1, sort=False).replace(np.nan, 0)
-        alltox['total'] = alltox.sum(axis=1)
-        alltox.loc['equipment','total'] = alltox.loc['equipment', 'fuel_ng']
-        alltox.loc['month','total']     = alltox.loc['month', 'fuel_ng']
-        reindexer = list(alltox.index)
-        reindexer.insert(reindexer.index('fuel_ng')+1, reindexer.pop())
-        cf.h2plant2_toxics_reindexer = reindexer
-        alltox = alltox.reindex(reindexer)
-        alltox.to_csv('./output/h2plant2_toxics_'
-                     + str(self.year) + '_'
-                     + str(self.month).zfill(2) + '.csv',
-                     header=True)
-        return alltox['total']
-    
-    def get_series_for_toxics(self, fuel_type):
-        return pd.Series({'equipment':self.unit_key,
-                          'month'    :self.month,
-                          fuel_type  :self.monthly_emis.loc[fuel_type]})
-    
-    def get_fuel_type_for_toxics(self):
-        return ['fuel_rfg', 'fuel_ng']
-
-    def get_HHV_multiplier_for_toxics(self, fuel_type):
-        if fuel_type == 'fuel_rfg':
-            return self.HHV_PSA
-        elif fuel_type == 'fuel_ng':
-            return self.HHV_NG
-
-    def get_EFs_for_toxics(self, fuel_type):
-        return self.toxicsEFs
-
 ##============================================================================##
 
 # print timestamp for checking import timing
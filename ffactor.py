@@ -1,6 +1,9 @@
 import time
 import pandas as pd
 
+# module-level imports
+import inputio
+
 #print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
 
 """ 40 CFR Appendix A-7 to Part 60 - Test Method 19 -
@@ -8,6 +11,10 @@ import pandas as pd
     particulate, sulfur dioxide, and nitrogen oxides emission rates
     <https://www.law.cornell.edu/cfr/text/40/appendix-A-7_to_part_60#>"""
 
+# per-fuel values replacing calculated ones ({fuel: value}), e.g. for scenarios
+HHV_overrides      = {}
+f_factor_overrides = {}
+
 # constants for fuel f-factor calculation
 ff_constants = {
         'mw_C' : 12,
@@ -85,10 +92,19 @@ FG_compounds = {
         'Hexanes Plus- mol%'      : 'Hexanes Plus'
         }
 
+_chem_constants_cache = {} # {path: (mtime, pd.DataFrame)}
+
 def read_chem_constants(path):
     """Read chemistry constants/parameters, return pd.DataFrame."""
-    data = pd.read_csv(path)
-    return data
+    """
+    Cached per path; file is re-read only if its modification time changes.
+    """
+    mtime = inputio.getmtime(path)
+    cached = _chem_constants_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, inputio.read_csv(path))
+        _chem_constants_cache[path] = cached
+    return cached[1]
 
 def parse_annual_NG_lab_results(path, sheet):
     """Read natural-gas lab-test results and return pd.DataFrame."""
@@ -96,7 +112,7 @@ def parse_annual_NG_lab_results(path, sheet):
     Fuel analysis tests completed several times monthly. Data is
     averaged on a monthly basis.
 	"""
-    data = pd.read_excel(path, sheet_name=sheet, skiprows=8)[:12]
+    data = inputio.read_excel(path, sheet_name=sheet, skiprows=8)[:12]
     data['Sample Date'] = pd.to_datetime(data['Sample Date'])
     
     data = data.T.rename(columns=data.T.iloc[0],
@@ -115,7 +131,7 @@ def parse_annual_FG_lab_results(path, sheet):
     Fuel analysis tests completed several times monthly for RFG,
     cokerFG, CVTG, and H2 flare. Data is averaged on a monthly basis.
 	"""
-    data = pd.read_excel(path, sheet_name=sheet, skiprows=4, header=[0,1], index_col=0)
+    data = inputio.read_excel(path, sheet_name=sheet, skiprows=4, header=[0,1], index_col=0)
     # replace missing symbols with NaN
     data.replace(['****', '--'], pd.np.nan, inplace=True)
     
@@ -155,13 +171,15 @@ def get_monthly_lab_results(annual_gas_test_df, ts_interval):
     sub = annual_gas_test_df.loc[:, cols[(cols >= start) & (cols <= end)]]
     return sub
 
-def calculate_monthly_HHV(monthly_gas_test_results_df):
+def calculate_monthly_HHV(monthly_gas_test_results_df, fuel=None):
     """Calculate average higher heating value (HHV, gbtu/cf) for specified month."""
+    if fuel in HHV_overrides:
+        return HHV_overrides[fuel]
     HHV = monthly_gas_test_results_df.loc['GBTU/CF'].mean()
     return HHV
     
 def calculate_monthly_f_factor(gas_test_results_df, gas_chem_path,
-                                ts_interval, ff_terms=ff_constants):
+                                ts_interval, ff_terms=ff_constants, fuel=None):
     """Calculate refinery fuel gas Fd-factor for specified month."""
     """
     Uses chemistry constants and gas lab-analysis data, adhering to:
@@ -169,6 +187,8 @@ def calculate_monthly_f_factor(gas_test_results_df, gas_chem_path,
     Determination of sulfur dioxide removal efficiency and
     particulate, sulfur dioxide and nitrogen oxides emission rates."
     """
+    if fuel in f_factor_overrides:
+        return f_factor_overrides[fuel]
     chem   = read_chem_constants(gas_chem_path)
     ftable = (pd.merge(gas_test_results_df, chem, how='left',
                        left_on='compound', right_on='compound')
@@ -0,0 +1,223 @@
+# historian adapters: batched, concurrent extraction of hourly PI-tag data
+import importlib, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# module-level imports
+import config as cf
+import inputio
+import timegrid
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+long_cols = ['ptag', 'tstamp', 'val', 'text_flag']
+
+class Historian(object):
+    """Interface to a process historian serving hourly values of PI tags."""
+    """
+    Subclasses implement read_hourly(); extract() splits the tag list into
+    batches of cf.historian_batch_size tags and requests them on
+    cf.historian_workers threads, so a year of CEMS and fuel tags is a few
+    concurrent requests per month instead of manual exports.
+    """
+    def read_hourly(self, tags, start, end):
+        """Return long pd.DataFrame (ptag, tstamp, val, text_flag), start <= tstamp <= end."""
+        """
+        `text_flag` is the historian's status text for bad values (e.g.
+        'Calibration'), NaN for good values.
+        """
+        raise NotImplementedError
+
+    def extract(self, tags, start, end, batch_size=None, workers=None):
+        """Return hourly values of all tags, requested in concurrent batches."""
+        if batch_size is None:
+            batch_size = cf.historian_batch_size
+        if workers is None:
+            workers = cf.historian_workers
+        tags = list(pd.unique(pd.Series(tags, dtype=object)))
+        batches = [tags[i:i+batch_size] for i in range(0, len(tags), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(lambda batch: self.read_hourly(batch, start, end),
+                                   batches))
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=long_cols)
+        return pd.concat(frames, ignore_index=True)[long_cols]
+
+class FileHistorian(Historian):
+    """Local stand-in historian serving the manual PI exports."""
+    """
+    Serves CEMS tags from the monthly `MM-YYYY_*` exports in `CEMS_dir`
+    and fuel tags from the fuel-usage workbook, so extract_months() can be
+    run and checked against a year whose exports are on hand. Each file is
+    read once, on first request.
+    """
+    def __init__(self, CEMS_dir=None, fpath_fuel=None):
+        """Constructor for stand-in reading exports on request."""
+        self.CEMS_dir   = CEMS_dir if CEMS_dir is not None else cf.annual_prefix+'CEMS/'
+        self.fpath_fuel = (fpath_fuel if fpath_fuel is not None
+                           else cf.annual_prefix+cf.fname_fuel)
+        self.lock   = threading.Lock()
+        self.loaded = None # long df of all exported values, once read
+
+    def _load(self):
+        from equipClass import AnnualEquipment
+        with self.lock:
+            if self.loaded is None:
+                frames = [AnnualEquipment._parse_monthly_CEMS(path)
+                          for path in inputio.glob(self.CEMS_dir+'*')]
+                if inputio.exists(self.fpath_fuel):
+                    frames.append(self._read_fuel_workbook())
+                self.loaded = (pd.concat(frames, ignore_index=True)[long_cols]
+                                 .set_index('ptag').sort_index())
+        return self.loaded
+
+    def _read_fuel_workbook(self):
+        """Return long pd.DataFrame of fuel-workbook values by PI tag."""
+        fuel = read_fuel_workbook(self.fpath_fuel)
+        fuel.columns = fuel.columns.get_level_values('p_tag')
+        fuel = fuel.loc[:, ~fuel.columns.duplicated()]
+        fuel = fuel.apply(pd.to_numeric, errors='coerce')
+        fuel.columns.name = 'ptag'
+        long = fuel.stack(dropna=False).rename('val').reset_index()
+        long['text_flag'] = float('nan')
+        return long
+
+    def read_hourly(self, tags, start, end):
+        data = self._load()
+        data = data[data.index.isin(tags)].reset_index()
+        return data[(data['tstamp'] >= start) & (data['tstamp'] <= end)]
+
+def get_historian():
+    """Return instance of the historian class named in the config file."""
+    module, cls = cf.historian_class.rsplit('.', 1)
+    return getattr(importlib.import_module(module), cls)()
+
+def read_fuel_workbook(path=None):
+    """Return fuel-usage workbook as pd.DataFrame, columns (unit_id, p_tag, units)."""
+    if path is None:
+        path = cf.annual_prefix+cf.fname_fuel
+    fuel = inputio.read_excel(path, sheet_name=cf.sheet_fuel,
+                              skiprows=9, header=list(range(6)))
+    fuel.columns = fuel.columns.droplevel([5, 4, 1])
+    fuel.set_index(fuel.columns.tolist()[0], inplace=True)
+    fuel.index.name = 'tstamp'
+    fuel.columns.set_names(['unit_id', 'p_tag', 'units'],
+                           level=[0,1,2], inplace=True)
+    return fuel
+
+def read_fuel_cache(path=None):
+    """Return hourly fuel written by extract_months(), in the workbook's column layout."""
+    """
+    Columns are (unit_id, p_tag, units) in the workbook's order, so the
+    positional column slices of AnnualEquipment._parse_annual_fuel()
+    apply unchanged. Numeric unit IDs (e.g. 52) are restored to int.
+    """
+    if path is None:
+        path = cf.fpath_fuel
+    fuel = inputio.read_csv(path, header=[0,1,2], index_col=0, parse_dates=True)
+    fuel.index.name = 'tstamp'
+    fuel.columns = pd.MultiIndex.from_tuples(
+                       [(int(unit_id) if unit_id.isdigit() else unit_id, ptag, units)
+                        for unit_id, ptag, units in fuel.columns],
+                       names=['unit_id', 'p_tag', 'units'])
+    return fuel
+
+def fuel_tags(path=None):
+    """Return pd.DataFrame (unit_id, ptag, units) of fuel-workbook columns in order."""
+    if path is None:
+        path = cf.fpath_fuel_tags
+    return inputio.read_csv(path, dtype=str)
+
+def write_fuel_tags(fpath_workbook=None, path=None):
+    """Write fuel tag list from the header of a fuel-usage workbook."""
+    """
+    Run once from any workbook with the current column layout; the tag
+    list then replaces the workbook as the source of fuel tags.
+    """
+    if path is None:
+        path = cf.fpath_fuel_tags
+    columns = read_fuel_workbook(fpath_workbook).columns
+    tags = pd.DataFrame(list(columns), columns=['unit_id', 'ptag', 'units'])
+    tags.to_csv(path, index=False)
+    print('wrote {} fuel tags to \'{}\''.format(len(tags), path))
+
+def CEMS_tags():
+    """Return list of all CEMS PI tags in the equipment map and H2S source map."""
+    eqmap = inputio.read_csv(cf.fpath_eqmap, dtype=str)
+    tags = list(eqmap['PI Tag'].dropna().str.strip().unique())
+    tags += [tag for tag in cf.h2s_source_ptags.values() if tag not in tags]
+    return tags
+
+def extract_months(months=None, historian=None, year=None):
+    """Extract hourly CEMS and fuel tags into the historian ingest cache."""
+    """
+    CEMS values are written to cf.historian_dir+'CEMS/' as one
+    `MM-YYYY_historian.csv` per month in the layout of the manual exports;
+    fuel values are merged into cf.historian_dir+'fuel_hourly.csv' in the
+    fuel workbook's column layout. With cf.input_source = 'historian',
+    AnnualEquipment() reads both instead of the exports.
+    """
+    if months is None:
+        months = cf.months_to_calculate
+    if historian is None:
+        historian = get_historian()
+    if year is None:
+        year = cf.data_year
+    from equipClass import AnnualEquipment
+    grid = timegrid.HourlyGrid(year)
+    CEMS_dir = cf.historian_dir+'CEMS/'
+    fuel_path = cf.historian_dir+'fuel_hourly.csv'
+    if not os.path.exists(CEMS_dir):
+        os.makedirs(CEMS_dir)
+    tags_CEMS = CEMS_tags()
+    tags_fuel = fuel_tags()
+
+    fuel_months = []
+    for month in months:
+        start_time_seconds = time.time()
+        hours = grid.month_index(month)
+        start, end = hours[0], hours[-1]
+
+        CEMS = historian.extract(tags_CEMS, start, end).sort_values(['ptag', 'tstamp'])
+        CEMS.insert(0, 'source', 'historian')
+        CEMS.insert(4, 'units', '')
+        CEMS_path = CEMS_dir+'{}-{}_historian.csv'.format(str(month).zfill(2), year)
+        CEMS.to_csv(CEMS_path, index=False,
+                    header=(AnnualEquipment._CEMS_header() == 0))
+
+        fuel = historian.extract(tags_fuel['ptag'], start, end)
+        fuel = (fuel.drop_duplicates(subset=['ptag', 'tstamp'])
+                    .pivot(index='tstamp', columns='ptag', values='val')
+                    .reindex(index=hours, columns=tags_fuel['ptag']))
+        fuel.columns = pd.MultiIndex.from_frame(tags_fuel,
+                                                names=['unit_id', 'p_tag', 'units'])
+        fuel_months.append(fuel)
+        print('  extracted {} CEMS and {} fuel tags for month {} ({} seconds)'.format(
+                  len(tags_CEMS), len(tags_fuel), month,
+                  round(time.time() - start_time_seconds, 1)))
+
+    fuel = pd.concat(fuel_months)
+    if os.path.exists(fuel_path):
+        kept = read_fuel_cache(fuel_path)
+        kept.columns = fuel.columns
+        fuel = pd.concat([kept[~kept.index.isin(fuel.index)], fuel]).sort_index()
+    fuel.index.name = 'tstamp'
+    fuel.to_csv(fuel_path)
+    print('wrote historian ingest cache to \''+cf.historian_dir+'\'')
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='historian',
+                                     description='Extract hourly PI-tag data into '
+                                                 'the historian ingest cache.')
+    parser.add_argument('-m', '--months', type=int, nargs='+',
+                        default=list(cf.months_to_calculate),
+                        help='Months to extract (default: %(default)s).')
+    parser.add_argument('--fuel_tags_from', metavar='Workbook',
+                        help='Write the fuel tag list from a fuel-usage workbook and exit.')
+    args = parser.parse_args()
+    if args.fuel_tags_from:
+        write_fuel_tags(args.fuel_tags_from)
+    else:
+        extract_months(args.months)
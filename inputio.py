@@ -0,0 +1,176 @@
+# transparent reading of compressed (.gz, .zst) and zip-archived input files
+import contextlib, fnmatch, glob as _glob, gzip, io, os, threading, time, zipfile
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compressions = ['.gz', '.zst']
+workbooks    = ('.xlsx', '.xlsm', '.xls')
+
+# Inputs are addressed by their plain paths (e.g. cf.fpath_fuel, or a CEMS
+# file under cf.CEMS_dir) wherever they are stored:
+#   *on disk as is
+#   *on disk compressed: <path>.gz or <path>.zst
+#   *inside a zip archive of any parent directory, e.g. data_2019.zip holding
+#    data_2019/annual/CEMS/01-2019_CEMS.csv (with or without the top-level
+#    data_2019/ folder), members optionally .gz/.zst compressed
+# Compressed data is decompressed as it is read; nothing is extracted to
+# disk. Workbooks are read into memory, as the Excel readers need a seekable
+# file.
+
+_archives = {}  # {archive path: (mtime, {member name: ZipInfo})}
+_lock = threading.Lock()
+
+def _members(archive):
+    """Return dict of archive members ({name: ZipInfo}), cached per archive mtime."""
+    mtime = os.path.getmtime(archive)
+    with _lock:
+        cached = _archives.get(archive)
+        if cached is None or cached[0] != mtime:
+            with zipfile.ZipFile(archive) as zf:
+                cached = (mtime, dict((info.filename, info) for info in zf.infolist()
+                                      if not info.is_dir()))
+            _archives[archive] = cached
+    return cached[1]
+
+def _find_archive(path):
+    """Return (archive, member prefix) of nearest zip archive of a parent of path."""
+    """
+    The member prefix is path's location inside the archive. Returns
+    (None, None) if no parent directory has a zip archive.
+    """
+    head = os.path.normpath(path)
+    inner = []
+    while True:
+        head, tail = os.path.split(head)
+        inner.insert(0, tail)
+        if not head or head in ('.', os.sep):
+            return None, None
+        archive = head+'.zip'
+        if os.path.isfile(archive):
+            members = _members(archive)
+            for prefix in ['/'.join([os.path.basename(head)] + inner[:-1]),
+                           '/'.join(inner[:-1])]:
+                prefix = prefix+'/' if prefix else ''
+                if any(name.startswith(prefix) for name in members):
+                    return archive, prefix
+            return archive, '/'.join(inner[:-1])+('/' if inner[:-1] else '')
+
+def locate(path):
+    """Return (archive or None, file path or member name) storing path; None if absent."""
+    for candidate in [path] + [path+ext for ext in compressions]:
+        if os.path.isfile(candidate):
+            return None, candidate
+    archive, prefix = _find_archive(path)
+    if archive is not None:
+        members = _members(archive)
+        name = prefix+os.path.basename(path)
+        for candidate in [name] + [name+ext for ext in compressions]:
+            if candidate in members:
+                return archive, candidate
+    return None
+
+def exists(path):
+    """Return True if input path is stored plain, compressed or archived."""
+    return locate(path) is not None
+
+def getmtime(path):
+    """Return modification time of stored input (archive member's own timestamp)."""
+    found = locate(path)
+    if found is None:
+        raise OSError('input not found: \''+path+'\'')
+    archive, name = found
+    if archive is None:
+        return os.path.getmtime(name)
+    return time.mktime(_members(archive)[name].date_time + (0, 0, -1))
+
+def getsize(path):
+    """Return stored (compressed) size in bytes of input."""
+    found = locate(path)
+    if found is None:
+        raise OSError('input not found: \''+path+'\'')
+    archive, name = found
+    if archive is None:
+        return os.path.getsize(name)
+    return _members(archive)[name].compress_size
+
+def glob(pattern):
+    """Return sorted input paths matching pattern on disk and in parent zip archives."""
+    """
+    Compressed files are listed under their stored names (e.g.
+    '01-2019_CEMS.csv.gz'); archive members are listed as the paths they
+    would have if extracted. Files on disk take precedence.
+    """
+    paths = set(_glob.glob(pattern))
+    dirpart, basepat = os.path.split(pattern)
+    archive, prefix = _find_archive(os.path.join(dirpart, basepat))
+    if archive is not None:
+        for name in _members(archive):
+            if (name.startswith(prefix) and '/' not in name[len(prefix):]
+                    and fnmatch.fnmatch(name[len(prefix):], basepat)):
+                paths.add(os.path.join(dirpart, name[len(prefix):]))
+    return sorted(paths)
+
+def _decompressing(stream, name):
+    """Wrap binary stream with streaming decompression per file extension."""
+    if name.endswith('.gz'):
+        return gzip.GzipFile(fileobj=stream)
+    if name.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError('reading \''+name+'\' requires the zstandard package')
+        return zstandard.ZstdDecompressor().stream_reader(stream, closefd=True)
+    return stream
+
+@contextlib.contextmanager
+def reading(path):
+    """Yield source for pandas readers: path itself if stored plain, else an open stream."""
+    found = locate(path)
+    if found is None:
+        raise IOError('input not found: \''+path+'\'')
+    archive, name = found
+    if archive is None and name == path and not name.endswith(tuple(compressions)):
+        yield path
+        return
+    with contextlib.ExitStack() as stack:
+        if archive is None:
+            stream = stack.enter_context(open(name, 'rb'))
+        else:
+            zf = stack.enter_context(zipfile.ZipFile(archive))
+            stream = stack.enter_context(zf.open(name))
+        stream = stack.enter_context(_decompressing(stream, name))
+        if path.lower().endswith(workbooks):
+            stream = io.BytesIO(stream.read())
+        yield stream
+
+def read_csv(path, **kwargs):
+    """pd.read_csv() of a stored input; with chunksize, chunks stream from the source."""
+    import pandas as pd
+    if kwargs.get('chunksize') is not None:
+        return _read_csv_chunks(path, kwargs)
+    with reading(path) as source:
+        return pd.read_csv(source, **kwargs)
+
+def _read_csv_chunks(path, kwargs):
+    import pandas as pd
+    with reading(path) as source:
+        for chunk in pd.read_csv(source, **kwargs):
+            yield chunk
+
+def read_excel(path, **kwargs):
+    """pd.read_excel() of a stored input."""
+    import pandas as pd
+    with reading(path) as source:
+        return pd.read_excel(source, **kwargs)
+
+def sheet_names(path):
+    """Return list of sheet names of a stored workbook."""
+    import pandas as pd
+    with reading(path) as source:
+        return pd.ExcelFile(source).sheet_names
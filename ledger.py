@@ -0,0 +1,94 @@
+# persistent monthly emissions ledger and rolling 12-month totals across years
+import os, time
+import pandas as pd
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+ledger_cols = ['year', 'month', 'WED Pt', 'Equipment', 'Parameter', 'Units', 'value']
+unit_cols   = ['WED Pt', 'Equipment', 'Parameter', 'Units']
+
+def ledger_path(ledger_dir=None):
+    """Return path to monthly ledger CSV."""
+    if ledger_dir is None:
+        ledger_dir = cf.ledger_dir
+    return ledger_dir+'emissions_ledger.csv'
+
+def read_ledger(ledger_dir=None):
+    """Read monthly ledger, return pd.DataFrame (empty if none written yet)."""
+    path = ledger_path(ledger_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ledger_cols)
+    return pd.read_csv(path, dtype={'WED Pt': str})
+
+def to_ledger_rows(annual_df, year, MI_col):
+    """Return long-format ledger rows from formatted (unit x month) emissions."""
+    """
+    `annual_df` has columns ['WED Pt', 'Equipment', 'Month', <parameters>]
+    as written by AnnualParser; `MI_col` is the matching (Parameter, Units)
+    pd.MultiIndex. Month names are mapped back to integers.
+    """
+    values = annual_df.iloc[:, 3:].copy()
+    values.columns = MI_col
+    values.index = pd.MultiIndex.from_frame(annual_df[['WED Pt', 'Equipment', 'Month']])
+    rows = values.stack(['Parameter', 'Units']).rename('value').reset_index()
+    month_ints = dict((v, int(k)) for k, v in cf.generate_month_map().items())
+    rows['month'] = rows.pop('Month').replace(month_ints).astype(int)
+    rows['year'] = int(year)
+    rows['WED Pt'] = rows['WED Pt'].astype(str)
+    return rows[ledger_cols]
+
+def update_ledger(annual_df, year, MI_col, ledger_dir=None):
+    """Upsert calculated months into the ledger, rewrite ledger and rolling totals."""
+    """
+    Rows for the same (year, month, unit, parameter) are replaced; all
+    other months, including prior years, are kept as stored, so rolling
+    totals never require re-parsing earlier raw data.
+    """
+    new = to_ledger_rows(annual_df, year, MI_col)
+    ledger = read_ledger(ledger_dir)
+    key = ['year', 'month', 'WED Pt', 'Equipment', 'Parameter']
+    if not ledger.empty:
+        ledger['WED Pt'] = ledger['WED Pt'].astype(str)
+        stale = (ledger.set_index(key).index
+                       .isin(new.set_index(key).index))
+        ledger = ledger[~stale]
+    ledger = (pd.concat([ledger, new])
+                .sort_values(['year', 'month', 'WED Pt', 'Parameter'])
+                .reset_index(drop=True))
+    ledger.round(cf.round_decimals).to_csv(ledger_path(ledger_dir), index=False)
+    rolling = rolling_12_month(ledger)
+    rolling.round(cf.round_decimals).to_csv(
+        (ledger_dir or cf.ledger_dir)+'rolling_12_month.csv', index=False)
+    print('  updated emissions ledger ({} months on record)'.format(
+              len(ledger[['year', 'month']].drop_duplicates())))
+    return ledger, rolling
+
+def rolling_12_month(ledger):
+    """Return pd.DataFrame of rolling 12-month totals per unit and parameter."""
+    """
+    Months absent from the ledger count as missing, not zero:
+    'months_in_window' gives how many of the 12 months are on record.
+    """
+    periods = pd.to_datetime(pd.DataFrame({'year' : ledger['year'],
+                                           'month': ledger['month'],
+                                           'day'  : 1})).dt.to_period('M')
+    wide = (ledger.assign(period=periods)
+                  .pivot_table(index='period', columns=unit_cols,
+                               values='value', aggfunc='sum'))
+    wide = wide.reindex(pd.period_range(wide.index.min(), wide.index.max(), freq='M'))
+    wide.index.name = 'period'
+    totals = wide.rolling(12, min_periods=1).sum()
+    counts = wide.notna().rolling(12, min_periods=1).sum()
+    rolling = pd.concat({'month_value'     : wide.stack(unit_cols, dropna=False),
+                         'rolling_12_month': totals.stack(unit_cols, dropna=False),
+                         'months_in_window': counts.stack(unit_cols, dropna=False)},
+                        axis=1).reset_index()
+    rolling = rolling[rolling['month_value'].notna()]
+    period = rolling.pop('period')
+    rolling.insert(0, 'year', period.dt.year)
+    rolling.insert(1, 'month', period.dt.month)
+    rolling['months_in_window'] = rolling['months_in_window'].astype(int)
+    return rolling.sort_values(['WED Pt', 'Parameter', 'year', 'month'])
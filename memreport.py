@@ -0,0 +1,93 @@
+# compact in-memory representation and memory reporting for annual datasets
+import resource, sys, time
+import pandas as pd
+import numpy as np
+
+# module-level imports
+import config as cf
+import qasink
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+def peak_rss_bytes():
+    """Return peak resident set size of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak
+    return peak * 1024
+
+def dataset_bytes(obj):
+    """Return deep memory usage (bytes) of a pd.DataFrame or pd.Series."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    return 0
+
+def compact_frame(df, float32=False, categorical=()):
+    """Return pd.DataFrame with numeric object columns cast and tags as categoricals."""
+    """
+    Object columns left behind by `apply(pd.to_numeric)` and `replace` are
+    cast to float where every non-null value is numeric. Columns listed in
+    `categorical` (e.g. 'ptag') become pd.Categorical. If `float32`, float64
+    columns are downcast to float32.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in categorical:
+            df[col] = df[col].astype('category')
+        elif df[col].dtype == object:
+            as_num = pd.to_numeric(df[col], errors='coerce')
+            if as_num.notna().sum() == df[col].notna().sum():
+                df[col] = as_num
+    if float32:
+        float_cols = df.select_dtypes(include=['float64']).columns
+        df[float_cols] = df[float_cols].astype(np.float32)
+    return df
+
+def share_time_index(frames):
+    """Point identical hourly DatetimeIndexes at one shared index object."""
+    shared = None
+    for df in frames:
+        if df is None:
+            continue
+        if shared is None:
+            shared = df.index
+        elif df.index is not shared and df.index.equals(shared):
+            df.index = shared
+
+class MemoryReport(object):
+    """Record dataset sizes and peak RSS per parsing/calculation stage."""
+    def __init__(self):
+        """Constructor for empty memory report."""
+        self.datasets = []
+        self.stages   = []
+
+    def record_stage(self, stage):
+        """Log peak RSS after named stage."""
+        self.stages.append({'stage'       : stage,
+                            'time'        : time.strftime("%H:%M:%S"),
+                            'peak_rss_MB' : peak_rss_bytes() / 1024**2})
+
+    def record_datasets(self, named_frames):
+        """Log deep memory usage of each dataset in dict {name: frame}."""
+        for name, obj in named_frames.items():
+            self.datasets.append({'dataset': name,
+                                  'MB'     : dataset_bytes(obj) / 1024**2})
+
+    def to_frames(self):
+        """Return tuple of pd.DataFrames (datasets, stages)."""
+        return pd.DataFrame(self.datasets), pd.DataFrame(self.stages)
+
+    def write(self):
+        """Add memory report tables to the QA sink, print summary."""
+        datasets, stages = self.to_frames()
+        qasink.sink.add('memory_datasets.csv', datasets.round(3), index=False)
+        qasink.sink.add('memory_stages.csv', stages.round(1), index=False)
+        if cf.verbose_logging and not datasets.empty:
+            print('  memory report (MB):')
+            for _, row in datasets.iterrows():
+                print('    {:<28}: {:10.2f}'.format(row['dataset'], row['MB']))
+            print('    {:<28}: {:10.2f}'.format('peak RSS',
+                                                 stages['peak_rss_MB'].max()))
@@ -19,10 +19,13 @@ class AnnualParser(object):
     write_csvs = True
     return_dfs = True
     
-    def __init__(self, annual_equip, calculation):
+    def __init__(self, annual_equip, calculation,
+                 equip_to_calc=None, months_to_calc=None):
         """Constructor for handling inputs, calculations, and outputs."""
         """
-        Takes AnnualEquipment() instance as argument.
+        Takes AnnualEquipment() instance as argument. Equipment and months
+        default to those in the config file; months must be a subset of the
+        months parsed by the AnnualEquipment() instance.
         """
         self.annual_equip       = annual_equip
         self.calculation        = calculation
@@ -48,17 +51,23 @@ class AnnualParser(object):
         # parsed from config file
         self.year_to_calc       = cf.data_year
         self.months_to_calc     = cf.months_to_calculate
-        self.equip_types        = cf.equip_types
         self.equip_to_calc      = cf.equip_to_calculate
         self.pollutants_to_calc = cf.pollutants_to_calculate
         self.pollutants_all     = cf.pollutants_all
         self.write_month_names  = cf.write_month_names
         self.month_map          = cf.month_map
         self.verbose_logging    = cf.verbose_logging
+        if equip_to_calc is not None:
+            self.equip_to_calc  = equip_to_calc
+        if months_to_calc is not None:
+            self.months_to_calc = months_to_calc
         
         
         self.all_equip_dict     = {}
         self.all_equip_dict_h2s = {}
+        self.annual_h2s         = pd.DataFrame()
+        self.results            = {} # {(unit_key, month): (emis, h2s)}
+        self.toxics_by_fuel     = {} # {(unit_key, month): toxics df by fuel}
         
         self.ordered_equip = self.annual_equip.ordered_equip
     
@@ -77,6 +86,52 @@ class AnnualParser(object):
                        +str(self.year_to_calc)+'_'
                        +df.name+'{}.csv')
             df.round(cf.round_decimals).to_csv(outname.format(format_str))
+        if self.is_h2plant2_toxics:
+            self.write_toxics_by_fuel(format_str)
+        self.run_report_plugins()
+    
+    def write_toxics_by_fuel(self, format_str):
+        """Write [equipment, month, fuel] x toxics CSV for units split by fuel."""
+        """
+        Only units calculated by a whole-year engine that splits toxics by
+        fuel (h2_plant_2: PSA offgas and NG) have entries.
+        """
+        fuel_labels = {'fuel_rfg': 'PSA Offgas',
+                       'fuel_ng' : 'Natural Gas',
+                       'total'   : 'Total'}
+        replace_WEDpt = dict((v, k) for k, v in self.annual_equip.unitID_equip.items())
+        frames = []
+        for unit_key in self.get_ordered_equip_to_calculate():
+            for month in self.months_to_calc:
+                if (unit_key, month) not in self.toxics_by_fuel:
+                    continue
+                by_fuel = self.toxics_by_fuel[(unit_key, month)].T
+                by_fuel.insert(0, 'Fuel', [fuel_labels[fuel] for fuel in by_fuel.index])
+                by_fuel.insert(0, 'WED Pt', replace_WEDpt.get(unit_key, unit_key))
+                by_fuel['equipment'] = self.annual_equip.unitkey_name[unit_key]
+                if self.write_month_names:
+                    by_fuel['month'] = self.month_map.get(str(month), month)
+                frames.append(by_fuel)
+        if not frames:
+            return
+        by_fuel = (pd.concat(frames)
+                     .rename(columns=cf.output_colnames_map)
+                     .rename(columns={'Refinery Fuel Gas': 'PSA Offgas'})
+                     .set_index(['WED Pt', 'Equipment', 'Month', 'Fuel']))
+        by_fuel = by_fuel.apply(pd.to_numeric)
+        outname = (cf.out_dir_child+str(self.year_to_calc)
+                   +'_by_Equip_x_Month_x_Fuel{}.csv'.format(format_str))
+        by_fuel.round(cf.round_decimals).to_csv(outname)
+    
+    def run_report_plugins(self):
+        """Pass in-memory results to each report plugin listed in the config file."""
+        """
+        A report plugin is a module defining write_report(parser), called with
+        this AnnualParser() instance after the standard CSVs are written.
+        """
+        import importlib
+        for plugin in cf.report_plugins:
+            importlib.import_module(plugin).write_report(self)
     
     def groupby_annual(self):
         """Aggregate data in multiple schemes, return pd.DataFrame list."""
@@ -84,8 +139,30 @@ class AnnualParser(object):
         if self.is_criteria:
             annual_df = self.subtract_h2so4_if_output(annual_df)
         MI_col = self.return_MI_colnames(annual_df)
+        if self.is_criteria and cf.update_ledger:
+            import ledger
+            ledger.update_ledger(annual_df, self.year_to_calc, MI_col)
+        if cf.write_warehouse:
+            from warehouse import warehouse
+            warehouse.record(self.annual_equip, self.warehouse_label(), annual_df, MI_col)
         print('Slicing and dicing emissions data for output.')
         
+        frames = self.groupby_frames(annual_df, MI_col)
+        self.eXm_gb = frames[3]
+        
+        if self.is_criteria:
+            self.groupby_annual_h2s()
+        
+        return frames
+    
+    @staticmethod
+    def groupby_frames(annual_df, MI_col):
+        """Return list of output pd.DataFrames aggregated by equipment/month/quarter."""
+        """
+        `annual_df` has columns ['WED Pt', 'Equipment', 'Month', <parameters>];
+        `MI_col` is the matching (Parameter, Units) pd.MultiIndex. Used for
+        calculated results and for reports rendered from the warehouse.
+        """
         # Groupby [equipment, month] --> [equipment, month] x pollutants
         eXm_gb = (annual_df.groupby(['WED Pt', 'Equipment', 'Month'],
                                     sort=False)
@@ -133,17 +210,23 @@ class AnnualParser(object):
         q_gb.columns = MI_col
         q_gb.name = 'by_Quarter'
         
-        if self.is_criteria:
-            self.groupby_annual_h2s()
-        
         return [e_gb, m_gb, q_gb, eXm_gb, eXq_gb, qXe_gb]
     
+    def warehouse_label(self):
+        """Return calculation name under which results are stored in the warehouse."""
+        if self.is_criteria and 'CO2' in cf.pollutants_to_calculate:
+            return 'GHG'
+        return self.calculation
+    
 # TODO: refactor to have same logic flow as for criteria pollutant values
     def groupby_annual_h2s(self):
         """Aggregate H2S output by year, write to files."""
         h2s_df = self.h2s_df_formatted.copy()
         h2s_df.drop(columns=['H2S_CEMS_src'], inplace=True)
         MI_col = self.MI_col_h2s
+        if cf.write_warehouse:
+            from warehouse import warehouse
+            warehouse.record(self.annual_equip, 'H2S', h2s_df, MI_col)
 
         # Groupby [equipment, month] --> [equipment, month] x pollutants
         eXm_gb = (h2s_df.groupby(['WED Pt', 'Equipment', 'Month'],
@@ -324,103 +407,157 @@ class AnnualParser(object):
         """Return pd.DataFrame of annual emissions from listed equipment."""
         print('Calculating{}emissions for equipment and months specified...'.format(
             self.toxics_text))
-        if 'CO2' not in cf.pollutants_to_calculate:
-            if 'heaterboiler' in cf.equip_types_to_calculate:
-                annual_hb       = equipClass.AnnualHB(self.annual_equip)
-            if 'coker_old' in cf.equip_types_to_calculate:
-                annual_coker_old= equipClass.AnnualCokerOLD(self.annual_equip)
-            if 'coker_new' in cf.equip_types_to_calculate:
-                annual_coker    = equipClass.AnnualCoker(self.annual_equip)
-            if 'calciner' in cf.equip_types_to_calculate:
-                annual_calciner = equipClass.AnnualCalciner(self.annual_equip)
-            if 'flare' in cf.equip_types_to_calculate:
-                annual_flare    = equipClass.AnnualFlare(self.annual_equip)
-            if 'h2plant' in cf.equip_types_to_calculate:
-                annual_h2plant  = equipClass.AnnualH2Plant(self.annual_equip)
-            ordered_equip_to_calculate = [
-                                e for e in self.ordered_equip
-                                if e in cf.equip_to_calculate
-                                ]
-            if self.is_FG_toxics:
-                to_remove = ['h2_flare', 'h2_plant_2', 'calciner_1', 'calciner_2']
-                ordered_equip_to_calculate = [
-                            e for e in ordered_equip_to_calculate
-                            if e not in to_remove
-                            ]
-            elif self.is_calciner_toxics:
-                ordered_equip_to_calculate = ['calciner_1', 'calciner_2']
-            elif self.is_h2plant2_toxics:
-                ordered_equip_to_calculate = ['h2_plant_2']
-            for unit_key in ordered_equip_to_calculate:
-                each_equip_ser       = []
-                each_equip_tuple_h2s = []
-                for month in self.months_to_calc:
-                    if self.verbose_logging:
-                        print('\tCalculating month {:2d}{}emissions for {}...'
-                                    .format(month, self.toxics_text,
-                                            self.annual_equip.unitkey_name[unit_key]))
-                    # eu_type --> 'flare', 'calciner', etc.
-                    eu_type = self.equip_types[unit_key]
-                    # instantiate annual equip_type class instances
-                    if eu_type == 'heaterboiler':
-                        eu = equipClass.MonthlyHB(unit_key, month, annual_hb)
-                    elif eu_type == 'coker_new':
-                        eu = equipClass.MonthlyCoker(unit_key, month, annual_coker)
-                    elif eu_type == 'coker_old':
-                        eu = equipClass.MonthlyCokerOLD(unit_key, month, annual_coker_old)
-                    elif eu_type == 'calciner':
-                        eu = equipClass.MonthlyCalciner(unit_key, month, annual_calciner)
-                    elif eu_type == 'flare':
-                        eu = equipClass.MonthlyFlare(unit_key, month, annual_flare)
-                    elif eu_type == 'h2plant':
-                        eu = equipClass.MonthlyH2Plant(unit_key, month, annual_h2plant)
-                    
-                    if self.is_criteria:
-                        emis = eu.monthly_emis
-                        if eu.monthly_emis_h2s is None:
-                            h2s_tuple = None
-                        else:
-                            h2s_tuple = eu.monthly_emis_h2s
-                    else:
-                        emis = eu.monthly_toxics
-                    each_equip_ser.append(emis)
-                    if self.is_criteria:
-                        each_equip_tuple_h2s.append(h2s_tuple)
-
-                all_months = pd.concat(each_equip_ser, axis=1)
-                self.all_equip_dict[unit_key] = all_months
-
-                if each_equip_tuple_h2s:
-                    tups_not_None = [tup for tup
-                                     in each_equip_tuple_h2s
-                                     if not tup is None]
-                    all_months_h2s = pd.DataFrame(
-                                        tups_not_None,
-                                        columns=['month', 'equipment', 
-                                                 'fuel_rfg', 'h2s', 'h2s_cems']
-                                                 )
-                else:
-                    all_months_h2s = pd.DataFrame({'empty_col' : []})
-                self.all_equip_dict_h2s[unit_key] = all_months_h2s
+        self.annual_eus = self.instantiate_annual_eus()
+        ordered_equip_to_calculate = self.get_ordered_equip_to_calculate()
         
-        elif 'CO2' in cf.pollutants_to_calculate:
-            annual_coker_co2 = equipClass.AnnualCoker_CO2(self.annual_equip)
+        # results kept from a previous call are reused (see invalidate_months)
+        if cf.streaming_mode:
+            # month-major: only one month of CEMS resident at a time
+            months = [month for month in self.months_to_calc
+                      if any((unit_key, month) not in self.results
+                             for unit_key in ordered_equip_to_calculate)]
+            for month in self.annual_equip.stream_months(months):
+                for unit_key in ordered_equip_to_calculate:
+                    if (unit_key, month) not in self.results:
+                        self.calculate_unit_months(unit_key, [month])
+        else:
             for unit_key in ordered_equip_to_calculate:
-                each_equip_ser = []
-                for month in self.months_to_calc:
-                    if self.verbose_logging:
-                        print('\tCalculating month {:2d}{}emissions for {}...'
-                                    .format(month, self.toxics_text,
-                                            self.annual_equip.unitkey_name[unit_key]))
-                    # eu_type --> 'flare' , 'calciner', etc.
-                    eu_type = self.equip_types[unit_key]
-                    # instantiate annual equip_type class instances
-                    if eu_type == 'coker_new':
-                        eu = equipClass.MonthlyCoker_CO2(unit_key, month, annual_coker_co2)
-                        emis = eu.monthly_emis
-                    each_equip_ser.append(emis)
-                all_months = pd.concat(each_equip_ser, axis=1)
-                self.all_equip_dict[unit_key] = all_months
+                self.calculate_unit_months(unit_key,
+                                           [month for month in self.months_to_calc
+                                            if (unit_key, month) not in self.results])
+        
+        return self.assemble_annual_from_results(ordered_equip_to_calculate)
+    
+    def instantiate_annual_eus(self):
+        """Return dict of annual equip_type class instances ({eu_type: Annual*})."""
+        if 'CO2' in cf.pollutants_to_calculate:
+            return {'coker_new': self.annual_equip.get_annual_eu(
+                                                equipClass.AnnualCoker_CO2)}
+        annual_classes = {
+            'heaterboiler': equipClass.AnnualHB,
+            'coker_old'   : equipClass.AnnualCokerOLD,
+            'coker_new'   : equipClass.AnnualCoker,
+            'calciner'    : equipClass.AnnualCalciner,
+            'flare'       : equipClass.AnnualFlare,
+            'h2plant'     : equipClass.AnnualH2Plant,
+            }
+        eu_types = set(self.annual_equip.registry[unit_key].eu_type
+                       for unit_key in self.get_ordered_equip_to_calculate())
+        return {eu_type: self.annual_equip.get_annual_eu(annual_classes[eu_type])
+                for eu_type in eu_types}
+    
+    def get_ordered_equip_to_calculate(self):
+        """Return list of equipment to calculate, ordered by WED Pt."""
+        ordered_equip_to_calculate = [
+                            e for e in self.ordered_equip
+                            if e in self.equip_to_calc
+                            ]
+        if self.is_FG_toxics:
+            to_remove = ['h2_flare', 'h2_plant_2', 'calciner_1', 'calciner_2']
+            ordered_equip_to_calculate = [
+                        e for e in ordered_equip_to_calculate
+                        if e not in to_remove
+                        ]
+        elif self.is_calciner_toxics:
+            ordered_equip_to_calculate = ['calciner_1', 'calciner_2']
+        elif self.is_h2plant2_toxics:
+            ordered_equip_to_calculate = ['h2_plant_2']
+        return ordered_equip_to_calculate
+    
+    def invalidate_months(self, months):
+        """Drop stored results for months so they are recalculated."""
+        for key in [key for key in self.results if key[1] in months]:
+            del self.results[key]
+            self.toxics_by_fuel.pop(key, None)
+    
+    def calculate_unit_months(self, unit_key, months):
+        """Calculate emissions for one unit and several months, store in self.results."""
+        """
+        Units whose Annual* class has a whole-year engine (calculate_annual)
+        are calculated for all months in one pass; others month by month.
+        """
+        if not months:
+            return
+        annual_eu = self.annual_eus[self.annual_equip.registry[unit_key].eu_type]
+        if ('CO2' in cf.pollutants_to_calculate
+                or not hasattr(annual_eu, 'calculate_annual')):
+            for month in months:
+                self.calculate_unit_month(unit_key, month)
+            return
+        if self.verbose_logging:
+            print('\tCalculating months {}-{}{}emissions for {}...'
+                        .format(months[0], months[-1], self.toxics_text,
+                                self.annual_equip.unitkey_name[unit_key]))
+        results = annual_eu.calculate_annual(unit_key, months)
+        for month in months:
+            if self.is_criteria:
+                self.results[(unit_key, month)] = (results['criteria'][month], None)
+            else:
+                self.results[(unit_key, month)] = (results['toxics'][month], None)
+            if 'toxics_by_fuel' in results:
+                self.toxics_by_fuel[(unit_key, month)] = results['toxics_by_fuel'][month]
+    
+    def calculate_unit_month(self, unit_key, month):
+        """Calculate emissions for one unit and month, store in self.results."""
+        """
+        self.results structure: {(unit_key, month): (emissions ser, H2S tuple)}
+        """
+        if self.verbose_logging:
+            print('\tCalculating month {:2d}{}emissions for {}...'
+                        .format(month, self.toxics_text,
+                                self.annual_equip.unitkey_name[unit_key]))
+        # eu_type --> 'flare', 'calciner', etc.
+        eu_type = self.annual_equip.registry[unit_key].eu_type
+        annual_eu = self.annual_eus[eu_type]
+        
+        if 'CO2' in cf.pollutants_to_calculate:
+            eu = equipClass.MonthlyCoker_CO2(unit_key, month, annual_eu)
+            self.results[(unit_key, month)] = (eu.monthly_emis, None)
+            return
+        
+        # instantiate monthly equip_type class instances
+        if eu_type == 'heaterboiler':
+            eu = equipClass.MonthlyHB(unit_key, month, annual_eu)
+        elif eu_type == 'coker_new':
+            eu = equipClass.MonthlyCoker(unit_key, month, annual_eu)
+        elif eu_type == 'coker_old':
+            eu = equipClass.MonthlyCokerOLD(unit_key, month, annual_eu)
+        elif eu_type == 'calciner':
+            eu = equipClass.MonthlyCalciner(unit_key, month, annual_eu)
+        elif eu_type == 'flare':
+            eu = equipClass.MonthlyFlare(unit_key, month, annual_eu)
+        elif eu_type == 'h2plant':
+            eu = equipClass.MonthlyH2Plant(unit_key, month, annual_eu)
+        
+        if self.is_criteria:
+            self.results[(unit_key, month)] = (eu.monthly_emis,
+                                               eu.monthly_emis_h2s)
+        else:
+            self.results[(unit_key, month)] = (eu.monthly_toxics, None)
+    
+    def assemble_annual_from_results(self, units):
+        """Concatenate stored unit x month results, return annual pd.DataFrame."""
+        self.all_equip_dict     = {}
+        self.all_equip_dict_h2s = {}
+        for unit_key in units:
+            unit_results = [self.results[(unit_key, month)]
+                            for month in self.months_to_calc]
+            all_months = pd.concat([emis for emis, h2s in unit_results], axis=1)
+            self.all_equip_dict[unit_key] = all_months
+            
+            if 'CO2' in cf.pollutants_to_calculate:
+                continue
+            if self.is_criteria:
+                tups_not_None = [h2s for emis, h2s in unit_results
+                                 if not h2s is None]
+                all_months_h2s = pd.DataFrame(
+                                    tups_not_None,
+                                    columns=['month', 'equipment', 
+                                             'fuel_rfg', 'h2s', 'h2s_cems']
+                                             )
+            else:
+                all_months_h2s = pd.DataFrame({'empty_col' : []})
+            self.all_equip_dict_h2s[unit_key] = all_months_h2s
         
         # transpose and concatenate data
         annual_dfs = []
@@ -438,4 +575,4 @@ class AnnualParser(object):
         
         # convert type "object" to type "float"
         annual[annual.columns[2:]] = annual[annual.columns[2:]].astype(float)
-        return annual
\ No newline at end of file
+        return annual
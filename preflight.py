@@ -0,0 +1,348 @@
+# pre-flight checks of input files (headers, sheet names, small samples) before parsing
+import os, time
+import pandas as pd
+
+# module-level imports
+import config as cf
+import inputio
+import ffactor as ff
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+# text written by PI for values it could not calculate
+PI_NO_DATA = '[-11059] No Good Data For Calculation'
+
+class Preflight(object):
+    """Check configured inputs against the layout the parsers expect."""
+    """
+    Reads only file headers, sheet names and the first
+    cf.preflight_sample_rows rows of each input (plus the PI-tag column of
+    each CEMS file) and collects every problem instead of stopping at the
+    first. Errors are problems the full parse would fail on (or silently
+    mis-read); warnings are values the parse would coerce to missing.
+    """
+    def __init__(self, nrows=None):
+        """Constructor for empty problem lists."""
+        self.nrows    = nrows if nrows is not None else cf.preflight_sample_rows
+        self.errors   = [] # [(input description, message)]
+        self.warnings = [] # [(input description, message)]
+
+    def error(self, desc, msg):
+        self.errors.append((desc, msg))
+
+    def warn(self, desc, msg):
+        self.warnings.append((desc, msg))
+
+    def run(self):
+        """Run all checks, print report, return True if no errors were found."""
+        start_time_seconds = time.time()
+        print('Running pre-flight checks of input files.')
+        equip = self.check_equip_map()
+        self.check_chem(cf.fpath_NG_chem, 'NG chemical data')
+        self.check_chem(cf.fpath_FG_chem, 'FG chemical data')
+        self.check_effparams()
+        self.check_CEMS(equip)
+        self.check_lab_analyses()
+        self.check_fuel()
+        self.check_flare_fuel()
+        self.check_EFs()
+        self.check_flare_EFs()
+        self.check_toxics_EFs()
+        units = set(cf.equip_to_calculate)
+        if units & set(['coker_e', 'coker_w']):
+            self.check_ewcoker()
+        if units & set(['calciner_1', 'calciner_2']):
+            self.check_coke()
+        if 'h2_plant_2' in units:
+            self.check_PSAstack()
+        self.report(time.time() - start_time_seconds)
+        return not self.errors
+
+    def report(self, seconds):
+        """Print all errors and warnings."""
+        for label, problems in [('ERROR', self.errors), ('WARNING', self.warnings)]:
+            for desc, msg in problems:
+                print('  ***{}: {}: {}***'.format(label, desc, msg))
+        print('  pre-flight checks found {} error(s), {} warning(s) in {} seconds'
+              .format(len(self.errors), len(self.warnings), round(seconds, 1)))
+
+    def exists(self, path, desc):
+        if not inputio.exists(path):
+            self.error(desc, 'file not found: \''+path+'\'')
+            return False
+        return True
+
+    def sheet_names(self, path, desc):
+        """Return list of workbook sheet names (None if unreadable)."""
+        if not self.exists(path, desc):
+            return None
+        try:
+            return inputio.sheet_names(path)
+        except Exception as e:
+            self.error(desc, 'cannot open workbook \''+path+'\' ('+str(e)+')')
+            return None
+
+    def require_sheet(self, sheets, sheet, desc, setting):
+        if sheets is not None and sheet not in sheets:
+            self.error(desc, 'sheet \'{}\' ({}) not found; sheets are {}'.format(
+                             sheet, setting, sheets))
+            return False
+        return sheets is not None
+
+    def require_columns(self, columns, expected, desc):
+        missing = [col for col in expected if col not in columns]
+        if missing:
+            self.error(desc, 'expected column(s) {} not found'.format(missing))
+        return not missing
+
+    def check_text_values(self, df, desc, allowed=(), coerced=False):
+        """Flag text in numeric data: error, or warning if the parser coerces it to NaN."""
+        for col in df.columns:
+            vals = df[col].dropna()
+            text = vals[vals.map(lambda v: isinstance(v, str))]
+            text = sorted(set(t for t in text if t.strip() not in allowed))
+            if text:
+                msg = 'text {} in numeric column {}'.format(text[:3], col)
+                if coerced:
+                    self.warn(desc, msg+' (will be read as missing)')
+                else:
+                    self.error(desc, msg)
+
+    def check_equip_map(self):
+        """Check equipment map columns and units to calculate; return pd.DataFrame or None."""
+        desc = 'equipment map'
+        if not self.exists(cf.fpath_eqmap, desc):
+            return None
+        equip = inputio.read_csv(cf.fpath_eqmap)
+        if not self.require_columns(equip.columns, ['PI Tag', 'Python GUID', 'WED Pt',
+                                                    'Unit Name', 'CEMS', 'Units'], desc):
+            return None
+        unknown = [u for u in cf.equip_to_calculate
+                   if u not in set(equip['Python GUID'])]
+        if unknown:
+            self.error(desc, 'units to calculate not in map: {}'.format(unknown))
+        return equip
+
+    def check_chem(self, path, desc):
+        if not self.exists(path, desc):
+            return
+        chem = inputio.read_csv(path, nrows=self.nrows)
+        self.require_columns(chem.columns, ['compound', 'mw', 'atoms_C', 'atoms_H',
+                                            'atoms_O', 'atoms_N'], desc)
+
+    def check_effparams(self):
+        desc = 'effective-dated parameters'
+        if not self.exists(cf.fpath_effparams, desc):
+            return
+        params = inputio.read_csv(cf.fpath_effparams)
+        if not self.require_columns(params.columns, ['unit_key', 'parameter',
+                                                     'valid_from', 'value'], desc):
+            return
+        bad_dates = params.loc[pd.to_datetime(params['valid_from'],
+                                              errors='coerce').isnull(), 'valid_from']
+        if not bad_dates.empty:
+            self.error(desc, 'unreadable valid_from {}'.format(list(bad_dates)[:3]))
+        self.check_text_values(params[['value']], desc)
+        required = [('calciner_1', 'wesp_dscf_per_ton')]
+        for unit_key, parameter in required:
+            if (unit_key in cf.equip_to_calculate
+                    and not ((params['unit_key'] == unit_key)
+                             & (params['parameter'] == parameter)).any()):
+                self.error(desc, 'no \''+parameter+'\' rows for \''+unit_key+'\'')
+
+    def check_CEMS(self, equip):
+        """Check each month's CEMS files and that every expected PI tag is present."""
+        header = 0 if cf.data_year == 2018 else None
+        CEMS_paths = inputio.glob(cf.CEMS_dir+'*')
+        tags_by_month = {}
+        for month in cf.months_to_calculate:
+            desc = 'CEMS month '+str(month)
+            paths = [path for path in CEMS_paths
+                     if os.path.basename(path)[:2] == str(month).zfill(2)]
+            if not paths:
+                self.error(desc, 'no file \'{}{}*\' in CEMS directory'.format(
+                                 cf.CEMS_dir, str(month).zfill(2)))
+                continue
+            tags = set()
+            for path in paths:
+                sample = inputio.read_csv(path, header=header, nrows=self.nrows)
+                if sample.shape[1] < 6:
+                    self.error(desc, 'expected at least 6 columns, found {} in \'{}\''
+                                     .format(sample.shape[1], path))
+                    continue
+                if pd.to_datetime(sample.iloc[:, 2], errors='coerce').isnull().any():
+                    self.error(desc, 'unparseable timestamps in column 3 of \''+path+'\'')
+                tags.update(inputio.read_csv(path, header=header,
+                                             usecols=[1]).iloc[:, 0])
+            tags_by_month[month] = tags
+        if equip is None or not tags_by_month:
+            return
+        expected = equip.loc[equip['Python GUID'].isin(cf.equip_to_calculate)
+                             & equip['CEMS'].notnull(), ['Python GUID', 'PI Tag']]
+        for unit_key, ptag in expected.itertuples(index=False):
+            absent = [month for month, tags in tags_by_month.items()
+                      if ptag not in tags]
+            if absent:
+                # calculated as an absent tag: NaN CEMS column, EF path
+                self.warn('CEMS', 'PI tag {} ({}) has no data in month(s) {}; '
+                                  'calculated as absent (NaN, EF path)'
+                                  .format(ptag, unit_key, absent))
+
+    def check_lab_analyses(self):
+        """Check lab-analysis tabs, compound rows, sample dates and values."""
+        desc = 'gas lab analyses'
+        sheets = self.sheet_names(cf.fpath_analyses, desc)
+        labtabs = [('labtab_RFG', cf.labtab_RFG), ('labtab_cokerFG', cf.labtab_cokerFG),
+                   ('labtab_flare', cf.labtab_flare),
+                   ('labtab_PSA', cf.labtab_PSA)]
+        for setting, tab in labtabs:
+            if not self.require_sheet(sheets, tab, desc, setting):
+                continue
+            data = inputio.read_excel(cf.fpath_analyses, sheet_name=tab, skiprows=4,
+                                      header=[0,1], index_col=0)
+            tab_desc = desc+' \''+tab+'\''
+            self.require_columns(data.index, list(ff.FG_compounds.keys())+['GBTU/CF'],
+                                 tab_desc+' (compound rows)')
+            dates = pd.to_datetime(pd.Series(data.columns.get_level_values(0)),
+                                   errors='coerce')
+            if dates.isnull().any():
+                self.error(tab_desc, 'non-date sample header(s) {}'.format(
+                    list(data.columns.get_level_values(0)[dates.isnull().values])[:3]))
+            compounds = list(ff.FG_compounds.keys()) + ['GBTU/CF']
+            self.check_text_values(data.loc[data.index.isin(compounds)].T,
+                                   tab_desc, allowed=('****', '--'))
+        if self.require_sheet(sheets, cf.labtab_NG, desc, 'labtab_NG'):
+            data = inputio.read_excel(cf.fpath_analyses, sheet_name=cf.labtab_NG,
+                                      skiprows=8)[:12]
+            self.require_columns(data.columns, ['Sample Date', 'GBTU/CF']
+                                               + list(ff.NG_compounds.keys()),
+                                 desc+' \''+cf.labtab_NG+'\'')
+
+    def check_fuel(self):
+        """Check fuel workbook sheet and the columns its positional slices select."""
+        desc = 'fuel usage'
+        if cf.input_source == 'historian':
+            self.exists(cf.fpath_fuel, desc+' (historian cache)')
+            return
+        sheets = self.sheet_names(cf.fpath_fuel, desc)
+        if not self.require_sheet(sheets, cf.sheet_fuel, desc, 'sheet_fuel'):
+            return
+        fuel = inputio.read_excel(cf.fpath_fuel, sheet_name=cf.sheet_fuel, skiprows=9,
+                                  header=list(range(6)), nrows=self.nrows)
+        if fuel.shape[1] < 46:
+            self.error(desc, 'expected at least 46 columns, found {}'.format(fuel.shape[1]))
+            return
+        fuel.columns = fuel.columns.droplevel([5, 4, 1])
+        fuel = fuel.set_index(fuel.columns.tolist()[0])
+        # same positional slices as AnnualEquipment._parse_annual_fuel()
+        kept = pd.concat([fuel.iloc[:,0:30], fuel.iloc[:,32:40],
+                          fuel.iloc[:,42:45]], axis=1)
+        unit_ids = set(str(col) for col in kept.columns.get_level_values(0))
+        expected = ['10 VTG_sum1', '10 VTG_sum2', '20_sum1', '20_sum2', '20_sum3',
+                    '20_sum4', '21_sum1', '21_sum2', '21_sum3', '21_sum4',
+                    '70_sum1_RFG', '70_sum2_RFG', '52', '70_NG', '71_NG', '71_RFG']
+        self.require_columns(unit_ids, expected, desc+' (after column slices)')
+        dropped = [str(col[0]) for col in pd.concat([fuel.iloc[:,30:32],
+                                                     fuel.iloc[:,40:42]],
+                                                    axis=1).columns]
+        if any(unit_id in expected for unit_id in dropped):
+            self.error(desc, 'columns shifted; sliced-out columns are {}'.format(dropped))
+        self.check_text_values(kept, desc, coerced=True)
+
+    def check_flare_fuel(self):
+        desc = 'flare-fuel usage'
+        if not self.exists(cf.fpath_flarefuel, desc):
+            return
+        df = inputio.read_excel(cf.fpath_flarefuel, skiprows=4, nrows=self.nrows)
+        if self.require_columns(df.columns, ['1 h', '46FI202.PV', '46FI231.PV',
+                                             '46PC60.OP'], desc):
+            self.check_text_values(df[['46FI202.PV', '46FI231.PV', '46PC60.OP']],
+                                   desc, allowed=(PI_NO_DATA,))
+
+    def check_EFs(self):
+        """Check one EF tab per month and that EF values are numeric or 'CEMS'."""
+        desc = 'monthly EFs'
+        sheets = self.sheet_names(cf.fpath_EFs, desc)
+        for month in cf.months_to_calculate:
+            tab = '{}_{}'.format(cf.data_year, str(month).zfill(2))
+            if not self.require_sheet(sheets, tab, desc, 'month '+str(month)):
+                continue
+            efs = inputio.read_excel(cf.fpath_EFs, sheet_name=tab, skiprows=5,
+                                     header=None, usecols='A:E')
+            if efs.shape[1] < 5:
+                self.error(desc+' \''+tab+'\'', 'expected 5 columns (A:E)')
+                continue
+            efs.columns = ['unit_id', 'src_name_BP', 'pollutant', 'ef', 'units']
+            efs = efs[efs['pollutant'].astype(str).str.strip().str.lower().isin(
+                          ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10', 'h2so4'])]
+            if efs.empty:
+                self.error(desc+' \''+tab+'\'', 'no criteria-pollutant rows in column C')
+            self.check_text_values(efs[['ef']], desc+' \''+tab+'\'',
+                                   allowed=('CEMS', 'cems'))
+
+    def check_flare_EFs(self):
+        desc = 'flare EFs'
+        sheets = self.sheet_names(cf.fpath_flareEFs, desc)
+        if self.require_sheet(sheets, 'Summary', desc, 'hard-coded'):
+            df = inputio.read_excel(cf.fpath_flareEFs, sheet_name='Summary',
+                                    skiprows=29, usecols=[0,1,2], nrows=13)
+            self.require_columns(df.columns.str.lower(),
+                                 ['pollutant', 'value', 'units'], desc)
+
+    def check_toxics_EFs(self):
+        desc = 'toxics EFs'
+        if self.exists(cf.fpath_toxicsEFs, desc):
+            df = inputio.read_excel(cf.fpath_toxicsEFs, header=3, usecols=[0,2,3],
+                                    nrows=self.nrows)
+            if self.require_columns(df.columns, ['Chemical', 'EF', 'EF Units'], desc):
+                self.check_text_values(df[['EF']], desc)
+        desc = 'calciner toxics EFs'
+        if self.exists(cf.fpath_toxicsEFs_calciners, desc):
+            df = inputio.read_excel(cf.fpath_toxicsEFs_calciners, header=7,
+                                    nrows=self.nrows)
+            if df.shape[1] < 10:
+                self.error(desc, 'expected at least 10 columns, found {}'.format(
+                                 df.shape[1]))
+
+    def check_ewcoker(self):
+        desc = 'E/W coker data'
+        sheet = 'East & West Coker Data'
+        sheets = self.sheet_names(cf.fpath_ewcoker, desc)
+        if not self.require_sheet(sheets, sheet, desc, 'hard-coded'):
+            return
+        df = inputio.read_excel(cf.fpath_ewcoker, sheet_name=sheet, header=3,
+                                nrows=self.nrows)
+        if df.shape[1] < 12:
+            self.error(desc, 'expected at least 12 columns, found {}'.format(df.shape[1]))
+            return
+        for cols in [[0,1,2,3], [5,6,7,8], [10,11]]:
+            block = df.iloc[:, cols]
+            if pd.to_datetime(block.iloc[:, 0], errors='coerce').isnull().all():
+                self.error(desc, 'column {} is not timestamps'.format(cols[0] + 1))
+            self.check_text_values(block.iloc[:, 1:], desc, allowed=('--',))
+
+    def check_coke(self):
+        desc = 'coke usage'
+        if not self.exists(cf.fpath_coke, desc):
+            return
+        df = inputio.read_excel(cf.fpath_coke, skiprows=[0,1], header=[0,1], nrows=self.nrows)
+        df.columns = df.columns.droplevel(1)
+        if self.require_columns(df.columns, ['1h', '20WK5000.PV', '20WK5001.PV',
+                                             '20WK5002.PV'], desc):
+            self.check_text_values(df[['20WK5000.PV', '20WK5001.PV', '20WK5002.PV']],
+                                   desc, allowed=(PI_NO_DATA,))
+
+    def check_PSAstack(self):
+        desc = 'PSA offgas flow'
+        if not self.exists(cf.fpath_PSAstack, desc):
+            return
+        df = inputio.read_excel(cf.fpath_PSAstack, skiprows=2, header=[0,1], nrows=self.nrows)
+        df.columns = df.columns.droplevel(1)
+        if self.require_columns(df.columns, ['1 h', '46FC36.PV', '46FI187.PV',
+                                             '46FS38.PV'], desc):
+            self.check_text_values(df[['46FC36.PV', '46FI187.PV', '46FS38.PV']],
+                                   desc, coerced=True)
+
+def run_preflight():
+    """Run all pre-flight checks, return True if no errors were found."""
+    return Preflight().run()
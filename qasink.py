@@ -0,0 +1,96 @@
+# in-memory sink for QA / diagnostic tables, written once per run
+import os, threading, time, zipfile
+from collections import OrderedDict
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+class QASink(object):
+    """Collect QA tables during a run, write them to the run's output folder."""
+    """
+    Calculation code calls add() instead of writing files, so no file I/O
+    happens in the parsing/calculation hot path. flush() writes everything
+    collected since the last flush to <out_dir_child>QA/ (one CSV per
+    table), or into a single <out_dir_child><year>_QA.zip archive if
+    cf.QA_archive is set, optionally on a background thread
+    (cf.QA_background). With cf.write_QA off, add() discards tables, for
+    fast exploratory runs.
+    """
+    def __init__(self):
+        """Constructor for empty buffer."""
+        self.buffer   = OrderedDict() # {filename: (pd.DataFrame, to_csv kwargs)}
+        self.archived = False         # True once this process has written the archive
+        self.thread   = None
+
+    def add(self, name, df, **to_csv_kwargs):
+        """Buffer one table to be written as CSV file `name` (replaces same name)."""
+        if not cf.write_QA:
+            return
+        self.buffer[name] = (df, to_csv_kwargs)
+
+    def QA_dir(self):
+        return cf.out_dir_child+'QA/'
+
+    def archive_path(self):
+        return cf.out_dir_child+str(cf.data_year)+'_QA.zip'
+
+    def location(self, name):
+        """Return where table `name` is (or will be) written, for messages."""
+        if cf.QA_archive:
+            return self.archive_path()+':'+name
+        return self.QA_dir()+name
+
+    def flush(self, background=None):
+        """Write buffered tables, clear buffer."""
+        if background is None:
+            background = cf.QA_background
+        if not self.buffer:
+            return
+        self.wait()
+        buffer, self.buffer = self.buffer, OrderedDict()
+        if background:
+            self.thread = threading.Thread(target=self._write, args=(buffer,))
+            self.thread.start()
+        else:
+            self._write(buffer)
+
+    def wait(self):
+        """Block until a background write (if any) has finished."""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _write(self, buffer):
+        start_time_seconds = time.time()
+        if cf.QA_archive:
+            self._write_archive(buffer)
+            where = self.archive_path()
+        else:
+            if not os.path.exists(self.QA_dir()):
+                os.makedirs(self.QA_dir())
+            for name, (df, kwargs) in buffer.items():
+                df.to_csv(self.QA_dir()+name, **kwargs)
+            where = self.QA_dir()
+        print('  wrote {} QA table(s) to \'{}\' ({} seconds)'.format(
+                  len(buffer), where, round(time.time() - start_time_seconds, 1)))
+
+    def _write_archive(self, buffer):
+        """Write tables into the archive, keeping other tables written by this run."""
+        path = self.archive_path()
+        kept = OrderedDict()
+        if self.archived and os.path.exists(path):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name not in buffer:
+                        kept[name] = archive.read(name)
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in kept.items():
+                archive.writestr(name, data)
+            for name, (df, kwargs) in buffer.items():
+                archive.writestr(name, df.to_csv(**kwargs))
+        self.archived = True
+
+# one sink per process, shared by all modules
+sink = QASink()
@@ -0,0 +1,105 @@
+# immutable equipment registry compiled once from the equipment map and config
+import time
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+UnitInfo = namedtuple('UnitInfo', [
+    'uid',        # int: order of first appearance in the equipment map, for array-based engines
+    'unit_key',   # str: Python GUID, e.g. 'coker_e'
+    'unit_id',    # str: WED Pt, e.g. '40 E'
+    'unit_name',  # str: pretty name for output
+    'eu_type',    # str: 'heaterboiler', 'coker_new', ... (None if not calculated)
+    'ptags',      # mapping: {param: PI tag} for every CEMS tag of the unit
+    'CEMS_ptags', # tuple: PI tags converted from ppm in emissions calcs
+    'h2s_source', # str: 'coker_h2s', 'cokerOLD_h2s', 'CVTG_h2s' or 'RFG_h2s'
+    'h2s_ptag',   # str: PI tag of the H2S CEMS used for the unit
+    'fuel_cols',  # mapping: {'fuel_rfg': fuel column, 'fuel_ng': fuel column or None}
+    'HHV_source', # str: lab-analysis fuel whose HHV converts lb/mmbtu EFs
+    ])
+
+# parameters whose CEMS tags are converted from ppm in emissions calcs
+CEMS_params = ['nox', 'so2', 'co', 'o2', 'so2_lo', 'so2_hi', 'no', 'no2']
+
+# units burning something other than RFG metered under their own unit key
+fuel_columns = {
+    'h2_plant_2': {'fuel_rfg': None,       'fuel_ng': 'h2_plant_2'},
+    'calciner_1': {'fuel_rfg': '70 (RFG)', 'fuel_ng': '70 (NG)'},
+    'calciner_2': {'fuel_rfg': '71 (RFG)', 'fuel_ng': '71 (NG)'},
+    }
+
+HHV_sources = {
+    'coker_old': 'cokerFG',
+    'coker_new': 'cokerFG',
+    'flare'    : 'flare',
+    'h2plant'  : 'PSA',     # main fuel; NG HHV applies to the NG share
+    }
+
+class Registry(object):
+    """Read-only lookups of per-unit metadata ({unit_key: UnitInfo})."""
+    """
+    Built once per AnnualEquipment() from the parsed equipment map plus
+    config.equip_types and config.h2s_cems_map. All containers are
+    namedtuples, tuples or MappingProxyType, so entries cannot be changed
+    after startup; all lookups are dict lookups.
+    """
+    def __init__(self, equip):
+        """Constructor compiling registry from equipment-map pd.DataFrame."""
+        h2s_source_by_unit = {}
+        for source, units in cf.h2s_cems_map.items():
+            for unit_key in units:
+                h2s_source_by_unit[unit_key] = source.replace('uses_', '')
+
+        units = OrderedDict()
+        for uid, (unit_key, rows) in enumerate(
+                equip.groupby('unit_key', sort=False)):
+            tagged = rows.dropna(subset=['ptag'])
+            eu_type = cf.equip_types.get(unit_key)
+            h2s_source = h2s_source_by_unit.get(unit_key, 'RFG_h2s')
+            if unit_key == 'crude_vtg':
+                HHV_source = 'CVTG'
+            else:
+                HHV_source = HHV_sources.get(eu_type, 'RFG')
+            units[unit_key] = UnitInfo(
+                uid        = uid,
+                unit_key   = unit_key,
+                unit_id    = str(rows['unit_id'].iloc[0]),
+                unit_name  = rows['unit_name'].iloc[0],
+                eu_type    = eu_type,
+                ptags      = MappingProxyType(dict(zip(tagged['param'],
+                                                       tagged['ptag']))),
+                CEMS_ptags = tuple(tagged.loc[tagged['param'].isin(CEMS_params),
+                                              'ptag']),
+                h2s_source = h2s_source,
+                h2s_ptag   = cf.h2s_source_ptags[h2s_source],
+                fuel_cols  = MappingProxyType(fuel_columns.get(
+                                 unit_key, {'fuel_rfg': unit_key, 'fuel_ng': None})),
+                HHV_source = HHV_source)
+        self.units   = MappingProxyType(units)
+        self.by_uid  = tuple(units.keys())
+        self.by_unit_id = MappingProxyType(OrderedDict(
+                              (info.unit_id, unit_key)
+                              for unit_key, info in units.items()))
+
+    def __getitem__(self, unit_key):
+        return self.units[unit_key]
+
+    def __contains__(self, unit_key):
+        return unit_key in self.units
+
+    def __iter__(self):
+        return iter(self.units)
+
+    def uids(self, unit_keys):
+        """Return list of integer unit IDs for unit keys."""
+        return [self.units[unit_key].uid for unit_key in unit_keys]
+
+    def equip_ptags(self):
+        """Return dict of CEMS PI tags by unit ({unit_key: [PItags]}) for units with CEMS."""
+        return dict((unit_key, list(info.CEMS_ptags))
+                    for unit_key, info in self.units.items()
+                    if info.CEMS_ptags)
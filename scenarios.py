@@ -0,0 +1,162 @@
+# batch what-if scenarios evaluated against one parsed AnnualEquipment()
+import json, time
+from collections import OrderedDict
+import pandas as pd
+
+# module-level imports
+import config as cf
+import ffactor as ff
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+# overrides needing data re-preparation; scenarios are grouped by these
+prep_keys = ['MAX_CEMS_TO_FILL', 'calculate_PM_fractions']
+# overrides applied per scenario on top of the prepared data
+cheap_keys = ['EFs', 'HHV', 'f_factor']
+
+def load_scenarios(path):
+    """Read JSON list of scenarios, return list of dicts."""
+    """
+    Example file:
+    [
+      {"name": "RFG Fd 8700",  "f_factor": {"RFG": 8700}},
+      {"name": "fill 24 hrs",  "MAX_CEMS_TO_FILL": 24},
+      {"name": "boiler 5 NOx", "EFs": [{"unit": "boiler_5", "pollutant": "nox",
+                                        "ef": 0.035, "months": [1, 2, 3]}]},
+      {"name": "PM fractions", "calculate_PM_fractions": true,
+                               "HHV": {"RFG": 1.05}}
+    ]
+    EF overrides take either "ef" (replacement value) or "factor"
+    (multiplier) and apply to all months unless "months" is given. HHV
+    and f-factor overrides are keyed by fuel ('RFG', 'NG', 'cokerFG',
+    'CVTG', 'PSA', 'flare').
+    """
+    with open(path) as f:
+        scenarios = json.load(f)
+    names = set()
+    for sc in scenarios:
+        unknown = set(sc.keys()) - set(['name'] + prep_keys + cheap_keys)
+        if 'name' not in sc or unknown:
+            raise ValueError('scenario needs a "name" and only keys '
+                             +str(prep_keys + cheap_keys)+'; got '+str(sorted(sc.keys())))
+        if sc['name'] in names or sc['name'] == 'baseline':
+            raise ValueError('duplicate scenario name: '+sc['name'])
+        names.add(sc['name'])
+    return scenarios
+
+def apply_EF_overrides(EFs, overrides):
+    """Return copy of AnnualEquipment().EFs with EF overrides applied."""
+    """
+    EFs structure: {integer month: (EFs df, EFunits df, equip_EF_dict)};
+    only the months touched by an override are copied.
+    """
+    EFs = dict(EFs)
+    for ov in overrides:
+        months = ov.get('months', list(EFs.keys()))
+        for month in months:
+            efs, units, equip_EF = EFs[month]
+            if ov['unit'] not in equip_EF or ov['pollutant'] not in equip_EF[ov['unit']]:
+                raise ValueError('no EF for {} {} in month {}'.format(
+                                 ov['unit'], ov['pollutant'], month))
+            equip_EF = dict(equip_EF)
+            equip_EF[ov['unit']] = dict(equip_EF[ov['unit']])
+            if 'ef' in ov:
+                equip_EF[ov['unit']][ov['pollutant']] = ov['ef']
+            else:
+                equip_EF[ov['unit']][ov['pollutant']] *= ov['factor']
+            efs = efs.copy()
+            efs.loc[(efs['unit_key'] == ov['unit'])
+                    & (efs['pollutant'] == ov['pollutant']), 'ef'] = \
+                equip_EF[ov['unit']][ov['pollutant']]
+            EFs[month] = (efs, units, equip_EF)
+    return EFs
+
+def prepare(annual_equip, prep, EFs_cache):
+    """Re-prepare shared data for one scenario group (fill threshold, PM option)."""
+    if prep['MAX_CEMS_TO_FILL'] != cf.MAX_CEMS_TO_FILL:
+        cf.MAX_CEMS_TO_FILL = prep['MAX_CEMS_TO_FILL']
+        if annual_equip.CEMS_annual is not None:
+            # raw monthly CEMS are retained, so only the gap fill is redone
+            annual_equip.CEMS_annual = annual_equip._parse_all_monthly_CEMS()
+        annual_equip.annual_eu_cache.clear()
+    if prep['calculate_PM_fractions'] != cf.calculate_PM_fractions:
+        cf.calculate_PM_fractions = prep['calculate_PM_fractions']
+    if cf.calculate_PM_fractions not in EFs_cache:
+        EFs_cache[cf.calculate_PM_fractions] = annual_equip._parse_annual_EFs()
+    annual_equip.EFs = EFs_cache[cf.calculate_PM_fractions]
+
+def summarize(annual_df, name):
+    """Return long pd.DataFrame (scenario, unit, parameter, value) of annual totals."""
+    from parserClass import AnnualParser
+    annual_df = AnnualParser.subtract_h2so4_if_output(annual_df)
+    totals = (annual_df.drop(columns='Month')
+                       .groupby(['WED Pt', 'Equipment'], sort=False)
+                       .sum())
+    totals.columns.name = 'Parameter'
+    totals = totals.stack().rename('value').reset_index()
+    totals.insert(0, 'scenario', name)
+    return totals
+
+def run_scenarios(annual_equip, path=None):
+    """Evaluate baseline plus all scenarios in file, return (long, comparison) pd.DataFrames."""
+    """
+    Scenarios are grouped by the overrides that need data preparation
+    (CEMS gap fill, EF re-parse for the PM option); each group's data is
+    prepared once and shared by all of its scenarios. EF, HHV and f-factor
+    overrides are applied per scenario and removed afterwards.
+    """
+    from parserClass import AnnualParser
+    if path is None:
+        path = cf.scenario_file
+    baseline_prep = dict((key, getattr(cf, key)) for key in prep_keys)
+    scenarios = [{'name': 'baseline'}] + load_scenarios(path)
+    groups = OrderedDict()
+    for sc in scenarios:
+        prep = tuple(sc.get(key, baseline_prep[key]) for key in prep_keys)
+        groups.setdefault(prep, []).append(sc)
+
+    EFs_cache = {cf.calculate_PM_fractions: annual_equip.EFs}
+    results = []
+    try:
+        for prep, group in groups.items():
+            prepare(annual_equip, dict(zip(prep_keys, prep)), EFs_cache)
+            prepared_EFs = annual_equip.EFs
+            for sc in group:
+                print('\nScenario \''+sc['name']+'\'')
+                start_time_seconds = time.time()
+                annual_equip.EFs = apply_EF_overrides(prepared_EFs, sc.get('EFs', []))
+                ff.HHV_overrides.update(sc.get('HHV', {}))
+                ff.f_factor_overrides.update(sc.get('f_factor', {}))
+                try:
+                    annual_df = AnnualParser(annual_equip,
+                                             calculation='criteria').format_annual_columns()
+                finally:
+                    ff.HHV_overrides.clear()
+                    ff.f_factor_overrides.clear()
+                    annual_equip.EFs = prepared_EFs
+                results.append(summarize(annual_df, sc['name']))
+                print('  scenario \'{}\' calculated in {} seconds'.format(
+                          sc['name'], round(time.time() - start_time_seconds)))
+    finally:
+        prepare(annual_equip, baseline_prep, EFs_cache)
+
+    long = pd.concat(results, ignore_index=True)
+    comparison = long.pivot_table(index=['WED Pt', 'Equipment', 'Parameter'],
+                                  columns='scenario', values='value',
+                                  aggfunc='sum', sort=False)
+    comparison = comparison[[sc['name'] for sc in scenarios]]
+    for sc in scenarios[1:]:
+        comparison[sc['name']+' - baseline'] = (comparison[sc['name']]
+                                               - comparison['baseline'])
+    comparison.columns.name = None
+    return long, comparison
+
+def write_scenarios(annual_equip, path=None, out_dir=None):
+    """Run scenarios, write scenario x unit x pollutant comparison CSV."""
+    if out_dir is None:
+        out_dir = cf.out_dir_child
+    long, comparison = run_scenarios(annual_equip, path)
+    outname = out_dir+str(annual_equip.year)+'_scenarios.csv'
+    comparison.round(cf.round_decimals).to_csv(outname)
+    print('wrote: '+outname)
+    return long, comparison
@@ -0,0 +1,132 @@
+# localhost calculation server keeping parsed annual data resident
+import json, time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+calculations = ['criteria', 'FG_toxics', 'calciner_toxics', 'h2plant2_toxics']
+
+class CalculationServer(HTTPServer):
+    """Single-threaded HTTP server holding one parsed AnnualEquipment() instance."""
+    """
+    Requests are handled one at a time so calculations never run
+    concurrently against the shared annual data. Before each calculation,
+    inputs whose files changed on disk are re-parsed; everything else
+    stays warm in memory.
+
+    Endpoints:
+        GET  /status     parsed year, months, equipment, input mtimes
+        POST /calculate  JSON body {"calculation": "criteria",
+                                    "equipment": [...], "months": [...],
+                                    "format": "json" | "arrow"}
+    """
+    def __init__(self, annual_equip, port=None):
+        """Constructor binding to localhost only."""
+        if port is None:
+            port = cf.serve_port
+        self.annual_equip = annual_equip
+        HTTPServer.__init__(self, ('127.0.0.1', port), CalculationHandler)
+
+    def calculate(self, request):
+        """Run one calculation, return unit x month pd.DataFrame."""
+        from parserClass import AnnualParser
+
+        calculation = request.get('calculation', 'criteria')
+        if calculation not in calculations:
+            raise ValueError('unknown calculation \''+str(calculation)+'\'; '
+                             'expected one of '+str(calculations))
+        equipment = request.get('equipment', cf.equip_to_calculate)
+        unknown = [eq for eq in equipment
+                      if eq not in self.annual_equip.unitkey_name]
+        if unknown:
+            raise ValueError('unknown equipment: '+str(unknown))
+        months = [int(mo) for mo in request.get('months', cf.months_to_calculate)]
+        unparsed = [mo for mo in months
+                       if mo not in self.annual_equip.months_to_calc]
+        if unparsed:
+            raise ValueError('months not parsed at startup: '+str(unparsed))
+
+        self.annual_equip.reload_changed_inputs()
+        parser = AnnualParser(self.annual_equip, calculation=calculation,
+                              equip_to_calc=equipment, months_to_calc=months)
+        return parser.format_annual_columns()
+
+class CalculationHandler(BaseHTTPRequestHandler):
+    """Handle /status and /calculate requests."""
+    def do_GET(self):
+        if self.path != '/status':
+            return self.send_error(404)
+        ae = self.server.annual_equip
+        status = {'year'        : ae.year,
+                  'months'      : list(ae.months_to_calc),
+                  'equipment'   : list(ae.ordered_equip),
+                  'calculations': calculations,
+                  'inputs'      : {path: time.strftime('%Y-%m-%d %H:%M:%S',
+                                                       time.localtime(mtime))
+                                   for path, mtime in ae.input_mtimes.items()}}
+        self._send(200, 'application/json', json.dumps(status).encode())
+
+    def do_POST(self):
+        if self.path != '/calculate':
+            return self.send_error(404)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            start_time_seconds = time.time()
+            annual_df = self.server.calculate(request)
+            print('  calculated \''+request.get('calculation', 'criteria')
+                  +'\' in '+str(round(time.time() - start_time_seconds, 1))
+                  +' seconds')
+            if request.get('format', 'json') == 'arrow':
+                body = to_arrow_bytes(annual_df)
+                content_type = 'application/vnd.apache.arrow.stream'
+            else:
+                body = annual_df.to_json(orient='records').encode()
+                content_type = 'application/json'
+        except (ValueError, KeyError, ImportError) as e:
+            return self._send(400, 'application/json',
+                              json.dumps({'error': str(e)}).encode())
+        except Exception as e:
+            print('  calculation failed: '+type(e).__name__+': '+str(e))
+            return self._send(500, 'application/json',
+                              json.dumps({'error': type(e).__name__+': '+str(e)}).encode())
+        self._send(200, content_type, body)
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if cf.verbose_logging:
+            print('  '+self.address_string()+' '+(format % args))
+
+def to_arrow_bytes(df):
+    """Serialize pd.DataFrame to Arrow IPC stream bytes (requires pyarrow)."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError('format \'arrow\' requires pyarrow; use \'json\'')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    writer = pa.ipc.new_stream(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+def serve(annual_equip, port=None):
+    """Serve calculations on localhost until interrupted."""
+    server = CalculationServer(annual_equip, port)
+    print('\nserving calculations at http://127.0.0.1:'
+          +str(server.server_address[1])+' (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\nstopped calculation server')
+    finally:
+        server.server_close()
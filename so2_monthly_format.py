@@ -1,14 +1,14 @@
-# pivot monthly data to get format for SO2 attainment master spreadsheet
+# report plugin: monthly SO2 (lbs) by unit for the SO2 attainment master spreadsheet
+import time
 import pandas as pd
 
-for data_year in [2018, 2019]:
+# module-level imports
+import config as cf
 
-    em = pd.read_csv('dev/'+str(data_year)+'_by_Equip_x_Month.csv', skiprows=2)
-    em.columns = ['WED Pt', 	'Equipment',	'Month', 'Refinery Fuel Gas',	'Natural Gas',	'SO2']
-    em['SO2'] = em['SO2'] * 2000
-    em.drop(columns=['Refinery Fuel Gas', 'Natural Gas'], inplace=True)
-    print(em.head())
-    wed_order_map = {
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+# row order of the SO2 attainment master spreadsheet
+wed_order_map = {
     '10 VTG' : 1 ,
     '10 RFG' : 2 ,
     '11'     : 3 ,
@@ -42,28 +42,43 @@ for data_year in [2018, 2019]:
     '112'    : 31
     }
 
-    wed_name_map = em.set_index('WED Pt')['Equipment'].to_dict()
-
-    month_map = cf.generate_month_map() ; month_map
-    month_map = {int(k):v for k, v in month_map.items()} ; month_map
-    month_map_rev = {v:int(k) for k, v in month_map.items()} ; month_map_rev
-
-    me_piv = em.pivot(index='WED Pt', columns='Month', values='SO2')
-
-    me_piv.columns = me_piv.columns.map(month_map_rev) ; me_piv.head()
-
-    me_piv.sort_index(axis=1, inplace=True) ; me_piv.head()
-
-    me_piv.columns = me_piv.columns.map(month_map_rev_rev) ; me_piv.head()
-
-    me_piv['wed_order'] = me_piv.index.map(wed_map)
-
-    me_piv = me_piv.sort_values('wed_order').drop(columns='wed_order') ; me_piv
+def so2_pivot(eXm_by_year):
+    """Return pd.DataFrame of monthly SO2 (lbs) by unit for any number of years."""
+    """
+    `eXm_by_year` is {year: equipment x month pd.DataFrame} as produced by
+    AnnualParser.groupby_annual() for criteria pollutants (index
+    ['WED Pt', 'Equipment', 'Month'], SO2 in tons). Rows are ordered as in
+    the attainment spreadsheet; columns are (year, month abbreviation).
+    """
+    month_map = cf.generate_month_map()
+    month_ints = dict((v, int(k)) for k, v in month_map.items())
+    years = []
+    for year in sorted(eXm_by_year.keys()):
+        so2 = eXm_by_year[year]['SO2']
+        if isinstance(so2, pd.DataFrame):  # (Parameter, Units) columns
+            so2 = so2.iloc[:, 0]
+        so2 = (so2 * 2000).rename('SO2').reset_index()
+        so2['Month'] = so2['Month'].replace(month_ints).astype(int)
+        so2['WED Pt'] = so2['WED Pt'].astype(str)
+        so2['year'] = year
+        years.append(so2)
+    so2 = pd.concat(years)
 
-    equip = pd.DataFrame(index=me_piv.index, columns={'Equipment'})
-    equip['Equipment'] = equip.index.map(wed_name_map)
+    piv = so2.pivot_table(index=['WED Pt', 'Equipment'], columns=['year', 'Month'],
+                          values='SO2', aggfunc='sum')
+    piv = piv.sort_index(axis=1)
+    piv.columns = piv.columns.set_levels(
+        [month_map[str(mo)] for mo in piv.columns.levels[1]], level=1)
+    order = piv.index.get_level_values('WED Pt').map(
+                lambda wed: wed_order_map.get(wed, len(wed_order_map) + 1))
+    piv = piv.iloc[sorted(range(len(piv)), key=lambda i: order[i])]
+    return piv.round(2)
 
-    final = pd.concat([equip, me_piv], sort=False, axis=1).round(2)
-    print(final.head())
-    final.to_csv('output/'+str(data_year)+'_SO2.csv', index=True)
-    print('wrote: '+'output/'+str(data_year)+'_SO2.csv')
\ No newline at end of file
+def write_report(parser):
+    """Write SO2 attainment pivot for the criteria results held by an AnnualParser."""
+    if not parser.is_criteria or 'SO2' not in cf.pollutants_to_calculate:
+        return
+    final = so2_pivot({parser.year_to_calc: parser.eXm_gb})
+    outname = cf.out_dir_child+str(parser.year_to_calc)+'_SO2.csv'
+    final.to_csv(outname, index=True)
+    print('wrote: '+outname)
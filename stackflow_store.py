@@ -0,0 +1,93 @@
+# partitioned store of hourly stack flow (dscfh) for all units, appended by month
+import os, time
+import pandas as pd
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+try:
+    import pyarrow  # noqa: F401 (parquet engine)
+    FORMAT = 'parquet'
+except ImportError:
+    FORMAT = 'csv'
+
+class StackflowStore(object):
+    """Buffer hourly stack flows in memory, write one partition per month."""
+    """
+    Layout: <root>/year=YYYY/month=MM/stackflow.<parquet|csv>, each file
+    holding long-format columns [tstamp, unit_key, dscfh] for every unit
+    calculated that month. Parquet is used when pyarrow is installed,
+    otherwise CSV. Writing a month replaces only the units recorded for
+    it, so months (and units) can be appended run by run.
+    """
+    def __init__(self, root=None):
+        """Constructor for empty buffer."""
+        self.root = root
+        self.buffer = {} # {(year, month, unit_key): pd.Series of hourly dscfh}
+
+    def get_root(self):
+        return self.root if self.root is not None else cf.stackflow_dir
+
+    def record(self, year, month, unit_key, dscfh):
+        """Buffer one unit-month of hourly stack flow (pd.Series indexed by tstamp)."""
+        self.buffer[(int(year), int(month), unit_key)] = dscfh
+
+    def partition_path(self, year, month):
+        return (self.get_root()+'year='+str(year)+'/month='+str(month).zfill(2)
+                +'/stackflow.'+FORMAT)
+
+    def read_partition(self, year, month):
+        """Return long-format pd.DataFrame for one month (empty if not written)."""
+        path = self.partition_path(year, month)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=['tstamp', 'unit_key', 'dscfh'])
+        if FORMAT == 'parquet':
+            return pd.read_parquet(path)
+        return pd.read_csv(path, parse_dates=['tstamp'])
+
+    def flush(self):
+        """Write buffered unit-months to their month partitions, clear buffer."""
+        months = sorted(set((year, month) for year, month, unit in self.buffer))
+        for year, month in months:
+            units = dict((unit, ser) for (y, m, unit), ser in self.buffer.items()
+                         if (y, m) == (year, month))
+            new = pd.concat([pd.DataFrame({'tstamp'  : ser.index,
+                                           'unit_key': unit,
+                                           'dscfh'   : ser.values})
+                             for unit, ser in units.items()])
+            old = self.read_partition(year, month)
+            part = (pd.concat([old[~old['unit_key'].isin(units.keys())], new])
+                      .sort_values(['unit_key', 'tstamp'])
+                      .reset_index(drop=True))
+            path = self.partition_path(year, month)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            if FORMAT == 'parquet':
+                part.to_parquet(path, index=False)
+            else:
+                part.to_csv(path, index=False)
+        if months:
+            print('  wrote hourly stack flows for {} month(s) to \'{}\''.format(
+                      len(months), self.get_root()))
+        self.buffer = {}
+
+    def read_year(self, year, units=None):
+        """Return hourly pd.DataFrame (tstamp x unit_key) of stack flow for a year."""
+        year_dir = self.get_root()+'year='+str(year)+'/'
+        if not os.path.exists(year_dir):
+            return pd.DataFrame()
+        if FORMAT == 'parquet':
+            # hive-style partitions are read as one dataset
+            flows = pd.read_parquet(year_dir).drop(columns='month')
+        else:
+            months = sorted(int(d.split('=')[-1]) for d in os.listdir(year_dir)
+                            if d.startswith('month='))
+            flows = pd.concat([self.read_partition(year, month) for month in months])
+        if units is not None:
+            flows = flows[flows['unit_key'].isin(units)]
+        return flows.pivot(index='tstamp', columns='unit_key', values='dscfh')
+
+# one store per process, shared by all Monthly* instances
+store = StackflowStore()
@@ -0,0 +1,96 @@
+# run-wide canonical hourly time grid with explicit DST rules and month offsets
+import time
+import numpy as np
+import pandas as pd
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+class HourlyGrid(object):
+    """Hourly local-clock timestamps for a data year, with integer month offsets."""
+    """
+    Inputs are exported by PI in naive local (wall-clock) time. Every
+    hourly input is put on this grid once at ingest (conform()), after
+    which a month of any dataset is `df.iloc[grid.month_slices[month]]`
+    and datasets line up row for row.
+
+    DST rules (vectorized over each input):
+      *fall back: the repeated local hour (e.g. 01:00 twice, the second
+       often stamped 01:02) keeps its first reading per key; later readings
+       in the same hour are dropped
+      *spring forward: the skipped local hour (dst_skipped) stays on the
+       grid and is blanked (NaN) by conform() and pivot_long(), so a
+       reading stamped with it is not summed
+    """
+    def __init__(self, year, tz=None):
+        """Constructor for hourly grid spanning all months of `year`."""
+        self.year  = year
+        self.tz    = tz if tz is not None else cf.local_timezone
+        self.index = pd.date_range(str(year)+'-01-01 00:00', str(year)+'-12-31 23:00',
+                                   freq='H', name='tstamp')
+        month_starts = np.searchsorted(self.index.month, np.arange(1, 14))
+        self.month_slices = dict((month, slice(int(month_starts[month-1]),
+                                               int(month_starts[month])))
+                                 for month in range(1, 13))
+                             # dict: {integer month: slice of grid positions}
+
+        # ambiguous (fall-back) hours are resolved as standard time (False)
+        # only so that localizing succeeds; they are kept as first read
+        standard = np.zeros(len(self.index), dtype=bool)
+        self.dst_skipped = np.asarray(self.index.tz_localize(
+                               self.tz, ambiguous=standard,
+                               nonexistent='NaT').isnull())
+                             # bool array: spring-forward hours (not on the local clock)
+        self.on_clock    = pd.Series(~self.dst_skipped, index=self.index)
+                             # bool pd.Series: grid hours that exist on the local clock
+
+    def __len__(self):
+        return len(self.index)
+
+    def month_index(self, month):
+        """Return pd.DatetimeIndex of grid hours in month."""
+        return self.index[self.month_slices[month]]
+
+    @staticmethod
+    def drop_repeated_hours(df, tstamp='tstamp', keys=None):
+        """Floor timestamps to the hour, keep first reading per (keys, hour)."""
+        """
+        `tstamp` names a datetime column, or None for a DatetimeIndex. Rows
+        are assumed to be in file order, so the first reading of a repeated
+        fall-back hour is the standard-clock one.
+        """
+        if tstamp is None:
+            hours = df.index.floor('H')
+            dup = pd.Series(hours).duplicated(keep='first').values
+            df = df[~dup]
+            df.index = hours[~dup]
+            return df
+        df = df.copy()
+        df[tstamp] = df[tstamp].dt.floor('H')
+        return df[~df.duplicated(subset=(keys or []) + [tstamp], keep='first')]
+
+    def blank_skipped_hours(self, data):
+        """Return grid-indexed pd.DataFrame/Series with spring-forward hours set to NaN."""
+        if not self.dst_skipped.any():
+            return data
+        return data.where(self.on_clock, axis=0)
+
+    def conform(self, data):
+        """Return hourly pd.DataFrame/Series (DatetimeIndex) reindexed onto the grid."""
+        data = self.drop_repeated_hours(data[data.index.notnull()], tstamp=None)
+        data = self.blank_skipped_hours(data.reindex(self.index))
+        data.index.name = 'tstamp'
+        return data
+
+    def pivot_long(self, long_df, columns='ptag', values='val'):
+        """Return wide pd.DataFrame (grid hours x columns) from tstamp-indexed long data."""
+        if long_df is None or long_df.empty:
+            return pd.DataFrame(index=self.index)
+        df = long_df.reset_index()[['tstamp', columns, values]]
+        df[columns] = df[columns].astype(str) # in case of categorical (compact_mode)
+        wide = df.pivot(index='tstamp', columns=columns, values=values)
+        wide = self.blank_skipped_hours(wide.reindex(self.index))
+        wide.columns.name = None
+        return wide
@@ -0,0 +1,225 @@
+# Monte Carlo uncertainty of annual criteria emissions (draw x unit x month arrays)
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# module-level imports
+import config as cf
+import ffactor as ff
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+pollutants = ['nox', 'co', 'so2', 'voc', 'pm', 'pm25', 'pm10', 'h2so4']
+
+# which uncertainty factors scale a unit-month value
+EF_ONLY, EF_METER, EF_METER_HHV, CEMS = 1, 2, 3, 4
+
+# lab-analysis dataset and chemistry file by fuel (attributes of AnnualEquipment)
+lab_sources = {
+    'RFG'    : ('RFG_annual',     'fpath_FG_chem'),
+    'cokerFG': ('cokerFG_annual', 'fpath_FG_chem'),
+    'CVTG'   : ('CVTG_annual',    'fpath_FG_chem'),
+    'flare'  : ('flare_annual',   'fpath_FG_chem'),
+    'PSA'    : ('PSA_annual',     'fpath_FG_chem'),
+    'NG'     : ('NG_annual',      'fpath_NG_chem'),
+    }
+
+# units burning several lab-analysed fuels: {eu_type: [(fuel, fuel column of results)]}
+fuel_blends = {
+    'h2plant': [('PSA', 'fuel_rfg'), ('NG', 'fuel_ng')],
+    }
+
+def fuel_weights(annual_equip, base, units, months, fuels):
+    """Return array (unit x fuel x month) of each fuel's share of a unit's fuel."""
+    """
+    Units in fuel_blends are weighted by their monthly fuel volumes (equal
+    shares in months without fuel); all others take their registry
+    HHV_source only.
+    """
+    weights = np.zeros((len(units), len(fuels), len(months)))
+    for i, unit_key in enumerate(units):
+        info = annual_equip.registry[unit_key]
+        blend = fuel_blends.get(info.eu_type)
+        if blend is None:
+            weights[i, fuels.index(info.HHV_source), :] = 1
+            continue
+        volumes = np.array([np.nan_to_num(pd.to_numeric(base.loc[unit_key, col],
+                                                        errors='coerce').values)
+                            for fuel, col in blend]).clip(min=0)
+        total = volumes.sum(axis=0)
+        shares = np.where(total > 0, volumes / np.where(total > 0, total, 1),
+                          1 / len(blend))
+        for (fuel, col), share in zip(blend, shares):
+            weights[i, fuels.index(fuel), :] += share
+    return weights
+
+def lab_spread(annual_equip, fuel, months):
+    """Return (HHV, HHV x Fd) relative standard errors of monthly means, arrays by month."""
+    """
+    The monthly HHV and Fd-factor are means of the lab samples taken that
+    month, so their uncertainty is the sample spread / sqrt(n). HHV x Fd
+    (the heat-input term of CEMS stack flow) is computed per sample so the
+    correlation between the two is kept. Months with fewer than two
+    samples use the spread of all samples in the year.
+    """
+    lab_attr, chem_attr = lab_sources[fuel]
+    lab = getattr(annual_equip, lab_attr)
+    chem_path = getattr(annual_equip, chem_attr)
+    samples = lab.loc[:, lab.loc['GBTU/CF'].notnull()]
+    HHV = samples.loc['GBTU/CF'].astype(float)
+    heat = pd.Series([HHV.iloc[i]
+                      * ff.calculate_monthly_f_factor(samples.iloc[:, [i]], chem_path,
+                                                      None, ff_terms=dict(ff.ff_constants))
+                      for i in range(samples.shape[1])],
+                     index=samples.columns, dtype=float)
+
+    def rse(ser):
+        return ser.std() / ser.mean() if len(ser) > 1 else np.nan
+
+    rse_HHV  = np.zeros(len(months))
+    rse_heat = np.zeros(len(months))
+    for i, month in enumerate(months):
+        start, end = annual_equip.ts_intervals[month - annual_equip.month_offset]
+        in_month = (HHV.index >= start) & (HHV.index <= end)
+        n = max(in_month.sum(), 1)
+        rse_HHV[i]  = np.nan_to_num(rse(HHV[in_month]) if n > 1 else rse(HHV)) / np.sqrt(n)
+        rse_heat[i] = np.nan_to_num(rse(heat[in_month]) if n > 1 else rse(heat)) / np.sqrt(n)
+    return rse_HHV, rse_heat
+
+def factor_categories(annual_equip, units, months):
+    """Return {pollutant: int array (unit x month)} of uncertainty categories."""
+    """
+    EF-based values scale with the EF draw (and meter and HHV, depending on
+    EF units); CEMS-based values scale with meter and heat input. H2SO4 of
+    non-calciners is a fixed fraction of SO2, so it takes the SO2 factors.
+    """
+    cats = dict((pol, np.zeros((len(units), len(months)), dtype=int))
+                for pol in pollutants)
+    for j, month in enumerate(months):
+        efs, ef_units, equip_EF = annual_equip.EFs[month]
+        for i, unit_key in enumerate(units):
+            calciner = annual_equip.registry[unit_key].eu_type == 'calciner'
+            for pol in pollutants:
+                src = pol if (pol != 'h2so4' or calciner) else 'so2'
+                ef = equip_EF.get(unit_key, {}).get(src, np.nan)
+                if pd.isnull(ef):
+                    cats[pol][i, j] = CEMS
+                elif calciner:
+                    cats[pol][i, j] = EF_ONLY
+                else:
+                    try:
+                        ef_unit = ef_units.loc[(unit_key, src), 'units']
+                    except KeyError:
+                        ef_unit = None
+                    cats[pol][i, j] = {'lb/mmbtu': EF_METER_HHV,
+                                       'lb/hr'   : EF_ONLY}.get(ef_unit, EF_METER)
+    return cats
+
+def simulate(annual_equip, annual_df, draws=None, seed=None):
+    """Return {pollutant: array (draw x unit)} of simulated annual emissions, plus units."""
+    """
+    `annual_df` is the assembled unit x month criteria result of an
+    AnnualParser (raw column names, emissions in tons). Each value is
+    scaled by multiplicative factors drawn per draw: EF (lognormal, one
+    draw per unit and pollutant for the year), fuel meter (normal, one per
+    unit for the year) and lab HHV / heat input (normal, one per fuel and
+    month, from the lab sample spread). Units burning several fuels take
+    the fuel-weighted sum of those fuels' HHV and heat-input deviations.
+    """
+    if draws is None:
+        draws = cf.uncertainty_draws
+    rng = np.random.default_rng(seed)
+    units  = list(pd.unique(annual_df['equipment']))
+    months = sorted(pd.unique(annual_df['month']).astype(int))
+    registry = annual_equip.registry
+
+    base = (annual_df.set_index(['equipment', 'month'])
+                     .reindex(pd.MultiIndex.from_product([units, months])))
+    fuels = set(registry[u].HHV_source for u in units)
+    for u in units:
+        fuels.update(fuel for fuel, col in fuel_blends.get(registry[u].eu_type, []))
+    fuels = sorted(fuels)
+    weights = fuel_weights(annual_equip, base, units, months, fuels)
+    rse_HHV  = np.zeros((len(fuels), len(months)))
+    rse_heat = np.zeros((len(fuels), len(months)))
+    for k, fuel in enumerate(fuels):
+        rse_HHV[k], rse_heat[k] = lab_spread(annual_equip, fuel, months)
+
+    # shared standard-normal draws keep HHV and heat-input factors correlated
+    z_lab = rng.standard_normal((draws, len(fuels), len(months)))
+    HHV_f  = 1 + np.einsum('ukm,dkm->dum', weights, rse_HHV  * z_lab)  # draw x unit x month
+    heat_f = 1 + np.einsum('ukm,dkm->dum', weights, rse_heat * z_lab)
+    meter_f = (1 + cf.uncertainty_meter_rsd
+                   * rng.standard_normal((draws, len(units))))[:, :, None]
+
+    base = base[pollutants]
+    cats = factor_categories(annual_equip, units, months)
+    EF_f = {}
+    for pol in pollutants:
+        rsd = cf.uncertainty_EF_rsd.get(pol, 0.0)
+        sigma = np.sqrt(np.log(1 + rsd**2))
+        # mean-preserving lognormal multiplier
+        EF_f[pol] = rng.lognormal(-sigma**2 / 2, sigma, (draws, len(units)))[:, :, None]
+
+    totals = {}
+    for pol in pollutants:
+        cat = cats[pol][None, :, :]
+        src = EF_f[pol]
+        if pol == 'h2so4':
+            calciners = np.array([registry[u].eu_type == 'calciner' for u in units])
+            src = np.where(calciners[None, :, None], EF_f['h2so4'], EF_f['so2'])
+        factor = (np.where(cat <= EF_METER_HHV, src, 1)
+                  * np.where(cat >= EF_METER, meter_f, 1)
+                  * np.where(cat == EF_METER_HHV, HHV_f, 1)
+                  * np.where(cat == CEMS, heat_f, 1))
+        values = np.nan_to_num(base[pol].values.reshape(len(units), len(months)))
+        # -9999 error flags are not propagated
+        values[values < 0] = 0
+        totals[pol] = (values[None, :, :] * factor).sum(axis=2)
+    return totals, units
+
+def summarize(annual_equip, annual_df, totals, units, percentiles=None):
+    """Return pd.DataFrame of point value, mean and percentiles by unit and pollutant."""
+    if percentiles is None:
+        percentiles = cf.uncertainty_percentiles
+    replace_WEDpt = dict((v, k) for k, v in annual_equip.unitID_equip.items())
+    point = (annual_df[pollutants].clip(lower=0)
+                                  .groupby(annual_df['equipment'], sort=False).sum())
+    rows = []
+    for pol in pollutants:
+        if cf.output_colnames_map[pol] not in cf.pollutants_to_calculate:
+            continue
+        sims = np.column_stack([totals[pol], totals[pol].sum(axis=1)])
+        labels = [(replace_WEDpt.get(u, u), annual_equip.unitkey_name[u]) for u in units]
+        labels += [('', 'Facility Total')]
+        pcts = np.percentile(sims, percentiles, axis=0)
+        points = list(point.loc[units, pol]) + [point[pol].sum()]
+        for i, (wed, name) in enumerate(labels):
+            row = OrderedDict([('WED Pt'      , wed),
+                               ('Equipment'   , name),
+                               ('Parameter'   , cf.output_colnames_map[pol]),
+                               ('point (tons)', points[i]),
+                               ('mean (tons)' , sims[:, i].mean())])
+            for p, val in zip(percentiles, pcts[:, i]):
+                row['p'+str(p)] = val
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+def write_uncertainty(annual_equip, parser):
+    """Simulate uncertainty of criteria results held by an AnnualParser, write CSV."""
+    if not parser.is_criteria or 'CO2' in cf.pollutants_to_calculate:
+        return
+    start_time_seconds = time.time()
+    print('Simulating {} Monte Carlo draws of criteria emissions.'.format(
+              cf.uncertainty_draws))
+    annual_df = parser.assemble_annual_from_results(
+                    parser.get_ordered_equip_to_calculate())
+    totals, units = simulate(annual_equip, annual_df,
+                             cf.uncertainty_draws, cf.uncertainty_seed)
+    summary = summarize(annual_equip, annual_df, totals, units)
+    outname = cf.out_dir_child+str(parser.year_to_calc)+'_uncertainty.csv'
+    summary.round(cf.round_decimals).to_csv(outname, index=False)
+    print('wrote: '+outname+' ({} seconds)'.format(
+              round(time.time() - start_time_seconds)))
+    return summary
@@ -0,0 +1,274 @@
+# SQLite warehouse of unit x month results across runs and data years
+import contextlib, hashlib, json, os, socket, sqlite3, time
+import pandas as pd
+
+# module-level imports
+import config as cf
+import inputio
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    started     TEXT,
+    host        TEXT,
+    data_year   INTEGER,
+    config      TEXT                -- JSON of calculation settings
+);
+CREATE TABLE IF NOT EXISTS run_inputs (
+    run_id      INTEGER NOT NULL REFERENCES runs (run_id),
+    path        TEXT    NOT NULL,
+    bytes       INTEGER,
+    mtime       REAL,
+    sha256      TEXT,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id      INTEGER NOT NULL REFERENCES runs (run_id),
+    calculation TEXT    NOT NULL,   -- 'criteria', 'GHG', 'H2S', 'FG_toxics', ...
+    year        INTEGER NOT NULL,
+    month       INTEGER NOT NULL,
+    wed_pt      TEXT    NOT NULL,
+    equipment   TEXT    NOT NULL,
+    parameter   TEXT    NOT NULL,
+    units       TEXT,
+    value       REAL,
+    seq         INTEGER,            -- row order of the written report
+    PRIMARY KEY (run_id, calculation, year, month, wed_pt, parameter)
+);
+CREATE INDEX IF NOT EXISTS results_by_parameter
+    ON results (calculation, parameter, year, month);
+CREATE INDEX IF NOT EXISTS results_by_unit
+    ON results (wed_pt, parameter, year, month);
+CREATE TABLE IF NOT EXISTS latest (
+    calculation TEXT    NOT NULL,
+    year        INTEGER NOT NULL,
+    month       INTEGER NOT NULL,
+    wed_pt      TEXT    NOT NULL,
+    parameter   TEXT    NOT NULL,
+    run_id      INTEGER NOT NULL,
+    PRIMARY KEY (calculation, year, month, wed_pt, parameter)
+);
+CREATE VIEW IF NOT EXISTS latest_results AS
+    SELECT r.* FROM latest l
+    JOIN results r USING (run_id, calculation, year, month, wed_pt, parameter);
+"""
+
+# calculation --> file-name suffix of the CSV reports written by AnnualParser
+report_suffixes = {
+    'criteria'       : '_CRITERIA',
+    'GHG'            : '_CRITERIA',
+    'FG_toxics'      : '_TOXICS_FG',
+    'calciner_toxics': '_TOXICS_calciners',
+    'h2plant2_toxics': '_TOXICS_h2plant2',
+    'H2S'            : '_H2S',
+    }
+
+# settings recorded with each run
+config_keys = ['data_dir', 'months_to_calculate', 'equip_to_calculate',
+               'pollutants_to_calculate', 'MAX_CEMS_TO_FILL',
+               'CEMS_fill_strategies', 'CEMS_lookback_substitution',
+               'calculate_PM_fractions', 'compact_mode', 'compact_float32']
+
+class Warehouse(object):
+    """Indexed SQLite store of every run's unit x month x parameter results."""
+    """
+    Each set of input files (by modification time) gets one row in `runs`
+    with the calculation settings and a SHA-256 fingerprint of each input
+    in `run_inputs`. Results are stored long-format in `results`; `latest`
+    points every (calculation, year, month, unit, parameter) at the run
+    that last wrote it, so the view `latest_results` answers multi-year
+    questions in one indexed statement, e.g.
+
+        SELECT year, SUM(value) FROM latest_results
+        WHERE calculation = 'criteria' AND parameter = 'NOx'
+        GROUP BY year
+
+    Reports in the layout of the per-year CSVs are rendered with
+    render_reports().
+    """
+    def __init__(self, path=None):
+        """Constructor for lazily opened warehouse."""
+        self.path   = path
+        self.conn   = None
+        self.runs   = {}  # {input snapshot: run_id}
+        self.hashes = {}  # {(path, bytes, mtime): sha256}
+
+    def get_path(self):
+        return self.path if self.path is not None else cf.warehouse_path
+
+    def connect(self):
+        """Return open sqlite3.Connection, creating the schema if needed."""
+        if self.conn is None:
+            path = self.get_path()
+            if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            self.conn = sqlite3.connect(path)
+            self.conn.executescript(schema)
+        return self.conn
+
+    def fingerprint(self, path):
+        """Return (stored bytes, mtime, sha256 of contents) of an input file."""
+        """
+        Compressed and zip-archived inputs are hashed as decompressed, so
+        the fingerprint follows the data rather than how it is stored.
+        """
+        size, mtime = inputio.getsize(path), inputio.getmtime(path)
+        key = (path, size, mtime)
+        if key not in self.hashes:
+            sha = hashlib.sha256()
+            with inputio.reading(path) as source:
+                with (open(source, 'rb') if isinstance(source, str)
+                      else contextlib.nullcontext(source)) as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        sha.update(block)
+            self.hashes[key] = sha.hexdigest()
+        return size, mtime, self.hashes[key]
+
+    def get_run_id(self, annual_equip):
+        """Return run_id for the current input files, recording a new run if changed."""
+        snapshot = tuple(sorted(annual_equip.input_mtimes.items()))
+        if snapshot in self.runs:
+            return self.runs[snapshot]
+        conn = self.connect()
+        settings = dict((key, getattr(cf, key)) for key in config_keys
+                        if hasattr(cf, key))
+        settings['months_to_calculate'] = list(settings.get('months_to_calculate', []))
+        with conn:
+            cur = conn.execute(
+                'INSERT INTO runs (started, host, data_year, config) VALUES (?, ?, ?, ?)',
+                (time.strftime('%Y-%m-%d %H:%M:%S'), socket.gethostname(),
+                 int(annual_equip.year), json.dumps(settings, default=str)))
+            run_id = cur.lastrowid
+            conn.executemany(
+                'INSERT INTO run_inputs VALUES (?, ?, ?, ?, ?)',
+                [(run_id, path) + self.fingerprint(path)
+                 for path, mtime in snapshot if inputio.exists(path)])
+        self.runs[snapshot] = run_id
+        return run_id
+
+    def record(self, annual_equip, calculation, annual_df, MI_col):
+        """Store formatted unit x month results of one calculation for the current run."""
+        """
+        `annual_df` and `MI_col` are as passed to ledger.to_ledger_rows():
+        columns ['WED Pt', 'Equipment', 'Month', <parameters>] and the
+        matching (Parameter, Units) pd.MultiIndex.
+        """
+        import ledger
+        rows = ledger.to_ledger_rows(annual_df, annual_equip.year, MI_col)
+        rows['value'] = pd.to_numeric(rows['value'], errors='coerce')
+        run_id = self.get_run_id(annual_equip)
+        records = [(run_id, calculation, int(r.year), int(r.month), r.wed_pt,
+                    r.equipment, r.parameter, r.units,
+                    None if pd.isnull(r.value) else float(r.value), seq)
+                   for seq, r in enumerate(rows.rename(columns={'WED Pt': 'wed_pt',
+                                                                'Equipment': 'equipment',
+                                                                'Parameter': 'parameter',
+                                                                'Units': 'units'})
+                                               .itertuples(index=False))]
+        conn = self.connect()
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO results VALUES '
+                             '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+            conn.executemany('INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?)',
+                             [(calculation, year, month, wed_pt, parameter, run_id)
+                              for (run_id, calculation, year, month, wed_pt,
+                                   equipment, parameter, units, value, seq) in records])
+        print('  recorded {} {} results in warehouse \'{}\' (run {})'.format(
+                  len(records), calculation, self.get_path(), run_id))
+        return run_id
+
+    def query(self, sql, params=()):
+        """Return pd.DataFrame result of an SQL statement."""
+        return pd.read_sql_query(sql, self.connect(), params=params)
+
+    def annual_totals(self, parameter, calculation='criteria', years=None):
+        """Return pd.DataFrame (year x WED Pt) of latest annual totals of a parameter."""
+        sql = ('SELECT year, wed_pt, equipment, SUM(value) AS value '
+               'FROM latest_results WHERE calculation = ? AND parameter = ?')
+        params = [calculation, parameter]
+        if years is not None:
+            sql += ' AND year IN ({})'.format(', '.join('?' * len(years)))
+            params += [int(year) for year in years]
+        sql += ' GROUP BY year, wed_pt, equipment ORDER BY year, wed_pt'
+        return self.query(sql, params)
+
+    def results_frame(self, year, calculation, run_id=None):
+        """Return (annual_df, MI_col) of stored results in AnnualParser layout."""
+        if run_id is None:
+            long = self.query('SELECT * FROM latest_results WHERE year = ? '
+                              'AND calculation = ? ORDER BY run_id, seq',
+                              (int(year), calculation))
+        else:
+            long = self.query('SELECT * FROM results WHERE year = ? AND calculation = ? '
+                              'AND run_id = ? ORDER BY seq',
+                              (int(year), calculation, int(run_id)))
+        if long.empty:
+            return None, None
+        params = long[['parameter', 'units']].drop_duplicates()
+        MI_col = pd.MultiIndex.from_frame(params, names=('Parameter', 'Units'))
+        rows = long[['wed_pt', 'equipment', 'month']].drop_duplicates()
+        annual_df = (long.pivot_table(index=['wed_pt', 'equipment', 'month'],
+                                      columns='parameter', values='value',
+                                      aggfunc='sum', dropna=False)
+                         .reindex(pd.MultiIndex.from_frame(rows))
+                         [list(params['parameter'])]
+                         .reset_index())
+        annual_df.columns = ['WED Pt', 'Equipment', 'Month'] + list(params['parameter'])
+        if cf.write_month_names:
+            annual_df['Month'] = (annual_df['Month'].astype(str)
+                                                    .replace(cf.generate_month_map()))
+        return annual_df, MI_col
+
+    def render_reports(self, year, out_dir=None, calculations=None, run_id=None):
+        """Write the per-year CSV reports of stored results; return list of paths."""
+        from parserClass import AnnualParser
+        if out_dir is None:
+            out_dir = cf.out_dir_child
+        if calculations is None:
+            calculations = list(report_suffixes.keys())
+        written = []
+        for calculation in calculations:
+            annual_df, MI_col = self.results_frame(year, calculation, run_id)
+            if annual_df is None:
+                continue
+            frames = AnnualParser.groupby_frames(annual_df, MI_col)
+            if calculation == 'H2S':
+                frames = [df for df in frames
+                          if df.name in ['by_Equip_x_Month', 'by_Equip']]
+            for df in frames:
+                outname = (out_dir+str(year)+'_'+df.name
+                           +report_suffixes[calculation]+'.csv')
+                df.round(cf.round_decimals).to_csv(outname)
+                written.append(outname)
+        print('wrote {} report(s) for {} from warehouse \'{}\''.format(
+                  len(written), year, self.get_path()))
+        return written
+
+# one warehouse per process, shared by all AnnualParser instances
+warehouse = Warehouse()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='warehouse',
+                                     description='Query or render reports from '
+                                                 'the results warehouse.')
+    parser.add_argument('--db', default=cf.warehouse_path,
+                        help='Warehouse file (default: %(default)s).')
+    parser.add_argument('--sql', help='Print result of an SQL statement.')
+    parser.add_argument('--render', type=int, metavar='Year',
+                        help='Write CSV reports of stored results for Year.')
+    parser.add_argument('--outpath', default=None,
+                        help='Directory for --render (default: out_dir_child).')
+    args = parser.parse_args()
+    warehouse.path = args.db
+    if args.sql:
+        print(warehouse.query(args.sql).to_string(index=False))
+    if args.render:
+        out_dir = args.outpath or cf.out_dir+str(args.render)+'_emissions/'
+        if not out_dir.endswith('/'):
+            out_dir += '/'
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        warehouse.render_reports(args.render, out_dir)
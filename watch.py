@@ -0,0 +1,59 @@
+# poll input directories and recalculate months with new or changed data
+import time
+
+# module-level imports
+import config as cf
+
+#print(time.strftime("%H:%M:%S")+'\tmodule \''+__name__+'\' reloaded.')
+
+def watch(annual_equip, calculations, interval=None):
+    """Write year-to-date outputs, then rewrite them whenever inputs change."""
+    """
+    Polls CEMS_dir and the annual workbooks every `interval` seconds.
+    A CEMS file for a month past the last parsed month extends the months
+    to calculate; changed files are re-parsed and only the months whose
+    data changed are recalculated (all other unit x month results are
+    kept by each AnnualParser). Runs until interrupted.
+    """
+    from parserClass import AnnualParser
+    from stackflow_store import store
+    from qasink import sink
+
+    if interval is None:
+        interval = cf.watch_interval
+    parsers = []
+    for calculation in calculations:
+        print('\n')
+        parser = AnnualParser(annual_equip, calculation=calculation)
+        parser.read_calculate_write_annual_emissions()
+        parsers.append(parser)
+    if cf.write_stackflow:
+        store.flush()
+    sink.flush()
+
+    print('\nwatching \''+cf.annual_prefix+'\' for new or changed data '
+          '(every '+str(interval)+' seconds; Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(interval)
+            new_months = annual_equip.new_CEMS_months()
+            if new_months:
+                annual_equip.extend_months(new_months)
+            changed = annual_equip.reload_changed_inputs()
+            if not changed and not new_months:
+                continue
+            months = sorted(annual_equip.changed_months | set(new_months))
+            print(time.strftime("%H:%M:%S")+'\trecalculating months '
+                  +str(months))
+            for parser in parsers:
+                parser.months_to_calc = annual_equip.months_to_calc
+                parser.invalidate_months(months)
+                parser.read_calculate_write_annual_emissions()
+            if cf.write_stackflow:
+                store.flush()
+            sink.flush()
+            print(time.strftime("%H:%M:%S")+'\trewrote year-to-date outputs in \''
+                  +cf.out_dir_child+'\'')
+    except KeyboardInterrupt:
+        sink.wait()
+        print('\nstopped watching')